@@ -45,6 +45,18 @@ CLR_SAMPLES=("LP1" "KMS11" "U266" "MM1S" "RPMI8226")
 # HiFi sample IDs
 HIFI_SAMPLES=("PT1" "PT2" "PT3")
 
+# Stage runner (run_stages.py): only the samples in TF_SAMPLES
+# (IDs not listed in CLR_SAMPLES are treated as HiFi, like new patients)
+if [[ -n "${TF_SAMPLES:-}" ]]; then
+    read -ra _only <<< "${TF_SAMPLES}"
+    _clr=(); _hifi=()
+    for s in "${_only[@]}"; do
+        if [[ " ${CLR_SAMPLES[*]} " == *" ${s} "* ]]; then _clr+=("${s}"); else _hifi+=("${s}"); fi
+    done
+    CLR_SAMPLES=("${_clr[@]}")
+    HIFI_SAMPLES=("${_hifi[@]}")
+fi
+
 # Subdirectories for intermediate outputs
 PBMM2_DIR="${OUT_DIR}/1-pbmm2"
 SVSIG_DIR="${OUT_DIR}/2-svsig"
@@ -8,7 +8,7 @@ set -euo pipefail
 #   1) Reads <cell>_translocation.vcf (BND-only VCF)
 #   2) Extracts the pbsv BND ID (e.g. pbsv.BND.chr1:pos1-chr2:pos2 → chr1:pos1-chr2:pos2)
 #   3) Deduplicates reciprocal pairs (A-B vs B-A) using an inline Python script
-#   4) Normalizes pair order by chromosome index and sorts
+#   4) Normalizes pair order by karyotype rank (6_Integration/karyotype.py) and sorts
 #   5) Outputs a 4-column TSV/BED-like file: chr1  pos1  chr2  pos2
 #
 # Inputs:
@@ -20,6 +20,10 @@ set -euo pipefail
 #   3_pair_bnd.sort          # normalized and sorted pairs
 #   <cell>_bnd.bed           # chr1  pos1  chr2  pos2
 #
+# NOTE: bnd_normalize.py runs this script, 3_build_bnd_with_strand.sh and
+#       6_Integration/1_trans_tsv.sh in one pass over <cell>_SVs_hg38.vcf
+#       (same TSVs; these intermediate files only with --keep-intermediate).
+#
 # Author: (your name)
 # Project: TransFinder
 ###############################################################################
@@ -39,11 +43,21 @@ OUT_DIR="${BASE_DIR}/5-bnd_pairs"
 # List of samples to process
 SAMPLES=("LP1" "KMS11" "U266" "MM1S" "RPMI8226" "PT1" "PT2" "PT3")
 
+# Chromosome order (chr1 < chr2 < ... < chr22 < chrX < chrY < chrM):
+# optional chrom.sizes file, empty = built-in hg38 (see 6_Integration/karyotype.py)
+CHROM_SIZES=""
+
 ###############################################################################
 
 
 mkdir -p "${OUT_DIR}"
 
+# orient --a A-columns --b B-columns: same chrA <= chrB rule as the Python stages
+orient() {
+    python3 "${BASE_DIR}/../6_Integration/karyotype.py" ${CHROM_SIZES:+--chrom-sizes "${CHROM_SIZES}"} \
+        orient "$@"
+}
+
 for cell in "${SAMPLES[@]}"; do
     echo "[BND] Processing sample: ${cell}"
 
@@ -114,29 +128,14 @@ PY
     # 3) Normalize chromosome order and sort pairs
     #
     # Each line in 2_pair_bnd: "chrA:posA-chrB:posB"
-    # We enforce that the smaller chromosome index is in the first position.
-    #
-    # Trick:
-    #   "chr16" → split by "hr" → ["c", "16"] → use 16 for numeric comparison.
+    # We enforce that the chromosome with the smaller karyotype rank is in
+    # the first position (chr1 < ... < chr22 < chrX < chrY < chrM; unknown
+    # contigs last, by name), using 6_Integration/karyotype.py orient.
     ###########################################################################
 
-    awk -F"-" -v OFS="-" '
-    {
-        # $1 = chrA:posA, $2 = chrB:posB
-        split($1, a, ":");
-        split(a[1], b, "hr");  # b[2] = chromosome index (e.g. "16")
-
-        split($2, c, ":");
-        split(c[1], d, "hr");  # d[2] = chromosome index
-
-        # Ensure smaller chromosome index comes first
-        if (b[2] <= d[2]) {
-            print $1, $2
-        } else {
-            print $2, $1
-        }
-    }
-    ' 2_pair_bnd \
+    awk -F"[:-]" -v OFS="\t" '{ print $1, $2, $3, $4 }' 2_pair_bnd \
+    | orient --a 1,2 --b 3,4 \
+    | awk -F"\t" '{ print $1 ":" $2 "-" $3 ":" $4 }' \
     | sort -t ':' -k1,1 \
     > 3_pair_bnd.sort
 
@@ -44,15 +44,16 @@ for sample in "${SAMPLES[@]}"; do
     fi
 
     # 3) Intermediate files:
-    #    - SV_BEDPE: all SVs converted to bedpe (CSV)
+    #    - SV_BEDPE: BND records converted to bedpe (CSV; -svtype BND filters at parse time)
     #    - BND_STRAND_SRC: only BND from bedpe, with strand info (TAB)
     SV_BEDPE="${OUT_DIR}/${sample}_sv.bedpe"                          # CSV
     BND_STRAND_SRC="${OUT_DIR}/${sample}_bnd_with_strand_source.bedpe" # TAB, 12 columns
 
-    echo "[INFO] (${sample}) 1/3: Converting VCF to bedpe (all SV types)"
+    echo "[INFO] (${sample}) 1/3: Converting VCF to bedpe (BND only)"
     "${VCF2BED_PATH}/longrange_vcf_to_bedpe.py" \
         -input "${SV_VCF}" \
-        -out "${SV_BEDPE}"
+        -out "${SV_BEDPE}" \
+        -svtype BND
 
     echo "[INFO] (${sample}) 2/3: Extracting BND with strand information from bedpe"
 
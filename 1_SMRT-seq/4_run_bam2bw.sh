@@ -30,6 +30,15 @@ mkdir -p "${OUT_DIR}"
 shopt -s nullglob
 BAMS=("${PBMM2_DIR}"/*_hg38_chr1_22xym.bam)
 
+# Stage runner (run_stages.py): only the samples in TF_SAMPLES
+if [[ -n "${TF_SAMPLES:-}" ]]; then
+  read -ra _only <<< "${TF_SAMPLES}"
+  BAMS=()
+  for s in "${_only[@]}"; do
+    [[ -f "${PBMM2_DIR}/${s}_hg38_chr1_22xym.bam" ]] && BAMS+=("${PBMM2_DIR}/${s}_hg38_chr1_22xym.bam")
+  done
+fi
+
 if [[ ${#BAMS[@]} -eq 0 ]]; then
   echo "[ERROR] No BAMs found in: ${PBMM2_DIR}"
   echo "        Expected pattern: *_hg38_chr1_22xym.bam"
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Breakend normalization in one streaming pass per sample.
+
+Replaces the awk / sed / sort / inline-pandas chain of
+  1_SMRT-seq/2_build_bnd_pairs.sh       (1_bnd_ID, 2_pair_bnd, 3_pair_bnd.sort, <s>_bnd.bed)
+  1_SMRT-seq/3_build_bnd_with_strand.sh (<s>_sv.bedpe, <s>_bnd_with_strand_source.bedpe,
+                                         <s>_bnd_with_strand.bed)
+  6_Integration/1_trans_tsv.sh          (*.tmp, <s>_*_translocation*.bed, TSVs)
+with the same rules, except that chromosome order is the karyotype rank
+(chr1 < chr2 < ... < chr10 < ... < chrX < chrY, 6_Integration/karyotype.py)
+instead of the awk string comparison (where chr10 < chr2):
+
+  Long-read (pbsv VCF, read once):
+    1) BND records (first INFO tag SVTYPE=BND) whose pbsv ID
+       (pbsv.BND.chrA:posA-chrB:posB) joins two different chromosomes
+    2) reciprocal pairs (A-B / B-A) kept once, first occurrence
+    3) chromosome order normalized, pairs sorted by chrA (then whole pair)
+    4) strands from the bracketed ALT of every BND record, looked up by
+       chr1:pos1:chr2:pos2 (reverse key -> strands swapped; no match -> dropped)
+    5) inter-chromosomal pairs, chromosome order normalized with strands
+  Hi-C (predictSV 5K_combined):
+    inter-chromosomal calls, sorted by chr1, pos1, order normalized
+    (orientation swapped with the breakpoints)
+
+Outputs (per sample) in 6_Integration/1_trans_tsv/<sample>/:
+  <sample>_longread.tsv   source  id  sample  chrA  posA  chrB  posB  strandA  strandB
+  <sample>_hic.tsv        source  id  sample  chrA  posA  chrB  posB  strandA  strandB
+  each with a typed Feather sidecar <tsv>.feather when pyarrow is installed
+  (fixed schema + TSV content hash, see 6_Integration/sv_table.py)
+
+With --keep-intermediate the former intermediate files are also written:
+  1_SMRT-seq/5-bnd_pairs/<sample>/{1_bnd_ID,2_pair_bnd,3_pair_bnd.sort,<sample>_bnd.bed}
+  1_SMRT-seq/6-bnd_with_strand/<sample>_bnd_with_strand.bed
+  6_Integration/1_trans_tsv/<sample>/<sample>_hic_translocation.bed
+  6_Integration/1_trans_tsv/<sample>/<sample>_longread_translocation_with_strand.bed
+  6_Integration/1_trans_tsv/<sample>/<sample>_longread_translocation.bed
+
+Usage:
+  python3 1_SMRT-seq/bnd_normalize.py [--samples PT1 PT2 ...] [--keep-intermediate] [--jobs N]
+                                      [--chrom-sizes FILE]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import traceback
+
+from longrange_vcf_to_bedpe import (
+    VcfState, clean_vcf_line_fast, open_variant_file, validate_fields,
+)
+
+# shared chromosome order and TSV sidecars (6_Integration/karyotype.py, sv_table.py)
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "6_Integration"))
+from karyotype import load_karyotype
+from sv_table import write_tsv_sidecar
+
+SAMPLES = ["KMS11","LP1","MM1S","RPMI8226","U266","PT1","PT2","PT3"]
+
+
+###############################################################################
+# Utils
+###############################################################################
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+def write_lines(path, rows):
+    with open(path, "w") as out:
+        for r in rows:
+            out.write("\t".join(map(str, r)) + "\n")
+
+
+###############################################################################
+# Long-read: pbsv VCF -> BND pairs with strands
+###############################################################################
+
+def scan_pbsv_vcf(vcf_path):
+    """
+    One pass over the filtered pbsv VCF.
+    Returns (bnd_ids, strands):
+      bnd_ids  "chrA:posA-chrB:posB" of inter-chromosomal BND records, file order
+      strands  {(chr1, pos1, chr2, pos2): (strand1, strand2)} of all BND records
+               (chr-prefixed names, positions as text; last record wins)
+    """
+    bnd_ids = []
+    strands = {}
+    state = VcfState()
+
+    f, _ = open_variant_file(vcf_path)
+    with f:
+        for line in f:
+            if line[:1] == "#" or not line.strip():
+                continue
+            fields = line.strip().split(None, 8)
+            validate_fields(fields, line, True)
+
+            # BND pair from the pbsv ID (first INFO tag must be SVTYPE=BND)
+            if fields[7].split(";")[0] == "SVTYPE=BND":
+                sv_id = fields[2]
+                id_parts = sv_id.split("-")
+                chr2 = id_parts[1].split(":")[0] if len(id_parts) > 1 else ""
+                if fields[0] != chr2:
+                    dot_parts = sv_id.split(".")
+                    bnd_ids.append(dot_parts[2] if len(dot_parts) > 2 else "")
+
+            if line.find("BND") == -1:
+                continue
+            # strands from the breakend ALT
+            for row, _suffix in clean_vcf_line_fast(fields, line, state):
+                chrom1, start1, _, chrom2, start2, _, _, _, s1, s2, variant_type, _ = row
+                if variant_type == "BND":
+                    strands[(f"chr{chrom1}", str(start1), f"chr{chrom2}", str(start2))] = (s1, s2)
+
+    return bnd_ids, strands
+
+def dedup_reciprocal(bnd_ids):
+    """Keep (A-B) / (B-A) once; output as the sorted pair, first-seen order."""
+    seen = set()
+    pairs = []
+    for row in bnd_ids:
+        parts = row.split("-")
+        if len(parts) != 2:
+            continue
+        key = tuple(sorted(parts))
+        if key not in seen:
+            seen.add(key)
+            pairs.append(f"{key[0]}-{key[1]}")
+    return pairs
+
+def order_and_sort_pairs(pairs, karyo):
+    """Smaller chromosome (karyotype rank) first, then sort by chrA (ties: whole pair), as sort -t ':' -k1,1."""
+    if not pairs:
+        return []
+    ends = [p.split("-") for p in pairs]
+    swap = karyo.swap_mask([l.split(":")[0] for l, _ in ends],
+                           [r.split(":")[0] for _, r in ends])
+    out = [f"{r}-{l}" if sw else f"{l}-{r}" for (l, r), sw in zip(ends, swap.tolist())]
+    out.sort(key=lambda x: (x.split(":")[0], x))
+    return out
+
+def attach_strands(bed_rows, strands, sample):
+    """(chr1, pos1, chr2, pos2) -> + (strand1, strand2); reverse key swaps strands."""
+    out = []
+    for chr1, pos1, chr2, pos2 in bed_rows:
+        s = strands.get((chr1, pos1, chr2, pos2))
+        if s is not None:
+            out.append((chr1, pos1, chr2, pos2, s[0], s[1]))
+            continue
+        s = strands.get((chr2, pos2, chr1, pos1))
+        if s is not None:
+            out.append((chr1, pos1, chr2, pos2, s[1], s[0]))
+            continue
+        sys.stderr.write(f"WARNING: [{sample}] no strand found for {chr1} {pos1} {chr2} {pos2}\n")
+    return out
+
+def longread_rows(bnd_with_strand, karyo):
+    """Inter-chromosomal pairs, chrA <= chrB by karyotype rank (strands swapped with breakpoints)."""
+    inter = [r for r in bnd_with_strand if r[0] != r[2]]
+    if not inter:
+        return []
+    swap = karyo.swap_mask([r[0] for r in inter], [r[2] for r in inter])
+    out = []
+    for (chr1, pos1, chr2, pos2, s1, s2), sw in zip(inter, swap.tolist()):
+        if sw:
+            out.append((chr2, pos2, s2, chr1, pos1, s1))
+        else:
+            out.append((chr1, pos1, s1, chr2, pos2, s2))
+    return out
+
+
+###############################################################################
+# Hi-C: predictSV -> normalized translocations
+###############################################################################
+
+def hic_rows(hic_src, karyo):
+    """
+    predictSV columns: chr1 chr2 ori pos1 pos2 ...
+    Returns (chrA, posA, chrB, posB, ori) of inter-chromosomal calls,
+    sorted by chr1 then pos1 (as sort -k1,1 -k2,2n), order normalized.
+    """
+    raw = []
+    with open(hic_src) as f:
+        for line in f:
+            c = line.split()
+            if len(c) < 5 or c[0] == c[1]:
+                continue
+            raw.append((c[0], c[3], c[1], c[4], c[2]))
+    if not raw:
+        return []
+
+    def pos_key(p):
+        try:
+            return float(p)
+        except ValueError:
+            return 0.0
+    raw.sort(key=lambda r: (r[0], pos_key(r[1]), "\t".join(r)))
+
+    swap = karyo.swap_mask([r[0] for r in raw], [r[2] for r in raw])
+    out = []
+    for (chr1, pos1, chr2, pos2, ori), sw in zip(raw, swap.tolist()):
+        s1, s2 = ori[0:1], ori[1:2]
+        if sw:
+            out.append((chr2, pos2, chr1, pos1, s2 + s1))
+        else:
+            out.append((chr1, pos1, chr2, pos2, s1 + s2))
+    return out
+
+
+###############################################################################
+# Per sample
+###############################################################################
+
+def hic_source_path(root_dir, sample):
+    return os.path.join(root_dir, "2_HiC", "7_predictSV", sample,
+                        f"{sample}.predictsv.txt.CNN_SVs.5K_combined.txt")
+
+def normalize_sample(root_dir, sample, keep_intermediate=False, chrom_sizes=None):
+    smrt_dir = os.path.join(root_dir, "1_SMRT-seq")
+    vcf_path = os.path.join(smrt_dir, "4-filtersv", f"{sample}_SVs_hg38.vcf")
+    out_dir  = os.path.join(root_dir, "6_Integration", "1_trans_tsv", sample)
+    os.makedirs(out_dir, exist_ok=True)
+    karyo = load_karyotype(chrom_sizes)
+
+    # ---- Hi-C ----
+    hic_src = hic_source_path(root_dir, sample)
+    if not os.path.exists(hic_src):
+        sys.stderr.write(f"[WARN] {sample}: Hi-C source file not found: {hic_src}, skip Hi-C.\n")
+    else:
+        hic = hic_rows(hic_src, karyo)
+        if keep_intermediate:
+            write_lines(os.path.join(out_dir, f"{sample}_hic_translocation.bed"), hic)
+        write_lines(os.path.join(out_dir, f"{sample}_hic.tsv"), (
+            ("hic", f"HIC_{i}", sample, chrA, posA, chrB, posB, ori[0:1], ori[1:2])
+            for i, (chrA, posA, chrB, posB, ori) in enumerate(hic, 1)
+        ))
+        write_tsv_sidecar(os.path.join(out_dir, f"{sample}_hic.tsv"))
+
+    # ---- Long-read ----
+    if not os.path.exists(vcf_path):
+        sys.stderr.write(f"[WARN] {sample}: SV VCF not found: {vcf_path}, skip long-read.\n")
+        return
+
+    bnd_ids, strands = scan_pbsv_vcf(vcf_path)
+    pairs = dedup_reciprocal(bnd_ids)
+    sorted_pairs = order_and_sort_pairs(pairs, karyo)
+    bed = [tuple(p.replace(":", "\t").replace("-", "\t").split("\t")) for p in sorted_pairs]
+    bnd_with_strand = attach_strands(bed, strands, sample)
+    lr = longread_rows(bnd_with_strand, karyo)
+
+    if keep_intermediate:
+        pair_dir = os.path.join(smrt_dir, "5-bnd_pairs", sample)
+        strand_dir = os.path.join(smrt_dir, "6-bnd_with_strand")
+        os.makedirs(pair_dir, exist_ok=True)
+        os.makedirs(strand_dir, exist_ok=True)
+        write_lines(os.path.join(pair_dir, "1_bnd_ID"), ((x,) for x in bnd_ids))
+        write_lines(os.path.join(pair_dir, "2_pair_bnd"), ((x,) for x in pairs))
+        write_lines(os.path.join(pair_dir, "3_pair_bnd.sort"), ((x,) for x in sorted_pairs))
+        write_lines(os.path.join(pair_dir, f"{sample}_bnd.bed"), bed)
+        write_lines(os.path.join(strand_dir, f"{sample}_bnd_with_strand.bed"), bnd_with_strand)
+        write_lines(os.path.join(out_dir, f"{sample}_longread_translocation_with_strand.bed"), lr)
+        write_lines(os.path.join(out_dir, f"{sample}_longread_translocation.bed"),
+                    ((r[0], r[1], r[3], r[4]) for r in lr))
+
+    write_lines(os.path.join(out_dir, f"{sample}_longread.tsv"), (
+        ("longread", f"LR_{i}", sample, chrA, posA, chrB, posB, sA, sB)
+        for i, (chrA, posA, sA, chrB, posB, sB) in enumerate(lr, 1)
+    ))
+    write_tsv_sidecar(os.path.join(out_dir, f"{sample}_longread.tsv"))
+    sys.stderr.write(f"[INFO] {sample}: {len(lr)} long-read translocations -> {out_dir}\n")
+
+def normalize_sample_logged(args):
+    root_dir, sample, keep, chrom_sizes = args
+    try:
+        normalize_sample(root_dir, sample, keep, chrom_sizes)
+        return sample, None
+    except Exception:
+        return sample, traceback.format_exc()
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Normalize long-read (pbsv) and Hi-C (predictSV) translocations to TSV.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--keep-intermediate", action="store_true",
+                        help="also write the former intermediate BED/pair files")
+    parser.add_argument("--jobs", type=int, default=1, help="samples in parallel")
+    parser.add_argument("--chrom-sizes", default=None,
+                        help="chrom.sizes defining chromosome order (default: built-in hg38)")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    tasks = [(root_dir, s, args.keep_intermediate, args.chrom_sizes) for s in args.samples]
+    if args.jobs > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            results = pool.map(normalize_sample_logged, tasks, chunksize=1)
+    else:
+        results = [normalize_sample_logged(t) for t in tasks]
+
+    failed = [s for s, err in results if err]
+    for s, err in results:
+        if err:
+            sys.stderr.write(f"[ERROR] {s}: failed\n{err}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
-#! /usr/bin/env python
+#! /usr/bin/env python3
 import argparse
 import gzip
+import io
+import os
+import re
+from array import array
+from itertools import chain
 
 # the standard .isdigit() does not work for negative numbers
 # and sometimes alternative chromosomes in Lumpy will have an interval that extends to -1
 
+CSV_HEADER = "chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n"
+
+# number of data (non-#) lines read ahead to decide the input format
+SNIFF_DATA_LINES = 1000
+
+# VCF record readers: compiled (htslib) when installed, plain text otherwise
+VCF_BACKENDS = ["auto", "cyvcf2", "pysam", "python"]
+
 def is_digit(number):
     try:
         int(number)
@@ -12,437 +25,614 @@ def is_digit(number):
     except ValueError:
         return False
 
-def run(args):
 
-    is_vcf_file = False
-    is_csv_file = False
-    is_a_lumpy_file = True
-    contains_possible_numreads_column = True
+class InputError(Exception):
+    pass
 
-    ID_names = set()
 
-    line_counter = 0
+def open_variant_file(path):
+    """
+    Open plain, gzip or bgzip (multi-member gzip) input as a text stream.
+    Compression is detected from the binary magic bytes, not from a text read.
+    Returns (text stream, is_gzipped).
+    """
+    raw = open(path, "rb")
+    is_gzipped = raw.peek(2)[:2] == b"\x1f\x8b"
+    if is_gzipped:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline=None), is_gzipped
 
-    is_gzipped = False
-    
-    f = open(args.input)
-    header = f.readline()
-    # If file is gzipped, close it and open using gzip
-    # if header[0:4]=="\x1f\x8b\x08\x08":
-    if header[0:2]=="\x1f\x8b":
-        # print "Variant file is gzipped"
-        f.close()
-        is_gzipped = True
-        f = gzip.open(args.input)
-    else:
-        # print "Variant file is not gzipped"
-        if header == "chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n":
-            is_csv_file = True
-        f.close()
-        f = open(args.input)
-    
-    if is_csv_file:
-        f.readline()
 
+def read_prefix(f):
+    """
+    Read the header and up to SNIFF_DATA_LINES data lines.
+    Returns the list of lines read (they are replayed before the rest of f).
+    """
+    prefix = []
+    n_data = 0
     for line in f:
-        if line[0] == "#":
-            if line.find("VCF") != -1:
-                is_vcf_file = True
-                print "NOTE: Contains 'VCF' in a header row (starting with #), so treating it like a VCF file."
+        prefix.append(line)
+        if line[:1] != "#" and line.strip():
+            n_data += 1
+            if n_data >= SNIFF_DATA_LINES:
+                break
+    return prefix
+
+
+def sniff_format(prefix):
+    """
+    Format from the bounded prefix: "csv", "vcf", "lumpy", "sniffles" or None.
+    Same precedence as the full-file checks: csv > vcf > lumpy > sniffles.
+    lumpy/sniffles are re-checked on every line during conversion.
+    """
+    if prefix and prefix[0] == CSV_HEADER:
+        return "csv"
+    for line in prefix:
+        if line[0] == "#" and line.find("VCF") != -1:
+            print("NOTE: Contains 'VCF' in a header row (starting with #), so treating it like a VCF file.")
+            return "vcf"
+    flags = BedpeFlags()
+    for line in prefix:
+        if line[:1] == "#" or not line.strip():
             continue
-        fields = line.strip().split()
-        if is_csv_file:
-            fields = line.strip().split(",")
+        flags.update(line.strip().split())
+    return flags.format()
 
-        # For both VCF and bedpe files:
 
-        # fields[1] is a position, check it's a number
-        if not is_digit(fields[1]):
-            print "ERROR: Column 2 must be a genomic position, but it is not a number:", fields[1]
-            print line
-            return
+class BedpeFlags:
+    """Lumpy (STRANDS tag in column 13) / Sniffles (numreads in column 12) evidence."""
 
-        if is_vcf_file: # For VCF files only
-            ID_names.add(fields[2])
-        else:
-            # For bedpe files only:
-            if len(fields) < 12:
-                print "ERROR: Variant file (except vcf) must have at least 12 columns. Use output from Lumpy or Sniffles"
-                return
-
-            # fields[0] is a chromosome name
-
-            # fields[2] is a position, check it's a number
-            
-            if not is_digit(fields[2]):
-                print "ERROR: Column 3 must be a genomic position, but it is not a number:", fields[2]
-                return
-
-            # fields[3] is a chromosome name
-            
-            # fields[4] and fields[5] are positions, check they are numbers        
-            if not is_digit(fields[4]):
-                print "ERROR: Column 5 must be a genomic position, but it is not a number:", fields[4]
-                return
-            if not is_digit(fields[5]):
-                print "ERROR: Column 6 must be a genomic position, but it is not a number:", fields[5]
-                return
-
-            # fields[6] is the ID name, this is standardized as a count in each of the clean_* functions
-            ID_names.add(fields[6])
-
-            # fields[7] is a score that we don't use, so ignore this column
-
-            # fields[8] and fields[9] are strands, so check they are + and -
-            if fields[8] not in ["+","-"] or fields[9] not in ["+","-"]:
-                print "ERROR: Columns 9 and 10 must only contain + or -"
-                return
-
-            # fields[10] is a variant type, ignore this for now
-            #################################################################################################
-            
-            #########################  see if we can find the number of split reads  ########################
-
-            # fields[11] should be num_reads, we can fill this in from a Lumpy file through fields[12] (see next step)
-            if not fields[11].isdigit():
-                contains_possible_numreads_column = False
-
-            # fields[12] contains info about STRANDS (including number of reads of support for each one) if this is a Lumpy output file
-            if len(fields) < 13:
-                is_a_lumpy_file = False
-            elif fields[12].find("STRANDS") == -1:
-                is_a_lumpy_file = False
-
-        #################################################################################################
-        line_counter += 1
-
-    f.close()
-
-
-    overwrite_ID_names = False
-    if len(ID_names) != line_counter:
-        overwrite_ID_names = True
-        print "NOTE: IDs are not unique, replacing with numbers"
-
-    if is_csv_file:
-        print "CSV file"
-        parse_csv_file(args,overwrite_ID_names=overwrite_ID_names,is_gzipped = is_gzipped)
-    elif is_vcf_file:
-        print "VCF file"
-        clean_vcf(args,overwrite_ID_names=overwrite_ID_names,is_gzipped = is_gzipped)
-    elif is_a_lumpy_file:
-        print "Lumpy bedpe file"
-        clean_lumpy(args,overwrite_ID_names=overwrite_ID_names, is_gzipped = is_gzipped)
-    elif contains_possible_numreads_column:
-        print "Sniffles bedpe file"
-        clean_sniffles(args,overwrite_ID_names=overwrite_ID_names, is_gzipped = is_gzipped)
-    else:
-        print "ERROR: This file needs column 12 to have the number of split reads supporting each variant, or it can be a Lumpy output file with the STRANDS tag included within column 13. This file has neither."
+    def __init__(self):
+        self.is_a_lumpy_file = True
+        self.contains_possible_numreads_column = True
+
+    def update(self, fields):
+        # fields[11] should be num_reads, we can fill this in from a Lumpy file through fields[12] (see next step)
+        if len(fields) > 11 and not fields[11].isdigit():
+            self.contains_possible_numreads_column = False
+        # fields[12] contains info about STRANDS (including number of reads of support for each one) if this is a Lumpy output file
+        if len(fields) < 13:
+            self.is_a_lumpy_file = False
+        elif fields[12].find("STRANDS") == -1:
+            self.is_a_lumpy_file = False
+
+    def format(self):
+        if self.is_a_lumpy_file:
+            return "lumpy"
+        if self.contains_possible_numreads_column:
+            return "sniffles"
+        return None
+
+
+def validate_fields(fields, line, is_vcf_file):
+    """Per-line checks (raise InputError), done while converting."""
+
+    # fields[1] is a position, check it's a number
+    if len(fields) < 2 or not is_digit(fields[1]):
+        raise InputError("ERROR: Column 2 must be a genomic position, but it is not a number: %s\n%s"
+                         % (fields[1] if len(fields) > 1 else "", line))
+
+    if is_vcf_file:
         return
 
-def remove_chr(chromosome):
-    if chromosome[0:3] in ["chr","Chr","CHR"]:
-        chromosome = chromosome[3:]
-    return chromosome
+    # For bedpe files only:
+    if len(fields) < 12:
+        raise InputError("ERROR: Variant file (except vcf) must have at least 12 columns. Use output from Lumpy or Sniffles")
 
-def parse_csv_file(args,overwrite_ID_names,is_gzipped):
-    f = None
-    if is_gzipped == True:
-        f = gzip.open(args.input)
-    else:
-        f = open(args.input)
+    # fields[0] is a chromosome name
 
-    fout = open(args.out,"w")
-    fout.write("chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n")
+    # fields[2] is a position, check it's a number
+    if not is_digit(fields[2]):
+        raise InputError("ERROR: Column 3 must be a genomic position, but it is not a number: %s" % fields[2])
 
-    f.readline()
+    # fields[3] is a chromosome name
 
-    ID_counter = 1
-    for line in f:
-        fields = line.strip().split(",")
-        fields[0] = remove_chr(fields[0])
-        fields[3] = remove_chr(fields[3])
-        if overwrite_ID_names:
-            fields[6] = ID_counter
-        ID_counter += 1
-        fields_to_output = fields[0:12]
-        fout.write(",".join(map(str,fields_to_output)) + "\n")
-    f.close()
-    fout.close()
-
-
-def clean_sniffles(args,overwrite_ID_names,is_gzipped = False):
-    f = None
-    if is_gzipped == True:
-        f = gzip.open(args.input)
-    else:
-        f = open(args.input)
+    # fields[4] and fields[5] are positions, check they are numbers
+    if not is_digit(fields[4]):
+        raise InputError("ERROR: Column 5 must be a genomic position, but it is not a number: %s" % fields[4])
+    if not is_digit(fields[5]):
+        raise InputError("ERROR: Column 6 must be a genomic position, but it is not a number: %s" % fields[5])
 
-    fout = open(args.out,"w")
-    fout.write("chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n")
+    # fields[6] is the ID name, this is standardized as a count in each of the clean_* functions
 
-    ID_counter = 1
-    for line in f:
-        if line[0] == "#":
-            continue
-        fields = line.strip().split()
-        fields[0] = remove_chr(fields[0])
-        fields[3] = remove_chr(fields[3])
-        if overwrite_ID_names:
-            fields[6] = ID_counter
-        ID_counter += 1
-        fields_to_output = fields[0:12]
-        fout.write(",".join(map(str,fields_to_output)) + "\n")
-    f.close()
-    fout.close()
-
-
-def clean_lumpy(args,overwrite_ID_names, is_gzipped = False):
-    
-    f = None
-    if is_gzipped == True:
-        f = gzip.open(args.input)
-    else:
-        f = open(args.input)
+    # fields[7] is a score that we don't use, so ignore this column
 
-    fout = open(args.out,"w")
+    # fields[8] and fields[9] are strands, so check they are + and -
+    if fields[8] not in ["+","-"] or fields[9] not in ["+","-"]:
+        raise InputError("ERROR: Columns 9 and 10 must only contain + or -")
 
-    fout.write("chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n")
 
-    ID_counter = 1
-    for line in f:
-        if line[0] == "#":
-            continue
-        fields = line.strip().split()
-        if fields[7] == ".":
-            fields[7] = 0
-        fields[0] = remove_chr(fields[0])
-        fields[3] = remove_chr(fields[3])
-        ID_field = fields[6]
-        num_reads = None
-        for tag in fields[12].split(";"):
-            if len(tag.split("=")) == 2:
-                name,value = tag.split("=")
-                if name == "STRANDS":
-                    # Lumpy files can have multiple sets of strands for the same variant, we take these apart so ++ and +- versions of a variant each get their own line
-                    strand_info = value.split(",")
-                    for num in strand_info:
-                        strand1 = num[0]
-                        strand2 = num[1]
-                        if len(num) > 2:
-                            num_reads = int(num[3:])
-                        fields[8] = strand1
-                        fields[9] = strand2
-                        fields[11] = num_reads
-                        if overwrite_ID_names:
-                            fields[6] = ID_counter
-                        else:
-                            fields[6] = ID_field + strand1 + strand2 # add strands to make the variants unique after splitting a variant into multiple lines with different strands
-                        fields_to_output = fields[0:12]
-                        ID_counter += 1
-                        fout.write(",".join(map(str,fields_to_output)) + "\n")
-    f.close()
-    fout.close()
-
-
-def clean_vcf(args,overwrite_ID_names, is_gzipped = False):
-    
-    f = None
-    if is_gzipped == True:
-        f = gzip.open(args.input)
-    else:
-        f = open(args.input)
+def run(args):
+    f, is_gzipped = open_variant_file(args.input)
+    try:
+        prefix = read_prefix(f)
+        fmt = sniff_format(prefix)
+        if fmt is None:
+            print("ERROR: This file needs column 12 to have the number of split reads supporting each variant, or it can be a Lumpy output file with the STRANDS tag included within column 13. This file has neither.")
+            return
+
+        lines = chain(prefix, f)
+        if fmt == "vcf":
+            backend = resolve_vcf_backend(args.backend)
+            if backend != "python":
+                print("NOTE: reading VCF records with %s" % backend)
+                lines = iter_vcf_records(args.input, backend, args.svtype)
+        result = convert(lines, fmt, args.out, args.svtype)
+    except InputError as e:
+        print(e)
+        if os.path.exists(args.out):
+            os.remove(args.out)
+        return
+    finally:
+        f.close()
+
+    # Lumpy/Sniffles are decided from the prefix; if a later line contradicts it,
+    # redo the conversion with the format the whole file supports (rare).
+    if result["final_format"] != fmt:
+        if result["final_format"] is None:
+            print("ERROR: This file needs column 12 to have the number of split reads supporting each variant, or it can be a Lumpy output file with the STRANDS tag included within column 13. This file has neither.")
+            os.remove(args.out)
+            return
+        print("NOTE: Format guessed from the first lines does not hold for the whole file, re-reading as %s" % result["final_format"])
+        f, _ = open_variant_file(args.input)
+        try:
+            result = convert(f, result["final_format"], args.out, args.svtype)
+        finally:
+            f.close()
+
+    if result["overwrite_ID_names"]:
+        print("NOTE: IDs are not unique, replacing with numbers")
+        renumber_ids(args.out, result["strand_suffix_rows"], result["row_numbers"])
+
+    print({"csv": "CSV file", "vcf": "VCF file", "lumpy": "Lumpy bedpe file",
+           "sniffles": "Sniffles bedpe file"}[result["final_format"]])
+    for msg in result["messages"]:
+        print(msg)
+
+
+def convert(lines, fmt, out_path, svtype=None):
+    """
+    Validate and convert every line in one pass, writing out_path.
+    IDs are written as found; if they turn out not to be unique,
+    renumber_ids() rewrites the ID column of the (small) output afterwards.
+
+    svtype: keep only output rows whose variant_type equals it (e.g. BND).
+    Lines that cannot produce such a row (svtype not in the line) are only
+    validated and counted for ID uniqueness, not parsed.
+    """
+    is_vcf_file = fmt == "vcf"
+    is_csv_file = fmt == "csv"
+    flags = BedpeFlags()
+    ID_names = set()
+    line_counter = 0
+    state = VcfState()
+    converter = {"csv": parse_csv_line, "vcf": clean_vcf_line_fast,
+                 "lumpy": clean_lumpy_line, "sniffles": clean_sniffles_line}[fmt]
+    # unfiltered output row number of every written row (for renumber_ids)
+    row_numbers = array("q")
+
+    with open(out_path, "w") as fout:
+        fout.write(CSV_HEADER)
+        out_row = 0
+        first = True
+        for line in lines:
+            if first:
+                first = False
+                if is_csv_file:
+                    continue
+            if line[:1] == "#" or not line.strip():
+                continue
+            if is_csv_file:
+                fields = line.strip().split(",")
+            elif is_vcf_file:
+                # only CHROM..INFO are used; do not split sample columns
+                fields = line.strip().split(None, 8)
+            else:
+                fields = line.strip().split()
+
+            validate_fields(fields, line, is_vcf_file)
+            ID_names.add(fields[2] if is_vcf_file else fields[6])
+            if not is_vcf_file:
+                flags.update(fields)
+            line_counter += 1
+
+            # ID-only stub of a record with another SVTYPE (iter_vcf_records)
+            if is_vcf_file and len(fields) == 3 and line.startswith(SVTYPE_STUB):
+                continue
+
+            if svtype and line.find(svtype) == -1:
+                continue
+
+            for fields_to_output, strand_suffix in converter(fields, line, state):
+                out_row += 1
+                if svtype and fields_to_output[10] != svtype:
+                    continue
+                if strand_suffix:
+                    state.strand_suffix_rows.append(out_row)
+                row_numbers.append(out_row)
+                fout.write(",".join(map(str, fields_to_output)) + "\n")
+
+    final_format = fmt
+    if fmt in ("lumpy", "sniffles"):
+        final_format = flags.format()
+
+    return {
+        "final_format": final_format,
+        "overwrite_ID_names": len(ID_names) != line_counter,
+        "strand_suffix_rows": state.strand_suffix_rows,
+        "row_numbers": row_numbers,
+        "messages": state.messages(out_row) if is_vcf_file else [],
+    }
+
+
+def renumber_ids(out_path, strand_suffix_rows, row_numbers):
+    """
+    Replace variant_name (column 7) with the 1-based output row number.
+    Rows split by strand keep their strand suffix (e.g. 12+-).
+    row_numbers gives the row number of each written row (differs from the
+    line index when -svtype dropped rows; then only parsed lines are counted).
+    """
+    suffix_rows = set(strand_suffix_rows)
+    tmp_path = out_path + ".tmp"
+    with open(out_path) as fin, open(tmp_path, "w") as fout:
+        fout.write(fin.readline())
+        for row, line in zip(row_numbers, fin):
+            fields = line.rstrip("\n").split(",")
+            fields[6] = str(row)
+            if row in suffix_rows:
+                fields[6] += fields[8] + fields[9]
+            fout.write(",".join(fields) + "\n")
+    os.replace(tmp_path, out_path)
+
+
+def remove_chr(chromosome):
+    if chromosome[0:3] in ["chr","Chr","CHR"]:
+        chromosome = chromosome[3:]
+    return chromosome
 
-    fout = open(args.out,"w")
 
-    fout.write("chrom1,start1,stop1,chrom2,start2,stop2,variant_name,score,strand1,strand2,variant_type,split\n")
+def parse_csv_line(fields, line, state):
+    fields[0] = remove_chr(fields[0])
+    fields[3] = remove_chr(fields[3])
+    yield fields[0:12], False
+
+
+def clean_sniffles_line(fields, line, state):
+    fields[0] = remove_chr(fields[0])
+    fields[3] = remove_chr(fields[3])
+    yield fields[0:12], False
+
+
+def clean_lumpy_line(fields, line, state):
+    if fields[7] == ".":
+        fields[7] = 0
+    fields[0] = remove_chr(fields[0])
+    fields[3] = remove_chr(fields[3])
+    ID_field = fields[6]
+    num_reads = None
+    for tag in fields[12].split(";"):
+        if len(tag.split("=")) == 2:
+            name,value = tag.split("=")
+            if name == "STRANDS":
+                # Lumpy files can have multiple sets of strands for the same variant, we take these apart so ++ and +- versions of a variant each get their own line
+                strand_info = value.split(",")
+                for num in strand_info:
+                    strand1 = num[0]
+                    strand2 = num[1]
+                    if len(num) > 2:
+                        num_reads = int(num[3:])
+                    fields[8] = strand1
+                    fields[9] = strand2
+                    fields[11] = num_reads
+                    fields[6] = ID_field + strand1 + strand2 # add strands to make the variants unique after splitting a variant into multiple lines with different strands
+                    yield list(fields[0:12]), False
+
+
+class VcfState:
+    """Counters and warnings collected across VCF lines."""
+
+    def __init__(self):
+        self.variant_type_list = set()
+        self.strand_fail_examples = []
+        self.n_strand_fail = 0
+        self.strand_suffix_rows = []
+
+    def messages(self, n_rows):
+        msgs = []
+        if self.n_strand_fail > 0:
+            msgs.append("WARNING: No strand info for records. Variants will be ignored by visualizer:")
+            msgs.extend(self.strand_fail_examples)
+            msgs.append("Total variants affected: %d  out of  %d  total variants" % (self.n_strand_fail, n_rows + 1))
+            msgs.append("You can specify strands among the other tags in the vcf file's info field, for example: STRANDS=+-:5; where 5 is the number of split reads")
+            msgs.append("Visualizer will ignore these variants where it could not guess the strands from the variant types")
+        msgs.append("All variant types: " + ",".join(self.variant_type_list))
+        return msgs
+
+
+def resolve_vcf_backend(name):
+    """Pick the VCF record reader; auto = cyvcf2, then pysam, then python."""
+    candidates = ["cyvcf2", "pysam"] if name == "auto" else [name]
+    for backend in candidates:
+        if backend == "python":
+            return backend
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            if name != "auto":
+                raise InputError("ERROR: -backend %s requested but %s is not installed" % (name, name))
+    return "python"
+
+
+# "CHROM POS" of the ID-only stub lines of iter_vcf_records
+SVTYPE_STUB = "0\t0\t"
+
+
+def iter_vcf_records(path, backend, svtype=None):
+    """
+    VCF data lines read through htslib (threaded BGZF decompression).
+    With svtype, records whose SVTYPE is set to something else are skipped
+    before being formatted to text (their ID is still passed on, as a stub
+    line, for the ID-uniqueness check).
+    """
+    if backend == "cyvcf2":
+        from cyvcf2 import VCF
+        reader = VCF(path, threads=2)
+        get_svtype = lambda v: v.INFO.get("SVTYPE")
+        get_id = lambda v: v.ID or "."
+    else:
+        import pysam
+        reader = pysam.VariantFile(path, threads=2)
+        get_svtype = lambda v: v.info.get("SVTYPE")
+        get_id = lambda v: v.id or "."
+    try:
+        for v in reader:
+            if svtype:
+                t = get_svtype(v)
+                if t is not None and t != svtype:
+                    # enough for validate_fields + ID_names; dropped by the svtype filter
+                    yield SVTYPE_STUB + "%s\n" % get_id(v)
+                    continue
+            yield str(v)
+    finally:
+        reader.close()
+
+
+# INFO keys read by clean_vcf_line_fast (STRANDS/INV3/INV5 records use clean_vcf_line)
+VCF_INFO_KEYS = {"CHR2", "END", "SVTYPE", "SR", "BND_DEPTH", "CT"}
+# standard breakend ALT: t[p[  t]p]  ]p]t  [p[t  (both brackets the same)
+VCF_BND_ALT_RE = re.compile(r"^([^\[\]]*)([\[\]])([^\[\]]*)\2([^\[\]]*)$")
+
+
+def clean_vcf_line_fast(fields, line, state):
+    """
+    clean_vcf_line for the common records (pbsv/sniffles): one pass over
+    INFO with a key set lookup and one regex match on ALT. Records with
+    STRANDS, a non-standard ALT or INV3/INV5 flags go through
+    clean_vcf_line unchanged.
+    """
+    alt = fields[4]
+    info = fields[7]
+    if info.find("STRANDS") != -1 or info.find("INV") != -1:
+        yield from clean_vcf_line(fields, line, state)
+        return
 
+    strand1 = strand2 = ""
+    chrom1 = remove_chr(fields[0])
+    start1 = stop1 = fields[1]
+    chrom2 = chrom1
+    start2 = stop2 = 0
 
-    variant_type_list = set()
-    ID_counter = 1
-    strand_fail_list = []
-    for line in f:
-        if line[0] == "#":
+    if alt.find("]") != -1 or alt.find("[") != -1:
+        m = VCF_BND_ALT_RE.match(alt)
+        if m is None or (m.group(1) and m.group(4)) or m.group(3).find(":") == -1:
+            yield from clean_vcf_line(fields, line, state)
+            return
+        strand2 = "+" if m.group(2) == "]" else "-"
+        strand1 = "-" if not m.group(1) else "+"
+        remainder = m.group(3).split(":")
+        chrom2 = remove_chr(remainder[0])
+        start2 = stop2 = remainder[1]
+
+    ID_field = fields[2]
+    if ID_field[-2:] == "_2":
+        return
+    elif ID_field[-2:] == "_1":
+        ID_field = ID_field[:-2]
+
+    variant_type = alt
+    numreads = -1
+    special_CT_strand_code = None
+    for field in info.split(";"):
+        name, sep, value = field.partition("=")
+        # like clean_vcf_line: a field counts only with exactly one "="
+        if not sep or name not in VCF_INFO_KEYS or value.find("=") != -1:
             continue
-        fields = line.strip().split()
+        if name == "CHR2":
+            chrom2 = remove_chr(value)
+        elif name == "END":
+            start2 = stop2 = value
+        elif name == "SVTYPE":
+            variant_type = value
+        elif name == "CT":
+            special_CT_strand_code = value
+        else:  # SR, BND_DEPTH
+            numreads = value
+
+    state.variant_type_list.add(variant_type)
+
+    if strand1 == "" and strand2 == "":
+        if special_CT_strand_code != None:
+            strand1 = "-" if special_CT_strand_code[0] == "5" else "+"
+            strand2 = "-" if special_CT_strand_code[-1] == "5" else "+"
+        elif variant_type == "DEL" or variant_type == "INS":
+            strand1, strand2 = "+", "-"
+        elif variant_type == "DUP":
+            strand1, strand2 = "-", "+"
+        else:
+            state.n_strand_fail += 1
+            if len(state.strand_fail_examples) < 5:
+                state.strand_fail_examples.append(line.strip())
 
-        info_fields = fields[7].split(";")
+    yield [chrom1,start1,stop1,chrom2,start2,stop2,ID_field,0,strand1,strand2,variant_type,numreads], False
 
-        chrom1 = remove_chr(fields[0])
-        start1 = stop1 = fields[1]
 
-        chrom2 = chrom1
-        start2 = stop2 = 0
-        
-        ID_field = fields[2]
+def clean_vcf_line(fields, line, state):
 
-        # Lumpy VCF files end variant names in _1 and _2 to separate out the two breakpoints, so since we are using a bedpe style format, we consolidate the two breakpoints into a single entry
-        if ID_field[-2:] == "_2":
-            # print "Ignoring", ID_field
-            continue
-        elif ID_field[-2:] == "_1":
-            ID_field = ID_field[:-2]
-            # Cut off _1 suffix
-
-        
-        strand1 = ""
-        strand2 = ""
-        variant_type = fields[4]
-        strand_info = None
-        numreads = -1
-        special_inversion_flag = None
-        special_CT_strand_code = None
-        
-        if fields[4].find("]") != -1 or fields[4].find("[") != -1:
-            # print "_________________________________"
-            # print fields[4]
-            # Find index of first bracket
-            bracket1 = fields[4].find("]")
-            strand2 = "+"
-            if bracket1 == -1:
-                bracket1 = fields[4].find("[")
-                strand2 = "-"
-            
-            # Find index of second bracket
-            bracket2 = fields[4][bracket1+1:].find("]")
-            if bracket2 == -1:
-                bracket2 = fields[4][bracket1+1:].find("[")
-            bracket2 += bracket1 + 1
-
-            # print bracket1,bracket2
-            remainder = fields[4][bracket1+1:bracket2]
-            # print remainder
-            
-            if bracket1 == 0:
-                strand1 = "-"
-            elif bracket2 == len(fields[4])-1:
-                strand1 = "+"
-            else:
-                print "Not sure"
-
-
-            chrom2 = remove_chr(remainder.split(":")[0])
-            start2 = stop2 = remainder.split(":")[1]
-
-        for field in info_fields:
-            if len(field.split("=")) == 2:
-                name,value = field.split("=")
-                if name == "CHR2":
-                    chrom2 = remove_chr(value)
-                if name == "END":
-                    start2 = stop2 = value
-                if name == "STRANDS":
-                    strand_info = value
-                if name == "SVTYPE":
-                    variant_type = value
-                if name == "SR":
-                    numreads = value
-                if name == "BND_DEPTH":
-                    numreads = value
-                if name == "CT":
-                    special_CT_strand_code = value
-            else:
-                if field == "INV3":
-                    special_inversion_flag = "INV3"
-                elif field == "INV5":
-                    special_inversion_flag = "INV5"
+    info_fields = fields[7].split(";")
 
-        variant_type_list.add(variant_type)
+    chrom1 = remove_chr(fields[0])
+    start1 = stop1 = fields[1]
 
-        if strand_info != None:
-            strand_info_list = []
-            while strand_info[3:].find(":") != -1:
-                num = strand_info[0:strand_info[3:].find(":")+1]
-                if num[-1] == ",":
-                    num = num[0:-1]
-                strand_info_list.append(num)
-                strand_info = strand_info[strand_info[3:].find(":")+1:]
+    chrom2 = chrom1
+    start2 = stop2 = 0
 
-            strand_info_list.append(strand_info)
+    ID_field = fields[2]
 
-            # print strand_info_list
+    # Lumpy VCF files end variant names in _1 and _2 to separate out the two breakpoints, so since we are using a bedpe style format, we consolidate the two breakpoints into a single entry
+    if ID_field[-2:] == "_2":
+        return
+    elif ID_field[-2:] == "_1":
+        ID_field = ID_field[:-2]
+        # Cut off _1 suffix
+
+
+    strand1 = ""
+    strand2 = ""
+    variant_type = fields[4]
+    strand_info = None
+    numreads = -1
+    special_inversion_flag = None
+    special_CT_strand_code = None
+
+    if fields[4].find("]") != -1 or fields[4].find("[") != -1:
+        # Find index of first bracket
+        bracket1 = fields[4].find("]")
+        strand2 = "+"
+        if bracket1 == -1:
+            bracket1 = fields[4].find("[")
+            strand2 = "-"
+
+        # Find index of second bracket
+        bracket2 = fields[4][bracket1+1:].find("]")
+        if bracket2 == -1:
+            bracket2 = fields[4][bracket1+1:].find("[")
+        bracket2 += bracket1 + 1
+
+        remainder = fields[4][bracket1+1:bracket2]
+
+        if bracket1 == 0:
+            strand1 = "-"
+        elif bracket2 == len(fields[4])-1:
+            strand1 = "+"
+        else:
+            print("Not sure")
+
+
+        chrom2 = remove_chr(remainder.split(":")[0])
+        start2 = stop2 = remainder.split(":")[1]
+
+    for field in info_fields:
+        if len(field.split("=")) == 2:
+            name,value = field.split("=")
+            if name == "CHR2":
+                chrom2 = remove_chr(value)
+            if name == "END":
+                start2 = stop2 = value
+            if name == "STRANDS":
+                strand_info = value
+            if name == "SVTYPE":
+                variant_type = value
+            if name == "SR":
+                numreads = value
+            if name == "BND_DEPTH":
+                numreads = value
+            if name == "CT":
+                special_CT_strand_code = value
+        else:
+            if field == "INV3":
+                special_inversion_flag = "INV3"
+            elif field == "INV5":
+                special_inversion_flag = "INV5"
+
+    state.variant_type_list.add(variant_type)
+
+    if strand_info != None:
+        strand_info_list = []
+        while strand_info[3:].find(":") != -1:
+            num = strand_info[0:strand_info[3:].find(":")+1]
+            if num[-1] == ",":
+                num = num[0:-1]
+            strand_info_list.append(num)
+            strand_info = strand_info[strand_info[3:].find(":")+1:]
+
+        strand_info_list.append(strand_info)
+
+        for num in strand_info_list:
+            if strand1 == "" or len(strand_info_list)>1:
+                strand1 = num[0]
+            elif strand1 == num[0]:
+                pass
+            else:
+                print("strand1 not matching:", strand1, num[0])
 
-            for num in strand_info_list:
-                if strand1 == "" or len(strand_info_list)>1:
-                    strand1 = num[0]
-                elif strand1 == num[0]:
-                    # print "strand1 okay"
-                    pass
+            if strand2 == "" or len(strand_info_list)>1:
+                strand2 = num[1]
+            elif strand2 == num[1]:
+                pass
+            else:
+                print("strand2 not matching:", strand2, num[1])
+            if len(num) > 2:
+                numreads = int(num[3:])
+
+            new_ID = ID_field
+            split_by_strand = len(strand_info_list) > 1
+            if split_by_strand:
+                new_ID = ID_field + strand1 + strand2 # add strands to make the variants unique after splitting a variant into multiple lines with different strands
+            yield [chrom1,start1,stop1,chrom2,start2,stop2,new_ID,0,strand1,strand2,variant_type,numreads], split_by_strand
+    else:
+        if strand1 == "" and strand2 == "":
+            if special_CT_strand_code != None:
+                if special_CT_strand_code[0] == "5":
+                    strand1 = "-"
                 else:
-                    print "strand1 not matching:", strand1, num[0]
-                
-                if strand2 == "" or len(strand_info_list)>1:
-                    strand2 = num[1]
-                elif strand2 == num[1]:
-                    # print "strand2 okay"
-                    pass
+                    strand1 = "+"
+                if special_CT_strand_code[-1] == "5":
+                    strand2 = "-"
                 else:
-                    print "strand2 not matching:", strand2, num[1]
-                if len(num) > 2:
-                    numreads = int(num[3:])
-                if overwrite_ID_names:
-                    ID_field = ID_counter
-
-                new_ID = ID_field
-                if len(strand_info_list) > 1:
-                    new_ID = ID_field + strand1 + strand2 # add strands to make the variants unique after splitting a variant into multiple lines with different strands
-                fields_to_output = [chrom1,start1,stop1,chrom2,start2,stop2,new_ID,0,strand1,strand2,variant_type,numreads]
-                ID_counter += 1
-                fout.write(",".join(map(str,fields_to_output)) + "\n")
-        else:
-            if strand1 == "" and strand2 == "":
-                if special_CT_strand_code != None:
-                    if special_CT_strand_code[0] == "5":
-                        strand1 = "-"
-                    else:
-                        strand1 = "+"
-                    if special_CT_strand_code[-1] == "5":
-                        strand2 = "-"
-                    else:
-                        strand2 = "+"
+                    strand2 = "+"
+            else:
+                if variant_type == "DEL":
+                    strand1 = "+"
+                    strand2 = "-"
+                elif variant_type == "DUP":
+                    strand1 = "-"
+                    strand2 = "+"
+                elif variant_type == "INS":
+                    strand1 = "+"
+                    strand2 = "-"
+                elif variant_type == "INV" and special_inversion_flag != None:
+                    if special_inversion_flag == "INV3":
+                        strand1 = strand2 = "+"
+                    elif special_inversion_flag == "INV5":
+                        strand1 = strand2 = "-"
                 else:
-                    if variant_type == "DEL":
-                        strand1 = "+"
-                        strand2 = "-"
-                    elif variant_type == "DUP":
-                        strand1 = "-"
-                        strand2 = "+"
-                    elif variant_type == "INS":
-                        strand1 = "+"
-                        strand2 = "-"
-                    elif variant_type == "INV" and special_inversion_flag != None:
-                        if special_inversion_flag == "INV3":
-                            strand1 = strand2 = "+"
-                        elif special_inversion_flag == "INV5":
-                            strand1 = strand2 = "-"
-                    else:
-                        strand_fail_list.append(line.strip())
-                        
-            if overwrite_ID_names:
-                ID_field = ID_counter
-            fields_to_output = [chrom1,start1,stop1,chrom2,start2,stop2,ID_field,0,strand1,strand2,variant_type,numreads]
-            ID_counter += 1
-            fout.write(",".join(map(str,fields_to_output)) + "\n")
-
-    if len(strand_fail_list) > 0:
-        print "WARNING: No strand info for records. Variants will be ignored by visualizer:"
-        for i in xrange(min(5,len(strand_fail_list))):
-            print strand_fail_list[i]
-        print "Total variants affected:", len(strand_fail_list), " out of " , ID_counter , " total variants"
-        print "You can specify strands among the other tags in the vcf file's info field, for example: STRANDS=+-:5; where 5 is the number of split reads"
-        print "Visualizer will ignore these variants where it could not guess the strands from the variant types"
-
-
-    print "All variant types:", ",".join(variant_type_list)
+                    state.n_strand_fail += 1
+                    if len(state.strand_fail_examples) < 5:
+                        state.strand_fail_examples.append(line.strip())
+
+        yield [chrom1,start1,stop1,chrom2,start2,stop2,ID_field,0,strand1,strand2,variant_type,numreads], False
 
 def main():
     parser=argparse.ArgumentParser(description="Standardize variant bedpe file to fit for SplitThreader input")
-    parser.add_argument("-input",help="Variant calls in bedpe or vcf format",dest="input",required=True)
+    parser.add_argument("-input",help="Variant calls in bedpe, vcf, vcf.gz or bgzip format",dest="input",required=True)
     parser.add_argument("-out",help="Output filename",dest="out",required=True)
+    parser.add_argument("-svtype",help="Only write records of this variant_type (e.g. BND)",dest="svtype",default=None)
+    parser.add_argument("-backend",help="VCF record reader: auto (cyvcf2, then pysam, then python), cyvcf2, pysam or python",
+                        dest="backend",choices=VCF_BACKENDS,default="auto")
     parser.set_defaults(func=run)
     args=parser.parse_args()
     args.func(args)
 
 if __name__=="__main__":
     main()
-
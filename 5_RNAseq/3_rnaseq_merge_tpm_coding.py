@@ -1,14 +1,20 @@
 #!/usr/bin/env python
 
-import pandas as pd
+import argparse
 import glob
+import importlib.util
+import multiprocessing
 import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 
 ###############################################################################
 # RNA-seq Step 3
 #   For each sample:
-#     1) Merge all StringTie *.tpm files (all replicates)
-#     2) Compute mean Coverage, FPKM and TPM per gene
+#     1) Stream all StringTie *.tpm files (all replicates), one at a time
+#     2) Compute mean Coverage, FPKM and TPM per gene (running sums / counts)
 #     3) Save full gene table
 #     4) Filter to coding genes using a coding-gene BED file (4th column = gene ID)
 #
@@ -17,7 +23,27 @@ import os
 #
 # Outputs:
 #   7_stringtie_tpm/<sample>/<sample>_average_tpm_fpkm_final.tsv
-#   7_stringtie_tpm/<sample>/<sample>_coding_genes_tpm_fpkm.tsv
+#   7_stringtie_tpm/<sample>/<sample>_coding_genes_tpm_fpkm.tsv   (no header)
+#
+# Coding-gene filter:
+#   The BED gene IDs are read once (cached) and matched against the gene
+#   columns only: "Gene ID" (with or without its .version suffix) or
+#   "Gene Name". Other columns (Reference, Start, ...) never match.
+#
+# Replicate averaging:
+#   Genes get an integer index (first file order, new genes appended); each
+#   replicate only adds to per-gene running sums and counts, so memory does
+#   not grow with the number of replicates. Sums are compensated (Kahan) in
+#   file/row order like pandas' groupby().mean(), and the table is written
+#   sorted by the gene columns, so the output is the same as
+#   pd.concat(replicates).groupby(group_cols).mean().
+#
+# Samples run in a process pool (--jobs N). *.tpm files are read with only
+# the needed columns, explicit dtypes and the pyarrow CSV engine when
+# pyarrow is installed (C engine otherwise).
+#
+# Usage:
+#   python 3_rnaseq_merge_tpm_coding.py [--jobs N] [--coding-bed FILE]
 ###############################################################################
 
 # Project root (assumed to be current directory)
@@ -29,49 +55,147 @@ samples = ['PT1', 'PT2', 'PT3', 'LP1', 'KMS11', 'U266', 'MM1S', 'RPMI8226']
 # BED file containing coding genes (4th column must be gene ID)
 coding_genes_bed = "/mnt/d/linux/reference/hg38/hg38p13/gencode.v40_coding_genes.bed"
 
-for sample in samples:
+group_cols = ['Gene ID', 'Gene Name', 'Reference', 'Strand', 'Start', 'End']
+value_cols = ['Coverage', 'FPKM', 'TPM']
+
+TPM_DTYPES = {
+    'Gene ID': str, 'Gene Name': str, 'Reference': str, 'Strand': str,
+    'Start': 'int64', 'End': 'int64',
+    'Coverage': 'float64', 'FPKM': 'float64', 'TPM': 'float64',
+}
+
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+
+def read_tpm(fp):
+    """One StringTie -A gene table, needed columns only."""
+    return pd.read_csv(fp, sep="\t", usecols=group_cols + value_cols,
+                       dtype=TPM_DTYPES, engine=CSV_ENGINE)
+
+
+class ReplicateMean:
+    """Per-gene running mean of value_cols over replicate tables, added one at a time."""
+
+    def __init__(self):
+        self.index = None                          # MultiIndex of group_cols, position = gene index
+        self.sums = np.zeros((0, len(value_cols)))
+        self.comp = np.zeros((0, len(value_cols)))  # Kahan compensation
+        self.counts = np.zeros((0, len(value_cols)), dtype=np.int64)
+
+    def _gene_index(self, keys):
+        """Integer gene index per row; unseen genes are appended."""
+        if self.index is None:
+            self.index = keys.unique()
+        codes = self.index.get_indexer(keys)
+        new = codes < 0
+        if new.any():
+            self.index = self.index.append(keys[new].unique())
+            codes[new] = self.index.get_indexer(keys[new])
+        grow = len(self.index) - len(self.sums)
+        if grow:
+            self.sums = np.vstack([self.sums, np.zeros((grow, len(value_cols)))])
+            self.comp = np.vstack([self.comp, np.zeros((grow, len(value_cols)))])
+            self.counts = np.vstack([self.counts, np.zeros((grow, len(value_cols)), dtype=np.int64)])
+        return codes
+
+    def add(self, df):
+        # groupby drops rows with a missing key
+        df = df.dropna(subset=group_cols)
+        codes = self._gene_index(pd.MultiIndex.from_frame(df[group_cols]))
+        values = df[value_cols].to_numpy(dtype=np.float64)
+
+        # a gene listed twice in one file is added in row order, one round per repeat
+        occurrence = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        for r in range(int(occurrence.max()) + 1 if len(codes) else 0):
+            sel = occurrence == r
+            g, v = codes[sel], values[sel]
+            ok = ~np.isnan(v)
+            s, c = self.sums[g], self.comp[g]
+            y = v - c
+            t = s + y
+            c_new = (t - s) - y
+            self.sums[g] = np.where(ok, t, s)
+            self.comp[g] = np.where(ok, np.where(np.isnan(c_new), 0.0, c_new), c)
+            self.counts[g] += ok
+
+    def result(self):
+        """Gene table (group_cols + mean value_cols), sorted by group_cols."""
+        table = self.index.to_frame(index=False)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.counts
+        for j, col in enumerate(value_cols):
+            table[col] = means[:, j]
+        return table.sort_values(group_cols, ignore_index=True)
+
+
+@lru_cache(maxsize=None)
+def load_coding_ids(bed_path):
+    """Unique gene IDs (4th column) of the coding-gene BED, as a frozenset ("-"/"." dropped)."""
+    ids = pd.read_csv(bed_path, sep="\t", header=None, usecols=[3],
+                      dtype=str, comment="#")[3]
+    return frozenset(ids.dropna().unique()) - {"-", "."}
+
+
+def coding_mask(table, coding_ids):
+    """Rows whose Gene ID (versioned or not) or Gene Name is a coding gene ID."""
+    gene_id = table['Gene ID']
+    return (gene_id.isin(coding_ids)
+            | gene_id.str.split('.', n=1).str[0].isin(coding_ids)
+            | table['Gene Name'].isin(coding_ids))
+
+
+def merge_sample(sample, coding_ids):
     tpm_dir = os.path.join(ROOT_DIR, "7_stringtie_tpm", sample)
     file_pattern = os.path.join(tpm_dir, "*.tpm")
 
     file_paths = glob.glob(file_pattern)
     if not file_paths:
         print(f"[WARN] No .tpm files found for sample {sample}, skip.")
-        continue
+        return
 
     print(f"[INFO] Sample {sample}: found {len(file_paths)} TPM files.")
 
-    dfs = []
+    # Average Coverage/FPKM/TPM per gene across replicates, one file in memory at a time
+    acc = ReplicateMean()
     for fp in file_paths:
-        df = pd.read_csv(fp, sep="\t")
-        dfs.append(df)
-
-    merged = pd.concat(dfs, ignore_index=True)
-
-    # Group by gene information, average Coverage/FPKM/TPM across replicates
-    group_cols = ['Gene ID', 'Gene Name', 'Reference', 'Strand', 'Start', 'End']
-    value_cols = ['Coverage', 'FPKM', 'TPM']
-
-    result = (
-        merged
-        .groupby(group_cols, as_index=False)[value_cols]
-        .mean()
-    )
+        acc.add(read_tpm(fp))
+    result = acc.result()
 
     # Save full gene table
     avg_out = os.path.join(tpm_dir, f"{sample}_average_tpm_fpkm_final.tsv")
     result.to_csv(avg_out, sep="\t", index=False)
     print(f"[INFO] Averaged TPM/FPKM written to {avg_out}")
 
-    # Extract coding gene IDs from BED
-    coding_ids_tmp = os.path.join(tpm_dir, f"{sample}_coding_ids.tmp")
-    os.system(f"cut -f 4 {coding_genes_bed} | sort -u > {coding_ids_tmp}")
-
-    # Filter averaged table by coding gene IDs (Gene ID column)
+    # Filter averaged table by coding gene IDs (no header, as before)
     coding_out = os.path.join(tpm_dir, f"{sample}_coding_genes_tpm_fpkm.tsv")
-    cmd = f"grep -w -F -f {coding_ids_tmp} {avg_out} > {coding_out}"
-    os.system(cmd)
-    os.remove(coding_ids_tmp)
+    result[coding_mask(result, coding_ids)].to_csv(coding_out, sep="\t", index=False, header=False)
 
     print(f"[INFO] Coding genes TPM/FPKM written to {coding_out}")
 
-print("All RNA-seq TPM/FPKM averaging and coding-gene filtering done.")
+
+def merge_sample_task(args):
+    merge_sample(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Average StringTie TPM/FPKM over replicates and filter to coding genes.")
+    parser.add_argument("--jobs", type=int, default=1, help="samples processed in parallel")
+    parser.add_argument("--coding-bed", default=coding_genes_bed,
+                        help="coding-gene BED (4th column = gene ID)")
+    args = parser.parse_args()
+
+    coding_ids = load_coding_ids(args.coding_bed)
+    tasks = [(sample, coding_ids) for sample in samples]
+    if args.jobs > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            pool.map(merge_sample_task, tasks, chunksize=1)
+    else:
+        for t in tasks:
+            merge_sample_task(t)
+
+    print("All RNA-seq TPM/FPKM averaging and coding-gene filtering done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from expression_matrix import MEASURES, write_store
+
+###############################################################################
+# RNA-seq Step 4
+#   Collect the per-sample gene tables of Step 3 into one cohort
+#   genes x samples store (TPM / FPKM / Coverage), indexed by gene name.
+#   Query it with expression_matrix.ExpressionMatrix instead of re-parsing
+#   or grepping the per-sample TSVs.
+#
+# Inputs:
+#   7_stringtie_tpm/<sample>/<sample>_coding_genes_tpm_fpkm.tsv   (default, no header)
+#   7_stringtie_tpm/<sample>/<sample>_average_tpm_fpkm_final.tsv  (--all-genes)
+#
+# Outputs:
+#   8_expression_matrix/{genes.tsv,samples.txt,TPM.npy,FPKM.npy,Coverage.npy}
+#   8_expression_matrix/expression_matrix.feather   (if pyarrow is installed)
+#
+# Rows = (Gene ID, Gene Name); a gene with several records in one sample
+# (e.g. loci on different contigs) keeps its largest value. Samples without
+# a table get an all-NaN column.
+#
+# Usage:
+#   python 4_rnaseq_expression_matrix.py [--all-genes]
+###############################################################################
+
+# Project root (assumed to be current directory)
+ROOT_DIR = os.path.abspath(".")
+
+# All RNA-seq samples
+samples = ['PT1', 'PT2', 'PT3', 'LP1', 'KMS11', 'U266', 'MM1S', 'RPMI8226']
+
+columns = ['Gene ID', 'Gene Name', 'Reference', 'Strand', 'Start', 'End',
+           'Coverage', 'FPKM', 'TPM']
+
+
+def read_sample_table(sample, all_genes=False):
+    tpm_dir = os.path.join(ROOT_DIR, "7_stringtie_tpm", sample)
+    if all_genes:
+        path = os.path.join(tpm_dir, f"{sample}_average_tpm_fpkm_final.tsv")
+        header = 0
+    else:
+        path = os.path.join(tpm_dir, f"{sample}_coding_genes_tpm_fpkm.tsv")
+        header = None
+    if not os.path.exists(path):
+        print(f"[WARN] {path} not found, sample {sample} left empty.")
+        return None
+    df = pd.read_csv(path, sep="\t", header=header, names=columns,
+                     usecols=['Gene ID', 'Gene Name'] + MEASURES,
+                     dtype={'Gene ID': str, 'Gene Name': str}, keep_default_na=False,
+                     na_values={m: ["", "NaN", "nan"] for m in MEASURES})
+    return df.groupby(['Gene ID', 'Gene Name'], as_index=False)[MEASURES].max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cohort genes x samples expression store.")
+    parser.add_argument("--all-genes", action="store_true",
+                        help="use the full averaged tables instead of the coding-gene tables")
+    parser.add_argument("--out", default=os.path.join(ROOT_DIR, "8_expression_matrix"))
+    args = parser.parse_args()
+
+    tables = {s: read_sample_table(s, args.all_genes) for s in samples}
+    present = [t for t in tables.values() if t is not None]
+    if not present:
+        print("[WARN] No sample tables found, nothing written.")
+        return
+
+    genes = (pd.concat([t[['Gene ID', 'Gene Name']] for t in present])
+             .drop_duplicates()
+             .sort_values(['Gene Name', 'Gene ID'], ignore_index=True))
+    gene_index = pd.MultiIndex.from_frame(genes)
+
+    matrices = {m: np.full((len(genes), len(samples)), np.nan) for m in MEASURES}
+    for j, s in enumerate(samples):
+        t = tables[s]
+        if t is None:
+            continue
+        rows = gene_index.get_indexer(pd.MultiIndex.from_frame(t[['Gene ID', 'Gene Name']]))
+        for m in MEASURES:
+            matrices[m][rows, j] = t[m].to_numpy(dtype=np.float64)
+
+    genes = genes.rename(columns={'Gene ID': 'gene_id', 'Gene Name': 'gene_name'})
+    write_store(args.out, genes, samples, matrices)
+    print(f"[INFO] {len(genes)} genes x {len(samples)} samples written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""
+Cohort genes x samples expression store and lookups.
+
+Store layout (written by 4_rnaseq_expression_matrix.py):
+  8_expression_matrix/
+    genes.tsv                gene_name  gene_id        (row order of the matrices)
+    samples.txt              one sample per line       (column order)
+    TPM.npy FPKM.npy Coverage.npy
+                             float64 genes x samples, NaN = gene absent in sample
+    expression_matrix.feather
+                             same data, one row per gene, columns
+                             gene_name gene_id TPM.<sample> ... (only with pyarrow)
+
+Lookups open the .npy files memory-mapped and resolve gene names / samples
+through dicts, so a query reads only the cells it needs (no text scan):
+
+  expr = ExpressionMatrix("5_RNAseq/8_expression_matrix")
+  expr.values(["MYC", "CCND1"], "PT1")         # {"MYC": 35.2, "CCND1": nan}
+  expr.samples_above("CCND1", 10)              # ["KMS11", "U266"]
+  expr.genes_above("PT1", 10)                  # genes with TPM >= 10 in PT1
+
+A gene name with several records (loci / Gene IDs) reports its maximum,
+i.e. "some record of G has TPM >= threshold", as the grep/awk filters did.
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ["TPM", "FPKM", "Coverage"]
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def write_store(out_dir, genes, samples, matrices):
+    """
+    genes: DataFrame with gene_name, gene_id (one row per matrix row)
+    samples: list of sample names (one per matrix column)
+    matrices: {measure: float64 array (len(genes), len(samples))}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    genes[["gene_name", "gene_id"]].to_csv(os.path.join(out_dir, "genes.tsv"), sep="\t", index=False)
+    with open(os.path.join(out_dir, "samples.txt"), "w") as f:
+        f.write("".join(f"{s}\n" for s in samples))
+    for measure in MEASURES:
+        np.save(os.path.join(out_dir, f"{measure}.npy"),
+                np.ascontiguousarray(matrices[measure], dtype=np.float64))
+
+    if HAS_PYARROW:
+        wide = genes[["gene_name", "gene_id"]].reset_index(drop=True).copy()
+        for measure in MEASURES:
+            for j, s in enumerate(samples):
+                wide[f"{measure}.{s}"] = matrices[measure][:, j]
+        wide.to_feather(os.path.join(out_dir, "expression_matrix.feather"))
+
+
+class ExpressionMatrix:
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        genes = pd.read_csv(os.path.join(store_dir, "genes.tsv"), sep="\t",
+                            dtype=str, keep_default_na=False)
+        self.gene_names = genes["gene_name"].tolist()
+        self.gene_ids = genes["gene_id"].tolist()
+        with open(os.path.join(store_dir, "samples.txt")) as f:
+            self.samples = [line.strip() for line in f if line.strip()]
+
+        self.sample_col = {s: j for j, s in enumerate(self.samples)}
+        rows = {}
+        for i, name in enumerate(self.gene_names):
+            rows.setdefault(name, []).append(i)
+        self.gene_rows = {name: np.asarray(r, dtype=np.int64) for name, r in rows.items()}
+        self._matrices = {}
+
+    def matrix(self, measure="TPM"):
+        """genes x samples array of one measure (memory-mapped, read-only)."""
+        if measure not in self._matrices:
+            self._matrices[measure] = np.load(os.path.join(self.store_dir, f"{measure}.npy"),
+                                              mmap_mode="r")
+        return self._matrices[measure]
+
+    def _gene_max(self, gene, col, measure):
+        rows = self.gene_rows.get(gene)
+        if rows is None:
+            return np.nan
+        v = self.matrix(measure)[rows, col]
+        return np.nan if np.isnan(v).all() else float(np.nanmax(v))
+
+    def values(self, genes, sample, measure="TPM"):
+        """{gene: value in sample} (NaN for unknown genes / not expressed records)."""
+        col = self.sample_col[sample]
+        return {g: self._gene_max(g, col, measure) for g in genes}
+
+    def samples_above(self, gene, threshold, measure="TPM"):
+        """Samples where gene >= threshold (in sample order)."""
+        rows = self.gene_rows.get(gene)
+        if rows is None:
+            return []
+        v = np.asarray(self.matrix(measure)[rows, :])
+        hit = (np.nan_to_num(v, nan=-np.inf) >= threshold).any(axis=0)
+        return [s for s, h in zip(self.samples, hit.tolist()) if h]
+
+    def genes_above(self, sample, threshold, measure="TPM"):
+        """Set of gene names with a record >= threshold in sample."""
+        col = np.asarray(self.matrix(measure)[:, self.sample_col[sample]])
+        hit = np.flatnonzero(np.nan_to_num(col, nan=-np.inf) >= threshold)
+        return {self.gene_names[i] for i in hit.tolist()}
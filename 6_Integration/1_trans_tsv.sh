@@ -44,6 +44,9 @@ set -euo pipefail
 #         chrA  posA  chrB  posB
 #     <sample>_longread.tsv
 #         source  id       sample  chrA  posA  chrB  posB  strandA  strandB
+#
+# NOTE: 1_SMRT-seq/bnd_normalize.py writes the same TSVs directly from the
+#       pbsv VCF and predictSV output (BED files only with --keep-intermediate).
 ###############################################################################
 
 # Directory of this script (6_Integration)
@@ -61,6 +64,14 @@ samples=("KMS11" "LP1" "MM1S" "RPMI8226" "U266" "PT1" "PT2" "PT3")
 out_root="${ROOT_DIR}/6_Integration/1_trans_tsv"
 mkdir -p "${out_root}"
 
+# Chromosome order for chrA <= chrB (chr1 < chr2 < ... < chr22 < chrX < chrY < chrM):
+# optional chrom.sizes file, empty = built-in hg38 (see karyotype.py)
+chrom_sizes=""
+# orient --a A-columns --b B-columns: swap the two breakends where chrA ranks after chrB
+orient() {
+  python3 "${SCRIPT_DIR}/karyotype.py" ${chrom_sizes:+--chrom-sizes "${chrom_sizes}"} orient "$@"
+}
+
 for sample in "${samples[@]}"; do
   echo ">>> Processing sample: ${sample}"
 
@@ -95,42 +106,21 @@ for sample in "${samples[@]}"; do
     # 1.1 Extract inter-chromosomal SVs:
     #     Input columns (CNN_SVs):
     #       chr1 = $1, chr2 = $2, ori = $3 (++, +-, -+, --), pos1 = $4, pos2 = $5
-    #     Output temp: chr1 pos1 chr2 pos2 ori
+    #     Output temp: chr1 pos1 s1 chr2 pos2 s2 (ori split into its two strands)
     awk -v OFS="\t" '
       $1 != $2 {
-        print $1, $4, $2, $5, $3;
+        print $1, $4, substr($3,1,1), $2, $5, substr($3,2,1);
       }
     ' "${hic_src}" | sort -k1,1 -k2,2n > "${sample}_hic_translocation.bed.tmp"
 
-    # 1.2 Normalize chromosome order: ensure chrA <= chrB (by numeric part),
-    #     and adjust orientation accordingly.
+    # 1.2 Normalize chromosome order: ensure chrA <= chrB (by karyotype rank),
+    #     swapping both breakpoints and strands if needed.
     #
-    # Input:  chr1 pos1 chr2 pos2 ori
-    # Output: chrA posA chrB posB ori_after_sort
-    awk -v OFS="\t" '
-      {
-        chr1=$1; pos1=$2;
-        chr2=$3; pos2=$4;
-        ori =$5;               # e.g. "+-", "++", etc.
-
-        # split ori into two strands
-        s1 = substr(ori,1,1);
-        s2 = substr(ori,2,1);
-
-        split(chr1,a,"hr");
-        split(chr2,b,"hr");
-
-        if (a[2] <= b[2]) {
-          # order unchanged
-          new_ori = s1 s2;
-          print chr1, pos1, chr2, pos2, new_ori;
-        } else {
-          # swap both breakpoints and strands
-          new_ori = s2 s1;
-          print chr2, pos2, chr1, pos1, new_ori;
-        }
-      }
-    ' "${sample}_hic_translocation.bed.tmp" > "${sample}_hic_translocation.bed"
+    # Input:  chr1 pos1 s1 chr2 pos2 s2
+    # Output: chrA posA chrB posB ori_after_sort (sA sB)
+    orient --a 1,2,3 --b 4,5,6 < "${sample}_hic_translocation.bed.tmp" \
+      | awk -v OFS="\t" '{ print $1, $2, $4, $5, $3 $6 }' \
+      > "${sample}_hic_translocation.bed"
 
     rm -f "${sample}_hic_translocation.bed.tmp"
 
@@ -178,25 +168,12 @@ for sample in "${samples[@]}"; do
   n_lines=$(wc -l < "${sample}_longread_translocation_with_strand.tmp")
   echo "    [INFO] ${sample}: long-read inter-chr events (raw) = ${n_lines}"
 
-  # 2.2 Normalize chromosome order: ensure chrA <= chrB,
+  # 2.2 Normalize chromosome order: ensure chrA <= chrB (by karyotype rank),
   #     swapping coordinates and strands if needed.
   #     Output (with strand):
   #       chrA, posA, strandA, chrB, posB, strandB
-  awk -v OFS="\t" '
-    NF >= 6 {
-      chr1=$1; pos1=$2; str1=$3;
-      chr2=$4; pos2=$5; str2=$6;
-
-      split(chr1,a,"hr");
-      split(chr2,b,"hr");
-
-      if (a[2] <= b[2]) {
-        print chr1, pos1, str1, chr2, pos2, str2;
-      } else {
-        print chr2, pos2, str2, chr1, pos1, str1;
-      }
-    }
-  ' "${sample}_longread_translocation_with_strand.tmp" > "${sample}_longread_translocation_with_strand.bed"
+  orient --a 1,2,3 --b 4,5,6 < "${sample}_longread_translocation_with_strand.tmp" \
+    > "${sample}_longread_translocation_with_strand.bed"
 
   rm -f "${sample}_longread_translocation_with_strand.tmp"
 
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extract, once, the local balanced Hi-C submatrices around every TransFinder
+translocation, so re-plotting / re-scoring an event never reads the full
+mcool again.
+
+Per sample:
+  events  6_Integration/2_intersection/<sample>/<sample>_transfinder_bnd.tsv
+          (each translocation is written twice, A->B and B->A; kept once,
+          chrA <= chrB in karyotype order)
+  Hi-C    2_HiC/2_get_hic_mcool/<sample>/<sample>_contact.mcool
+          resolutions 5k / 10k / 25k, balance = 'sweight'
+
+For each event and resolution the square matrix of the windows
+chrA:posA +- span and chrB:posB +- span (cis A, cis B and the A x B block)
+is stored in a memory-mappable archive (see submatrix_store.py).
+
+Outputs:
+  6_Integration/2_1_bnd_submatrix/<sample>/<sample>.submatrices.npy
+  6_Integration/2_1_bnd_submatrix/<sample>/<sample>.submatrices.tsv
+
+Usage:
+  python3 6_Integration/2_1_extract_bnd_submatrices.py [--samples PT3 ...] [--jobs N]
+                                                       [--span 1000000] [--chrom-sizes FILE]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import traceback
+
+import cooler
+
+from karyotype import load_karyotype, resolve_chrom
+from submatrix_store import event_key, n_bins, window, write_store
+
+SAMPLES = ['PT3']
+
+RESOLUTIONS = [5000, 10000, 25000]
+
+SPAN = 1000000
+
+BALANCE = 'sweight'
+
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+
+def read_bnd_events(path, karyo):
+    """Unique (chrA, posA, chrB, posB) of a transfinder_bnd.tsv, chrA <= chrB, file order."""
+    events = {}
+    with open(path) as f:
+        for line in f:
+            cols = line.split("\t")
+            if len(cols) < 5:
+                continue
+            chrA, chrB, posA, posB = cols[0], cols[1], int(cols[3]), int(cols[4])
+            if not karyo.le(chrA, chrB):
+                chrA, posA, chrB, posB = chrB, posB, chrA, posA
+            events.setdefault(event_key(chrA, posA, chrB, posB), (chrA, posA, chrB, posB))
+    return events
+
+
+def fill_matrix(clr, row, out):
+    nA = row["nA"]
+    m = clr.matrix(balance=BALANCE)
+    regA = (row["chrA"], row["startA"], row["endA"])
+    regB = (row["chrB"], row["startB"], row["endB"])
+    trans = m.fetch(regA, regB)
+    out[:nA, :nA] = m.fetch(regA)
+    out[nA:, nA:] = m.fetch(regB)
+    out[:nA, nA:] = trans
+    out[nA:, :nA] = trans.T
+
+
+def run_sample(root_dir, sample, span=SPAN, chrom_sizes=None):
+    bnd_path = os.path.join(root_dir, "6_Integration", "2_intersection", sample,
+                            f"{sample}_transfinder_bnd.tsv")
+    mcool = os.path.join(root_dir, "2_HiC", "2_get_hic_mcool", sample, f"{sample}_contact.mcool")
+    for p in (bnd_path, mcool):
+        if not os.path.exists(p):
+            sys.stderr.write(f"[WARN] {sample}: missing {p}, skip.\n")
+            return None
+
+    events = read_bnd_events(bnd_path, load_karyotype(chrom_sizes))
+    coolers = {res: cooler.Cooler(f"{mcool}::resolutions/{res}") for res in RESOLUTIONS}
+
+    rows = []
+    for key, (chrA, posA, chrB, posB) in events.items():
+        for res in RESOLUTIONS:
+            sizes = coolers[res].chromsizes
+            cA, cB = resolve_chrom(chrA, sizes), resolve_chrom(chrB, sizes)
+            if cA is None or cB is None:
+                sys.stderr.write(f"[WARN] {sample}: {key} not in {mcool}, skip.\n")
+                break
+            sA, eA = window(posA, span, res, int(sizes[cA]))
+            sB, eB = window(posB, span, res, int(sizes[cB]))
+            rows.append({"event": key, "res": res,
+                         "chrA": cA, "startA": sA, "endA": eA,
+                         "chrB": cB, "startB": sB, "endB": eB,
+                         "nA": n_bins(sA, eA, res), "nB": n_bins(sB, eB, res)})
+
+    out_dir = os.path.join(root_dir, "6_Integration", "2_1_bnd_submatrix", sample)
+    prefix = os.path.join(out_dir, sample)
+    write_store(prefix, rows, lambda row, out: fill_matrix(coolers[row["res"]], row, out))
+    sys.stderr.write(f"[INFO] {sample}: {len(rows)} submatrices "
+                     f"({len(events)} events) -> {prefix}.submatrices.npy\n")
+    return prefix
+
+
+def run_sample_logged(args):
+    root_dir, sample, span, chrom_sizes = args
+    try:
+        run_sample(root_dir, sample, span, chrom_sizes)
+        return sample, True
+    except Exception:
+        sys.stderr.write(f"[ERROR] {sample}: failed\n{traceback.format_exc()}")
+        return sample, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract local balanced Hi-C submatrices per BND event.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--jobs", type=int, default=1, help="samples processed in parallel")
+    parser.add_argument("--span", type=int, default=SPAN, help="window half-width around each breakpoint (bp)")
+    parser.add_argument("--chrom-sizes", default=None,
+                        help="chrom.sizes defining chromosome order (default: built-in hg38)")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    tasks = [(root_dir, s, args.span, args.chrom_sizes) for s in args.samples]
+    if args.jobs > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            results = pool.map(run_sample_logged, tasks, chunksize=1)
+    else:
+        results = [run_sample_logged(t) for t in tasks]
+
+    failed = [s for s, ok in results if not ok]
+    if failed:
+        sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
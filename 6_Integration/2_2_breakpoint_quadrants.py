@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Quantitative orientation check for shared Hi-C/LRS translocations: the
+CNV-corrected inter-chromosomal contact enrichment in the four orientation
+quadrants around each LRS breakpoint.
+
+Per sample:
+  events   6_Integration/2_intersection/<sample>/<sample>_exact_shared_longread_breakpoints.bed
+           (chrA posA chrB posB lr_id EVENT_n)
+  strands  6_Integration/2_intersection/<sample>/<sample>_longread_merged.tsv
+  Hi-C     2_HiC/2_get_hic_mcool/<sample>/<sample>_contact.mcool
+           (--res, default 50 kb; --balance, default 'sweight' = CNV-corrected
+            weights written by correct-cnv in 2_cnv_and_correct.sh)
+
+Quadrants (strand convention of the BND tables: '+' = the side upstream of
+the breakpoint is joined, '-' = the downstream side):
+
+  '+' on A  -> bins posA - window .. posA (breakpoint bin excluded)
+  '-' on A  -> bins posA .. posA + window
+  same for B; quadrant "+-" = A upstream x B downstream, etc.
+
+  enr_<q> = mean balanced contacts in q / mean over all four quadrants
+            (missing pixels count as 0, masked bins are excluded)
+
+The quadrant with the highest enrichment is the Hi-C orientation call; it is
+compared with the LRS strands (lr_agrees) and listed next to the
+predictSV-vs-LRS conflicts of <sample>_orientation_conflicts.tsv.
+
+Only the pixels of each event's local trans block are read (cooler pixel
+queries); quadrant sums are accumulated for all events of a sample at once.
+
+Outputs:
+  6_Integration/2_intersection/<sample>/<sample>_breakpoint_quadrants.tsv
+    sample  event  lr_id  chrA  posA  chrB  posB  lr_strands
+    enr_++  enr_+-  enr_-+  enr_--  hic_strands  best_ratio  lr_agrees  hic_conflict
+
+Usage:
+  python3 6_Integration/2_2_breakpoint_quadrants.py [--samples PT3 ...] [--jobs N]
+                                                    [--res 50000] [--window 1000000]
+                                                    [--balance sweight]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import traceback
+
+import numpy as np
+
+import cooler
+
+from karyotype import resolve_chrom
+from sv_table import load_table
+
+SAMPLES = ["KMS11","LP1","MM1S","RPMI8226","U266","PT1","PT2","PT3"]
+
+RES = 50000
+WINDOW = 1000000
+BALANCE = "sweight"
+
+# quadrant code = 2 * sideA + sideB, side 0 = upstream ('+'), 1 = downstream ('-')
+QUADRANTS = ["++", "+-", "-+", "--"]
+
+OUT_COLUMNS = ["sample", "event", "lr_id", "chrA", "posA", "chrB", "posB", "lr_strands",
+               "enr_++", "enr_+-", "enr_-+", "enr_--", "hic_strands", "best_ratio",
+               "lr_agrees", "hic_conflict"]
+
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+
+###############################################################################
+# Inputs
+###############################################################################
+
+def read_shared_bed(path):
+    """[(chrA, posA, chrB, posB, lr_id, event)] of the shared-breakpoint BED."""
+    events = []
+    with open(path) as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 6:
+                continue
+            events.append((cols[0], int(cols[1]), cols[2], int(cols[3]), cols[4], cols[5]))
+    return events
+
+def read_lr_strands(path):
+    """{lr_id: strandA + strandB} of the merged LRS table."""
+    table = load_table(path, expected_source="longread")
+    strands = np.array(table.strands, dtype=object)
+    pairs = strands[table.strandA] + strands[table.strandB]
+    return dict(zip(table.ids(), pairs.tolist()))
+
+def read_conflict_ids(path):
+    """lr_ids with a predictSV/LRS orientation conflict."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split("\t")
+        col = header.index("lr_id")
+        return {line.rstrip("\n").split("\t")[col] for line in f if line.strip()}
+
+
+###############################################################################
+# Scoring
+###############################################################################
+
+def quadrant_enrichment(clr, events, window=WINDOW, balance=BALANCE):
+    """
+    (N, 4) enrichment per event and quadrant (QUADRANTS order); NaN rows for
+    events that cannot be scored (chromosome missing, same chromosome, no
+    valid bins).
+    """
+    res = clr.binsize
+    w = window // res
+    n = len(events)
+    sizes = clr.chromsizes
+
+    weights = clr.bins()[balance][:].to_numpy()
+    valid_cum = np.concatenate(([0], np.cumsum(np.isfinite(weights))))
+
+    # breakpoint bin (absolute id) and chromosome bin range per event end
+    ok = np.zeros(n, dtype=bool)
+    bp = np.zeros((n, 2), dtype=np.int64)
+    lo = np.zeros((n, 2), dtype=np.int64)
+    hi = np.zeros((n, 2), dtype=np.int64)
+    rows, rel, vals = [], [], []
+    for i, (chrA, posA, chrB, posB, _, _) in enumerate(events):
+        cA, cB = resolve_chrom(chrA, sizes), resolve_chrom(chrB, sizes)
+        if cA is None or cB is None or cA == cB:
+            continue
+        ok[i] = True
+        for k, (c, pos) in enumerate(((cA, posA), (cB, posB))):
+            lo[i, k], hi[i, k] = clr.extent(c)
+            bp[i, k] = min(lo[i, k] + pos // res, hi[i, k] - 1)
+
+        # local trans block, queried in the cooler's (upper-triangle) order
+        regA = (cA, max(0, (posA // res - w) * res), min(int(sizes[cA]), (posA // res + w + 1) * res))
+        regB = (cB, max(0, (posB // res - w) * res), min(int(sizes[cB]), (posB // res + w + 1) * res))
+        flip = lo[i, 0] > lo[i, 1]
+        pix = clr.matrix(balance=balance, as_pixels=True, join=False).fetch(
+            *((regB, regA) if flip else (regA, regB)))
+        b1, b2 = pix["bin1_id"].to_numpy(), pix["bin2_id"].to_numpy()
+        if flip:
+            b1, b2 = b2, b1
+        rows.append(np.full(len(pix), i, dtype=np.int64))
+        rel.append(np.stack([b1 - bp[i, 0], b2 - bp[i, 1]], axis=1))
+        vals.append(pix["balanced"].to_numpy(dtype=np.float64))
+
+    sums = np.zeros(4 * n)
+    if rows:
+        rows = np.concatenate(rows)
+        rel = np.concatenate(rel)
+        vals = np.concatenate(vals)
+        keep = (rel[:, 0] != 0) & (rel[:, 1] != 0) & np.isfinite(vals)
+        quad = 2 * (rel[keep, 0] > 0) + (rel[keep, 1] > 0)
+        sums = np.bincount(4 * rows[keep] + quad, weights=vals[keep], minlength=4 * n)
+    sums = sums.reshape(n, 4)
+
+    # valid bins per side: upstream [bp - w, bp), downstream (bp, bp + w]
+    up   = valid_cum[bp] - valid_cum[np.maximum(bp - w, lo)]
+    down = valid_cum[np.minimum(bp + w + 1, hi)] - valid_cum[bp + 1]
+    sides = np.stack([up, down], axis=2).astype(np.float64)           # (n, end, side)
+    n_pix = (sides[:, 0, :, None] * sides[:, 1, None, :]).reshape(n, 4)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n_pix > 0, sums / n_pix, np.nan)
+        overall = sums.sum(axis=1) / n_pix.sum(axis=1)
+        enr = mean / overall[:, None]
+    enr[~ok] = np.nan
+    return enr
+
+
+def score_sample(root_dir, sample, res=RES, window=WINDOW, balance=BALANCE):
+    in_dir = os.path.join(root_dir, "6_Integration", "2_intersection", sample)
+    bed = os.path.join(in_dir, f"{sample}_exact_shared_longread_breakpoints.bed")
+    merged = os.path.join(in_dir, f"{sample}_longread_merged.tsv")
+    mcool = os.path.join(root_dir, "2_HiC", "2_get_hic_mcool", sample, f"{sample}_contact.mcool")
+    for p in (bed, merged, mcool):
+        if not os.path.exists(p):
+            sys.stderr.write(f"[WARN] {sample}: missing {p}, skip.\n")
+            return None
+
+    events = read_shared_bed(bed)
+    lr_strands = read_lr_strands(merged)
+    conflicts = read_conflict_ids(os.path.join(in_dir, f"{sample}_orientation_conflicts.tsv"))
+    clr = cooler.Cooler(f"{mcool}::resolutions/{res}")
+    enr = quadrant_enrichment(clr, events, window, balance)
+
+    out_path = os.path.join(in_dir, f"{sample}_breakpoint_quadrants.tsv")
+    with open(out_path, "w") as out:
+        out.write("\t".join(OUT_COLUMNS) + "\n")
+        for (chrA, posA, chrB, posB, lr_id, event), e in zip(events, enr):
+            strands = lr_strands.get(lr_id, "NA")
+            if np.isnan(e).all():
+                scores, call, ratio, agrees = ["NA"] * 4, "NA", "NA", "NA"
+            else:
+                order = np.argsort(-np.nan_to_num(e, nan=-1.0))
+                best, second = e[order[0]], e[order[1]]
+                scores = ["NA" if np.isnan(x) else f"{x:.4f}" for x in e]
+                call = QUADRANTS[order[0]]
+                ratio = f"{best / second:.4f}" if second > 0 else "NA"
+                agrees = "NA" if strands == "NA" else ("yes" if call == strands else "no")
+            out.write("\t".join(map(str, [
+                sample, event, lr_id, chrA, posA, chrB, posB, strands,
+                *scores, call, ratio, agrees, "yes" if lr_id in conflicts else "no"
+            ])) + "\n")
+    sys.stderr.write(f"[INFO] {sample}: {len(events)} breakpoints scored -> {out_path}\n")
+    return out_path
+
+
+def score_sample_logged(args):
+    root_dir, sample, res, window, balance = args
+    try:
+        score_sample(root_dir, sample, res, window, balance)
+        return sample, True
+    except Exception:
+        sys.stderr.write(f"[ERROR] {sample}: failed\n{traceback.format_exc()}")
+        return sample, False
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score orientation-quadrant contact enrichment around shared breakpoints.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--jobs", type=int, default=1, help="samples processed in parallel")
+    parser.add_argument("--res", type=int, default=RES, help="mcool resolution (bp)")
+    parser.add_argument("--window", type=int, default=WINDOW,
+                        help="quadrant size on each side of the breakpoint (bp)")
+    parser.add_argument("--balance", default=BALANCE,
+                        help="weight column (default: CNV-corrected 'sweight')")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    tasks = [(root_dir, s, args.res, args.window, args.balance) for s in args.samples]
+    if args.jobs > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            results = pool.map(score_sample_logged, tasks, chunksize=1)
+    else:
+        results = [score_sample_logged(t) for t in tasks]
+
+    failed = [s for s, ok in results if not ok]
+    if failed:
+        sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
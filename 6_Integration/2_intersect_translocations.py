@@ -7,12 +7,21 @@ Pipeline per sample (after Step1 normalization):
   1) Merge LRS translocations (ignore orientation), delta=500bp, dual-end joint clustering.
      - DOES NOT use strand for clustering.
      - Keeps Step1 order chrA <= chrB in output.
+     - Merged events are passed to Step 2 in memory; the TSVs below are
+       written on a background thread (not re-read).
      Outputs into:
        6_Integration/2_intersection/<sample>/
          <sample>_longread_merged.tsv
          <sample>_longread_merge_map.tsv
 
   2) Intersect Hi-C vs merged LRS with D_BETWEEN=240kb.
+     - Hi-C calls and merged LRS events matching a rule of the exclusion
+       file (--exclusions, default 6_Integration/exclusions.tsv; ids,
+       breakend regions, BED artifact regions, paired windows; see
+       exclusions.py) are removed first: not counted, not in any output
+       below, never in <sample>_transfinder_bnd.tsv.
+       <sample>_longread_merged.tsv still lists every merged event, so
+       LRM_* ids stay stable.
      - No Hi-C expansion.
      - No Hi-C internal dedup/merge.
      Scheme A counts (ground truth = merged LRS events).
@@ -24,37 +33,94 @@ Pipeline per sample (after Step1 normalization):
          <sample>_shared_components.tsv
          <sample>_exact_event_summary.txt
          <sample>_exact_shared_longread_breakpoints.bed
-
-  3) Combined summary across all samples:
+         <sample>_LRS_match_detail.tsv   (one row per merged LRS event left
+                                         after exclusion: is_shared, best
+                                         Hi-C partner and distances,
+                                         orientation agreement)
+         <sample>_LRS_match_detail_all.tsv
+                                        (same for every merged LRS event,
+                                         matched against every Hi-C call,
+                                         i.e. before exclusion, plus an
+                                         `excluded` column: rule reason or NA)
+         <sample>_excluded.tsv           (calls removed by the exclusion rules)
+
+  3) Combined summary across all samples (SAMPLES order, plus per-sample
+     status / wall_time_s / peak_rss_mb):
        6_Integration/2_intersection/all_samples_exact_event_summary.tsv
+     With --samples, only those rows are replaced; rows of the other
+     samples are kept from the existing file.
+     Per-event match detail of all samples with status ok:
+       6_Integration/2_intersection/all_samples_LRS_match_detail.tsv
+         (post-exclusion; plotted by 3_plot_translocations_42bnd.R, which
+         does no matching itself)
+       6_Integration/2_intersection/all_samples_LRS_match_detail_all.tsv
+         (complete, pre-exclusion)
+
+Usage:
+  python3 2_intersect_translocations.py [--jobs N] [--chrom-sizes FILE] [--exclusions FILE]
+    --jobs N  run samples in a pool of N processes (one process per sample);
+              a failing sample is reported with status=error, others continue.
+    --samples S ...  only these samples (default: SAMPLES)
+    --chrom-sizes FILE  chromosome order for chrA <= chrB (default: built-in hg38;
+              see karyotype.py)
+    --exclusions FILE  exclusion rules (default: 6_Integration/exclusions.tsv;
+              '' = none)
+
+  python3 2_intersect_translocations.py --sweep-delta 100 250 500 1000 \\
+                                        --sweep-dbetween 50000 100000 240000 [--jobs N]
+    Threshold sweep only (no per-sample outputs); writes one tidy table
+      6_Integration/2_intersection/threshold_sweep.tsv
+        sample  DELTA_LR  D_BETWEEN  N_HiC_total  N_LR_total  N_HiC_only  N_LR_only  N_Shared
+    Hi-C vs LRS pairs are computed once at the largest D_BETWEEN and then
+    thresholded, so the grid costs about one merge per DELTA_LR.
 
 Inputs (per sample):
   6_Integration/1_trans_tsv/<sample>/<sample>_hic.tsv
   6_Integration/1_trans_tsv/<sample>/<sample>_longread.tsv
+  (read from their .feather sidecars when current, see sv_table.load_table)
 
 TSV columns (both):
   source  id  sample  chrA  posA  chrB  posB  strandA  strandB
+  loaded into a columnar SVTable (sv_table.py): NumPy position arrays,
+  categorical chromosome/strand codes, fixed-width id column
 
 Confirmed rules:
   - LRS merge:
       delta = 500 bp
-      same ordered chr-pair (chrA, chrB) [Step1 already enforced]
+      same ordered chr-pair (chrA, chrB) [Step1 order, re-enforced on load
+      in karyotype rank order: chr1 < chr2 < ... < chr22 < chrX < chrY]
       |posA_i - posA_j| <= 500 AND |posB_i - posB_j| <= 500
       strand ignored
+      medians maintained incrementally (two heaps), single pass per chr-pair
       representative = closest to FLOAT medians
       tie-breaker = larger posB, then larger posA, then smaller id
   - Hi-C vs LRS overlap:
       tolerance = 240 kb
       direct dual-end matching (order already standardized by Step1)
+      per chr-pair (posA, posB) bin index, 3x3 bin lookup (no all-vs-all loop)
       strand ignored for matching
   - Scheme A counts:
       Shared = number of merged LRS events supported by >=1 Hi-C call
 """
 
+import argparse
+import multiprocessing
 import os
+import resource
 import sys
+import time
+import traceback
 from collections import defaultdict, deque
-from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heappush, heappop
+
+import numpy as np
+
+from exclusions import load_exclusions
+from karyotype import load_karyotype
+from sv_table import (
+    COLUMNS, load_table, group_by_chrpair_ordered, normalize_chrom_order, write_sidecar,
+)
 
 # thresholds
 DELTA_LR   = 500       # LRS internal merge threshold (bp), ignore orientation
@@ -62,6 +128,8 @@ D_BETWEEN  = 240000    # Hi-C vs LRS matching tolerance (bp)
 
 SAMPLES = ["KMS11","LP1","MM1S","RPMI8226","U266","PT1","PT2","PT3"]
 
+EXCLUSIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exclusions.tsv")
+
 
 ###############################################################################
 # Utils
@@ -71,153 +139,190 @@ def get_root_dir():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.abspath(os.path.join(script_dir, ".."))
 
-def load_tsv(path, expected_source=None):
-    svs = []
-    if not os.path.exists(path):
-        return svs
+class OutputSink:
+    """
+    Destination for per-sample output files.
+      OutputSink()                -> write immediately in the caller
+      OutputSink(background=True) -> queue writes on one background thread,
+                                     so computation continues while files
+                                     are written; close() waits and re-raises
+                                     the first write error.
+    """
 
-    with open(path) as f:
-        first = f.readline()
-        if not first:
-            return svs
+    def __init__(self, background=False):
+        self.pool = ThreadPoolExecutor(max_workers=1) if background else None
+        self.pending = []
 
-        
-        first_cols = first.rstrip("\n").split("\t")
-        has_header = (len(first_cols) >= 1 and first_cols[0].lower() == "source")
+    def submit(self, fn, *args):
+        if self.pool is None:
+            fn(*args)
+        else:
+            self.pending.append(self.pool.submit(fn, *args))
 
-        
-        lines_iter = f
-        if not has_header:
-            lines_iter = [first] + list(f)
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.shutdown(wait=True)
+        for fut in self.pending:
+            fut.result()
+        self.pending = []
 
-        for line in lines_iter:
-            if not line.strip():
-                continue
-            cols = line.rstrip("\n").split("\t")
-            if len(cols) < 9:
-                continue
 
-            source, sv_id, sample, chrA, posA, chrB, posB, sA, sB = cols[:9]
-            if expected_source and source != expected_source:
-                continue
-            try:
-                posA = int(posA); posB = int(posB)
-            except ValueError:
-                continue
+def write_tsv_rows(out, records):
+    for r in records:
+        out.write("\t".join(map(str, r)) + "\n")
 
-            svs.append({
-                "source": source, "id": sv_id, "sample": sample,
-                "chrA": chrA, "posA": posA,
-                "chrB": chrB, "posB": posB,
-                "strandA": sA, "strandB": sB
-            })
 
-    return svs
+###############################################################################
+# Step 1: Merge LRS (ignore orientation)
+###############################################################################
+
+class RunningMedian:
+    """
+    Incremental median (two heaps). Returns the same value as
+    statistics.median over everything added so far (int, or float mean
+    of the two middle values for even counts).
+    """
 
+    def __init__(self):
+        self.low = []    # max-heap (negated), holds the smaller half
+        self.high = []   # min-heap, holds the larger half
 
-def group_by_chrpair_ordered(svs):
-    # Step1 already guaranteed chrA<=chrB for both hic & lr
-    d = defaultdict(list)
-    for sv in svs:
-        d[(sv["chrA"], sv["chrB"])].append(sv)
-    return d
+    def add(self, x):
+        if not self.low or x <= -self.low[0]:
+            heappush(self.low, -x)
+        else:
+            heappush(self.high, x)
+        if len(self.low) > len(self.high) + 1:
+            heappush(self.high, -heappop(self.low))
+        elif len(self.high) > len(self.low):
+            heappush(self.low, -heappop(self.high))
 
+    def value(self):
+        if len(self.low) > len(self.high):
+            return -self.low[0]
+        return (-self.low[0] + self.high[0]) / 2
 
-###############################################################################
-# Step 1: Merge LRS (ignore orientation)
-###############################################################################
 
-def can_merge(repA, repB, sv, delta=DELTA_LR):
-    return abs(sv["posA"] - repA) <= delta and abs(sv["posB"] - repB) <= delta
+def can_merge(repA, repB, posA, posB, delta=DELTA_LR):
+    return abs(posA - repA) <= delta and abs(posB - repB) <= delta
 
-def pick_lr_representative(cluster):
+def pick_lr_representative(lrs, cluster, medA, medB):
     """
-    Representative = closest to FLOAT medians.
+    Representative row of `cluster` (row indices into lrs) = closest to
+    FLOAT medians (medA, medB of the cluster).
     Tie-breaker: larger posB, then larger posA, then smaller id.
     Keeps Step1 order chrA<=chrB.
     """
-    medA = median([x["posA"] for x in cluster])
-    medB = median([x["posB"] for x in cluster])
+    posA, posB, ids = lrs.posA[cluster].tolist(), lrs.posB[cluster].tolist(), lrs.id[cluster].tolist()
 
-    def key_fn(x):
-        dist = abs(x["posA"] - medA) + abs(x["posB"] - medB)
-        return (dist, -x["posB"], -x["posA"], x["id"])
+    def key_fn(k):
+        dist = abs(posA[k] - medA) + abs(posB[k] - medB)
+        return (dist, -posB[k], -posA[k], ids[k])
 
-    return min(cluster, key=key_fn)
+    return cluster[min(range(len(cluster)), key=key_fn)]
 
-def merge_lrs_ignore_orientation(lrs_svs, delta=DELTA_LR):
+def iter_lr_clusters(lrs, delta=DELTA_LR):
     """
-    Merge LRS SVs into clusters per (chrA, chrB), ignoring strands.
-    Returns list of clusters (each cluster is list of SV dicts).
+    Single pass over LRS rows sorted by (posA, posB) per (chrA, chrB).
+    A row joins the current cluster if it lies within delta of the running
+    medians on both ends; medians are kept incrementally (O(log k) per SV).
+    Yields (cluster, medA, medB): row indices into lrs and the final float
+    medians of the cluster.
     """
-    clusters_all = []
-    groups = group_by_chrpair_ordered(lrs_svs)
+    groups = group_by_chrpair_ordered(lrs)
 
-    for key, lst in groups.items():
-        lst.sort(key=lambda x: (x["posA"], x["posB"]))
+    for key, rows in groups.items():
+        rows = rows[np.lexsort((lrs.posB[rows], lrs.posA[rows]))]
         cur = []
+        medA = medB = None
         repA = repB = None
 
-        for sv in lst:
-            if not cur:
-                cur = [sv]
-                repA, repB = sv["posA"], sv["posB"]
-                continue
-
-            if can_merge(repA, repB, sv, delta):
-                cur.append(sv)
-                repA = median([x["posA"] for x in cur])
-                repB = median([x["posB"] for x in cur])
+        for r, posA, posB in zip(rows.tolist(), lrs.posA[rows].tolist(), lrs.posB[rows].tolist()):
+            if cur and can_merge(repA, repB, posA, posB, delta):
+                cur.append(r)
             else:
-                clusters_all.append(cur)
-                cur = [sv]
-                repA, repB = sv["posA"], sv["posB"]
+                if cur:
+                    yield cur, repA, repB
+                cur = [r]
+                medA, medB = RunningMedian(), RunningMedian()
+            medA.add(posA)
+            medB.add(posB)
+            repA, repB = medA.value(), medB.value()
 
         if cur:
-            clusters_all.append(cur)
+            yield cur, repA, repB
 
-    return clusters_all
+def merge_lrs_ignore_orientation(lrs, delta=DELTA_LR):
+    """
+    Merge LRS SVs into clusters per (chrA, chrB), ignoring strands.
+    Returns list of clusters (each cluster is a list of row indices into lrs).
+    """
+    return [cluster for cluster, _, _ in iter_lr_clusters(lrs, delta)]
 
-def write_merged_lrs(sample, out_dir, lrs_svs):
+def merge_lrs(lrs, delta=DELTA_LR):
+    """
+    Merge LRS (ignore orientation) in memory.
+    Returns (merged, clusters):
+      merged   SVTable of representatives, ids LRM_1..LRM_n, source "longread"
+      clusters list of row-index lists into lrs (same order as merged)
+    """
+    clusters, reps = [], []
+    for cluster, medA, medB in iter_lr_clusters(lrs, delta):
+        clusters.append(cluster)
+        reps.append(pick_lr_representative(lrs, cluster, medA, medB))
+    return merged_table(lrs, reps), clusters
+
+def merged_table(lrs, reps):
+    """SVTable of the representative rows `reps` (in cluster order), ids LRM_1..LRM_n."""
+    merged = lrs.take(np.asarray(reps, dtype=np.int64))
+    merged.id = np.array([f"LRM_{i}".encode() for i in range(1, len(reps) + 1)], dtype=np.bytes_)
+    merged.source = np.zeros(len(reps), dtype=np.int16)
+    merged.sources = ["longread"]
+    return merged
+
+def write_merged_lrs_files(sample, out_dir, lrs, merged, clusters):
     """
-    Merge LRS (ignore orientation) and write outputs into out_dir:
-      - <sample>_longread_merged.tsv
+    Write merge results into out_dir:
+      - <sample>_longread_merged.tsv (+ .feather sidecar, see sv_table.py)
       - <sample>_longread_merge_map.tsv
     """
-    clusters = merge_lrs_ignore_orientation(lrs_svs, DELTA_LR)
-
     os.makedirs(out_dir, exist_ok=True)
 
     merged_path = os.path.join(out_dir, f"{sample}_longread_merged.tsv")
     map_path    = os.path.join(out_dir, f"{sample}_longread_merge_map.tsv")
 
     with open(merged_path, "w") as out_m, open(map_path, "w") as out_map:
-        out_m.write("\t".join([
-            "source","id","sample","chrA","posA","chrB","posB","strandA","strandB"
-        ]) + "\n")
+        out_m.write("\t".join(COLUMNS) + "\n")
         out_map.write("\t".join(["merged_id","original_id"]) + "\n")
 
+        write_tsv_rows(out_m, merged.records())
+
         for i, cluster in enumerate(clusters, 1):
-            rep = pick_lr_representative(cluster)
             mid = f"LRM_{i}"
+            for sv_id in lrs.ids(cluster):
+                out_map.write("\t".join([mid, sv_id]) + "\n")
 
-            out_m.write("\t".join(map(str, [
-                "longread", mid, rep["sample"],
-                rep["chrA"], rep["posA"], rep["chrB"], rep["posB"],
-                rep["strandA"], rep["strandB"]
-            ])) + "\n")
-
-            for sv in cluster:
-                out_map.write("\t".join([mid, sv["id"]]) + "\n")
+    write_sidecar(merged, merged_path)
+    return merged_path
 
-    return merged_path, clusters
+def write_merged_lrs(sample, out_dir, lrs, sink=None):
+    """
+    Merge LRS (ignore orientation) and hand the merged/map TSVs to `sink`
+    (see OutputSink; sink=None -> no files).
+    Returns (merged, clusters) from memory, so callers never re-read the TSV.
+    """
+    merged, clusters = merge_lrs(lrs, DELTA_LR)
+    if sink is not None:
+        sink.submit(write_merged_lrs_files, sample, out_dir, lrs, merged, clusters)
+    return merged, clusters
 
 
 ###############################################################################
 # Step 2: Hi-C vs merged LRS intersection (Scheme A)
 ###############################################################################
 
-def write_transfinder_bnd(sample, lr_merged_svs, lr_ids_with_match, out_dir):
+def write_transfinder_bnd(sample, lr_merged, lr_match_mask, out_dir):
     """
     Generate bidirectional breakend file for downstream analysis.
 
@@ -233,13 +338,7 @@ def write_transfinder_bnd(sample, lr_merged_svs, lr_ids_with_match, out_dir):
     out_path = os.path.join(out_dir, f"{sample}_transfinder_bnd.tsv")
 
     with open(out_path, "w") as out:
-        for sv in lr_merged_svs:
-            if sv["id"] not in lr_ids_with_match:
-                continue
-
-            chrA, posA, sA = sv["chrA"], sv["posA"], sv["strandA"]
-            chrB, posB, sB = sv["chrB"], sv["posB"], sv["strandB"]
-
+        for _, _, _, chrA, posA, chrB, posB, sA, sB in lr_merged.take(lr_match_mask).records():
             # A -> B
             out.write("\t".join(map(str, [
                 chrA, chrB, f"{sA}{sB}", posA, posB, "translocation"
@@ -253,36 +352,91 @@ def write_transfinder_bnd(sample, lr_merged_svs, lr_ids_with_match, out_dir):
     return out_path
 
 
-def intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir):
-    hic_by_id = {sv["id"]: sv for sv in hic_svs}
-    lr_by_id  = {sv["id"]: sv for sv in lr_merged_svs}
+class BreakpointGrid:
+    """
+    2-D bin index on (posA, posB) for the LRS events of one (chrA, chrB) pair.
 
-    hic_groups = group_by_chrpair_ordered(hic_svs)
-    lr_groups  = group_by_chrpair_ordered(lr_merged_svs)
+    Bin width = tol (at least 1 bp, so tol = 0 is exact matching), so every
+    event within `tol` on both ends of a query lies in the 3x3 bins around
+    the query's own bin. A query returns the
+    matching positions in the input lists, in input order (same order as a
+    nested loop).
+    """
 
-    matched_pairs = []
-    hic_ids_with_match = set()
-    lr_ids_with_match  = set()
-    orientation_conflicts = []
+    def __init__(self, posA, posB, tol):
+        self.posA = posA
+        self.posB = posB
+        self.tol = tol
+        self.width = max(tol, 1)
+        self.bins = defaultdict(list)
+        for i, (a, b) in enumerate(zip(posA, posB)):
+            self.bins[(a // self.width, b // self.width)].append(i)
+
+    def query(self, posA, posB):
+        tol, bins = self.tol, self.bins
+        pA, pB = self.posA, self.posB
+        ba, bb = posA // self.width, posB // self.width
+        hits = []
+        for da in (-1, 0, 1):
+            for db in (-1, 0, 1):
+                for i in bins.get((ba + da, bb + db), ()):
+                    if abs(pA[i] - posA) <= tol and abs(pB[i] - posB) <= tol:
+                        hits.append(i)
+        hits.sort()
+        return hits
+
+
+def match_hic_vs_lr(hic, lr, tol=D_BETWEEN):
+    """
+    Row pairs (hic_rows, lr_rows) with |dposA| <= tol AND |dposB| <= tol
+    on the same (chrA, chrB), as two int64 arrays.
+
+    Per chr-pair, LRS events are binned on (posA, posB) and each Hi-C call
+    only scans the 3x3 neighbouring bins instead of every LRS event.
+    Pairs come out in the same order as the former nested loop:
+    chr-pairs, then Hi-C calls, then LRS events in input order.
+    """
+    hic_groups = group_by_chrpair_ordered(hic)
+    lr_groups  = group_by_chrpair_ordered(lr)
 
+    hic_rows, lr_rows = [], []
     for key in hic_groups.keys() & lr_groups.keys():
-        for h in hic_groups[key]:
-            for l in lr_groups[key]:
-                if (abs(h["posA"] - l["posA"]) <= D_BETWEEN and
-                    abs(h["posB"] - l["posB"]) <= D_BETWEEN):
-
-                    matched_pairs.append((h["id"], l["id"]))
-                    hic_ids_with_match.add(h["id"])
-                    lr_ids_with_match.add(l["id"])
-
-                    if (h["strandA"], h["strandB"]) != (l["strandA"], l["strandB"]):
-                        orientation_conflicts.append({
-                            "sample": sample,
-                            "chrA": h["chrA"], "posA": h["posA"],
-                            "chrB": h["chrB"], "posB": h["posB"],
-                            "hic_id": h["id"], "hic_strandA": h["strandA"], "hic_strandB": h["strandB"],
-                            "lr_id": l["id"],  "lr_strandA": l["strandA"],  "lr_strandB": l["strandB"],
-                        })
+        h_rows, l_rows = hic_groups[key], lr_groups[key].tolist()
+        grid = BreakpointGrid(lr.posA[l_rows].tolist(), lr.posB[l_rows].tolist(), tol)
+        for h, posA, posB in zip(h_rows.tolist(), hic.posA[h_rows].tolist(), hic.posB[h_rows].tolist()):
+            for k in grid.query(posA, posB):
+                hic_rows.append(h)
+                lr_rows.append(l_rows[k])
+
+    return np.asarray(hic_rows, dtype=np.int64), np.asarray(lr_rows, dtype=np.int64)
+
+
+def intersect_hic_vs_lr(sample, hic, lr_merged, out_dir):
+    H, L = match_hic_vs_lr(hic, lr_merged, D_BETWEEN)
+
+    hic_ids = hic.ids(H)
+    lr_ids  = lr_merged.ids(L)
+    matched_pairs = list(zip(hic_ids, lr_ids))
+    hic_ids_with_match = set(hic_ids)
+    lr_ids_with_match  = set(lr_ids)
+
+    # orientation conflicts: compare decoded strands (tables have their own codes)
+    hic_strands = np.array(hic.strands, dtype=object)
+    lr_strands  = np.array(lr_merged.strands, dtype=object)
+    hsA, hsB = hic_strands[hic.strandA[H]], hic_strands[hic.strandB[H]]
+    lsA, lsB = lr_strands[lr_merged.strandA[L]], lr_strands[lr_merged.strandB[L]]
+    conflict = (hsA != lsA) | (hsB != lsB)
+
+    orientation_conflicts = []
+    for k in np.flatnonzero(conflict).tolist():
+        h = hic.record(H[k])
+        orientation_conflicts.append({
+            "sample": sample,
+            "chrA": h[3], "posA": h[4],
+            "chrB": h[5], "posB": h[6],
+            "hic_id": hic_ids[k], "hic_strandA": hsA[k], "hic_strandB": hsB[k],
+            "lr_id": lr_ids[k],   "lr_strandA": lsA[k],  "lr_strandB": lsB[k],
+        })
 
     # Build shared components (annotation only)
     adj = defaultdict(set)
@@ -308,43 +462,27 @@ def intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir):
         components.append({"hic": comp_h, "lr": comp_l})
 
     # ===== Scheme A counts =====
-    all_hic_ids = set(hic_by_id.keys())
-    all_lr_ids  = set(lr_by_id.keys())
-
-    N_HiC_total = len(all_hic_ids)
-    N_LR_total  = len(all_lr_ids)
+    N_HiC_total = len(np.unique(hic.id))
+    N_LR_total  = len(np.unique(lr_merged.id))
 
     N_Shared = len(lr_ids_with_match)  # intersection on merged LRS events
     N_LongRead_only = N_LR_total - N_Shared
     N_HiC_only      = N_HiC_total - len(hic_ids_with_match)
 
+    hic_match_mask = hic.id_mask(hic_ids_with_match)
+    lr_match_mask  = lr_merged.id_mask(lr_ids_with_match)
+
     os.makedirs(out_dir, exist_ok=True)
 
     # 1) intersection hic
     with open(os.path.join(out_dir, f"{sample}_intersection_hic.tsv"), "w") as out:
-        out.write("\t".join([
-            "source","id","sample","chrA","posA","chrB","posB","strandA","strandB"
-        ]) + "\n")
-        for sv in hic_svs:
-            if sv["id"] in hic_ids_with_match:
-                out.write("\t".join(map(str, [
-                    sv["source"], sv["id"], sv["sample"],
-                    sv["chrA"], sv["posA"], sv["chrB"], sv["posB"],
-                    sv["strandA"], sv["strandB"]
-                ])) + "\n")
+        out.write("\t".join(COLUMNS) + "\n")
+        write_tsv_rows(out, hic.take(hic_match_mask).records())
 
     # 2) intersection longread
     with open(os.path.join(out_dir, f"{sample}_intersection_longread.tsv"), "w") as out:
-        out.write("\t".join([
-            "source","id","sample","chrA","posA","chrB","posB","strandA","strandB"
-        ]) + "\n")
-        for sv in lr_merged_svs:
-            if sv["id"] in lr_ids_with_match:
-                out.write("\t".join(map(str, [
-                    sv["source"], sv["id"], sv["sample"],
-                    sv["chrA"], sv["posA"], sv["chrB"], sv["posB"],
-                    sv["strandA"], sv["strandB"]
-                ])) + "\n")
+        out.write("\t".join(COLUMNS) + "\n")
+        write_tsv_rows(out, lr_merged.take(lr_match_mask).records())
 
     # 3) orientation conflicts
     with open(os.path.join(out_dir, f"{sample}_orientation_conflicts.tsv"), "w") as out:
@@ -388,6 +526,7 @@ def intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir):
         ])) + "\n")
 
     # 6) shared LR breakpoints bed per shared component
+    lr_row_by_id = {sv_id: i for i, sv_id in enumerate(lr_merged.ids())}
     bed_path = os.path.join(out_dir, f"{sample}_exact_shared_longread_breakpoints.bed")
     with open(bed_path, "w") as out:
         eid = 0
@@ -395,21 +534,27 @@ def intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir):
             if not (c["hic"] and c["lr"]):
                 continue
             for lr_id in c["lr"]:
-                sv = lr_by_id[lr_id]
+                _, sv_id, _, chrA, posA, chrB, posB, _, _ = lr_merged.record(lr_row_by_id[lr_id])
                 out.write("\t".join(map(str, [
-                    sv["chrA"], sv["posA"], sv["chrB"], sv["posB"],
-                    sv["id"], f"EVENT_{eid}"
+                    chrA, posA, chrB, posB,
+                    sv_id, f"EVENT_{eid}"
                 ])) + "\n")
             eid += 1
 
     # 7) TransFinder bidirectional BND for downstream analysis
     write_transfinder_bnd(
         sample,
-        lr_merged_svs,
-        lr_ids_with_match,
+        lr_merged,
+        lr_match_mask,
         out_dir
     )
 
+    # 8) per-event match detail (merged LRS events left after exclusion;
+    #    the complete table is written by run_sample)
+    write_match_detail(
+        os.path.join(out_dir, f"{sample}_LRS_match_detail.tsv"),
+        lr_match_detail(sample, hic, lr_merged, H, L))
+
     return {
         "sample": sample,
         "N_HiC_total": N_HiC_total,
@@ -421,56 +566,423 @@ def intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir):
 
 
 ###############################################################################
-# Main
+# Per-event match detail
 ###############################################################################
 
-def main():
-    root_dir = get_root_dir()
-    all_summary = []
+MATCH_DETAIL_COLUMNS = [
+    "sample", "lr_id", "chrA", "posA", "strandA", "chrB", "posB", "strandB",
+    "is_shared", "n_hic_support", "orientation_match",
+    "best_hic_id", "best_hic_strandA", "best_hic_strandB", "best_dA", "best_dB",
+    "hic_id_list", "hic_chrA_list", "hic_posA_list", "hic_strandA_list",
+    "hic_chrB_list", "hic_posB_list", "hic_strandB_list",
+]
 
-    sys.stderr.write(
-        f"[INFO] LRS merge(ignore orientation) DELTA={DELTA_LR} bp; "
-        f"HiC-LRS match D_BETWEEN={D_BETWEEN} bp; Scheme A counts.\n"
-    )
+# complete (pre-exclusion) table: rule reason of excluded events, NA otherwise
+MATCH_DETAIL_ALL_COLUMNS = MATCH_DETAIL_COLUMNS + ["excluded"]
 
-    for sample in SAMPLES:
-        in_dir = os.path.join(root_dir, "6_Integration", "1_trans_tsv", sample)
-        out_dir = os.path.join(root_dir, "6_Integration", "2_intersection", sample)
 
-        hic_path = os.path.join(in_dir, f"{sample}_hic.tsv")
-        lr_path  = os.path.join(in_dir, f"{sample}_longread.tsv")
+def _r_bool(x):
+    """TRUE/FALSE, read back as logical by data.table::fread."""
+    return "TRUE" if x else "FALSE"
 
-        hic_svs = load_tsv(hic_path, expected_source="hic")
-        lrs_svs = load_tsv(lr_path,  expected_source="longread")
 
-        if not hic_svs or not lrs_svs:
-            sys.stderr.write(f"[WARN] {sample}: missing hic or longread TSV, skip.\n")
+def lr_match_detail(sample, hic, lr, H, L):
+    """
+    One row per merged LRS event of `lr` (MATCH_DETAIL_COLUMNS order) from
+    the Hi-C/LRS pairs (H, L) of match_hic_vs_lr:
+
+      n_hic_support      Hi-C calls within D_BETWEEN on both ends
+      orientation_match  any supporting call has the same strandA and strandB
+                         (NA if not shared)
+      best_*             supporting call with the smallest |dA| + |dB|, first
+                         in pair order on ties; d = Hi-C pos - LRS pos
+      hic_*_list         ';'-joined distinct values of the supporting calls,
+                         in Hi-C input order
+    """
+    n = len(lr)
+    hic_strands = np.array(hic.strands, dtype=object)
+    lr_strands  = np.array(lr.strands, dtype=object)
+    same = ((hic_strands[hic.strandA[H]] == lr_strands[lr.strandA[L]]) &
+            (hic_strands[hic.strandB[H]] == lr_strands[lr.strandB[L]]))
+    dA = hic.posA[H] - lr.posA[L]
+    dB = hic.posB[H] - lr.posB[L]
+
+    support = np.bincount(L, minlength=n)
+    agree = np.bincount(L, weights=same, minlength=n) > 0
+
+    # best pair per event: lexsort is stable, so ties keep pair order
+    best = np.full(n, -1, dtype=np.int64)
+    if len(L):
+        order = np.lexsort((np.abs(dA) + np.abs(dB), L))
+        first = order[np.r_[True, L[order][1:] != L[order][:-1]]]
+        best[L[first]] = first
+
+    # supporting Hi-C rows per event, Hi-C input order
+    partners = {}
+    if len(L):
+        order = np.lexsort((H, L))
+        bounds = np.flatnonzero(np.diff(L[order])) + 1
+        for grp in np.split(order, bounds):
+            partners[int(L[grp[0]])] = H[grp].tolist()
+
+    rows = []
+    for i, (_, lr_id, _, chrA, posA, chrB, posB, sA, sB) in enumerate(lr.records()):
+        row = [sample, lr_id, chrA, posA, sA, chrB, posB, sB]
+        if not support[i]:
+            rows.append(row + [_r_bool(False), 0] + ["NA"] * 13)
             continue
+        k = best[i]
+        b = hic.record(H[k])
+        recs = [hic.record(h) for h in partners[i]]
+        lists = [";".join(dict.fromkeys(str(r[c]) for r in recs)) for c in (1, 3, 4, 7, 5, 6, 8)]
+        rows.append(row + [
+            _r_bool(True), int(support[i]), _r_bool(agree[i]),
+            b[1], b[7], b[8], int(dA[k]), int(dB[k]),
+        ] + lists)
+    return rows
 
-        # Step 1 merge LRS -> write merged to out_dir
-        merged_lr_path, _clusters = write_merged_lrs(sample, out_dir, lrs_svs)
-        lr_merged_svs = load_tsv(merged_lr_path, expected_source="longread")
+
+def write_match_detail(path, rows, columns=MATCH_DETAIL_COLUMNS):
+    with open(path, "w") as out:
+        out.write("\t".join(columns) + "\n")
+        write_tsv_rows(out, rows)
+    return path
+
+
+def write_complete_match_detail(sample, hic, lr_merged, lr_reason, out_dir):
+    """
+    <sample>_LRS_match_detail_all.tsv: match detail of every merged LRS event
+    against every Hi-C call (tables before exclusion), with the exclusion
+    reason of each event (NA if kept).
+    """
+    H, L = match_hic_vs_lr(hic, lr_merged, D_BETWEEN)
+    rows = [row + [why or "NA"] for row, why in
+            zip(lr_match_detail(sample, hic, lr_merged, H, L), lr_reason.tolist())]
+    return write_match_detail(os.path.join(out_dir, f"{sample}_LRS_match_detail_all.tsv"),
+                              rows, MATCH_DETAIL_ALL_COLUMNS)
+
+
+def write_combined_match_detail(root_dir, samples, suffix, columns=MATCH_DETAIL_COLUMNS):
+    """
+    Concatenate <sample>_<suffix>.tsv of `samples` (in that order) into
+    2_intersection/all_samples_<suffix>.tsv; samples without one are skipped.
+    """
+    inter_dir = os.path.join(root_dir, "6_Integration", "2_intersection")
+    out_path = os.path.join(inter_dir, f"all_samples_{suffix}.tsv")
+    with open(out_path, "w") as out:
+        out.write("\t".join(columns) + "\n")
+        for s in samples:
+            path = os.path.join(inter_dir, s, f"{s}_{suffix}.tsv")
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                f.readline()
+                for line in f:
+                    out.write(line)
+    return out_path
+
+
+###############################################################################
+# Threshold sweep (DELTA_LR x D_BETWEEN)
+###############################################################################
+
+def sweep_sample(root_dir, sample, deltas, dbetweens, chrom_sizes=None, exclusions=None):
+    """
+    Scheme A counts for every (delta, d_between) combination of one sample.
+
+    Each merged LRS event is its representative raw LRS row, so Hi-C vs raw
+    LRS pairs are found once at max(dbetweens) with their distance
+    max(|dposA|, |dposB|). Per delta only the (linear) merge is redone;
+    each D_BETWEEN is then a threshold on per-event minimum distances.
+    Exclusion rules are applied as in run_sample: to the Hi-C calls before
+    matching, and per delta to the merged events (ids LRM_1..n as assigned
+    by merge_lrs at that delta).
+    Returns tidy rows (dicts), or None when an input TSV is missing.
+    """
+    hic, lrs = load_sample_tsvs(root_dir, sample, chrom_sizes)
+    rules = load_exclusions(exclusions)
+    hic = hic.take(rules.apply(hic, sample)[0])
+
+    if not len(hic) or not len(lrs):
+        sys.stderr.write(f"[WARN] {sample}: missing hic or longread TSV, skip.\n")
+        return None
+
+    dbetweens = np.asarray(sorted(dbetweens), dtype=np.int64)
+    H, L = match_hic_vs_lr(hic, lrs, int(dbetweens[-1]))
+    dist = np.maximum(np.abs(hic.posA[H] - lrs.posA[L]), np.abs(hic.posB[H] - lrs.posB[L]))
+
+    # Hi-C counts are per unique id (as in intersect_hic_vs_lr)
+    _, hic_uid = np.unique(hic.id, return_inverse=True)
+    N_HiC_total = int(hic_uid.max()) + 1
+
+    rows = []
+    for delta in sorted(deltas):
+        reps = np.asarray([pick_lr_representative(lrs, c, mA, mB)
+                           for c, mA, mB in iter_lr_clusters(lrs, delta)], dtype=np.int64)
+        reps = reps[rules.apply(merged_table(lrs, reps), sample)[0]]
+        is_rep = np.zeros(len(lrs), dtype=bool)
+        is_rep[reps] = True
+        sel = is_rep[L]
+
+        lr_min = np.full(len(lrs), np.iinfo(np.int64).max)
+        np.minimum.at(lr_min, L[sel], dist[sel])
+        hic_min = np.full(N_HiC_total, np.iinfo(np.int64).max)
+        np.minimum.at(hic_min, hic_uid[H[sel]], dist[sel])
+
+        n_shared = np.searchsorted(np.sort(lr_min[reps]), dbetweens, side="right")
+        n_hic_matched = np.searchsorted(np.sort(hic_min), dbetweens, side="right")
+
+        for d, ns, nh in zip(dbetweens.tolist(), n_shared.tolist(), n_hic_matched.tolist()):
+            rows.append({
+                "sample": sample, "DELTA_LR": delta, "D_BETWEEN": d,
+                "N_HiC_total": N_HiC_total, "N_LR_total": len(reps),
+                "N_HiC_only": N_HiC_total - nh, "N_LR_only": len(reps) - ns,
+                "N_Shared": ns,
+            })
+    return rows
+
+
+def sweep_sample_logged(args):
+    """Pool worker for sweep_sample; errors are logged, never raised."""
+    root_dir, sample, deltas, dbetweens, chrom_sizes, exclusions = args
+    try:
+        return sweep_sample(root_dir, sample, deltas, dbetweens, chrom_sizes, exclusions)
+    except Exception:
+        sys.stderr.write(f"[ERROR] {sample}: sweep failed\n{traceback.format_exc()}")
+        return [{"sample": sample, "status": "error"}]
+
+
+def run_sweep(root_dir, deltas, dbetweens, jobs, chrom_sizes=None, exclusions=None):
+    """
+    Write 6_Integration/2_intersection/threshold_sweep.tsv
+    (one row per sample x DELTA_LR x D_BETWEEN).
+    """
+    tasks = [(root_dir, sample, deltas, dbetweens, chrom_sizes, exclusions) for sample in SAMPLES]
+    if jobs > 1:
+        with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+            results = pool.map(sweep_sample_logged, tasks, chunksize=1)
+    else:
+        results = [sweep_sample_logged(t) for t in tasks]
+
+    cols = ["sample","DELTA_LR","D_BETWEEN","N_HiC_total","N_LR_total",
+            "N_HiC_only","N_LR_only","N_Shared"]
+    out_path = os.path.join(root_dir, "6_Integration", "2_intersection", "threshold_sweep.tsv")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    failed = []
+    with open(out_path, "w") as out:
+        out.write("\t".join(cols) + "\n")
+        for rows in results:
+            for r in rows or []:
+                if r.get("status") == "error":
+                    failed.append(r["sample"])
+                    continue
+                out.write("\t".join(str(r[c]) for c in cols) + "\n")
+
+    sys.stderr.write(f"[INFO] Wrote threshold sweep: {out_path}\n")
+    return failed
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def load_sample_tsvs(root_dir, sample, chrom_sizes=None):
+    """
+    Step1 Hi-C and long-read TSVs of one sample as SVTables, with chrA <= chrB
+    re-enforced in karyotype order (karyotype.py) so both sources agree.
+    """
+    in_dir = os.path.join(root_dir, "6_Integration", "1_trans_tsv", sample)
+    karyo = load_karyotype(chrom_sizes)
+
+    hic = load_table(os.path.join(in_dir, f"{sample}_hic.tsv"), expected_source="hic")
+    lrs = load_table(os.path.join(in_dir, f"{sample}_longread.tsv"), expected_source="longread")
+    return normalize_chrom_order(hic, karyo), normalize_chrom_order(lrs, karyo)
+
+
+def apply_exclusions(sample, rules, hic, lr_merged, out_dir):
+    """
+    Drop the Hi-C calls and merged LRS events matched by the exclusion
+    rules (exclusions.py) and list them in <sample>_excluded.tsv
+    (header only when nothing is excluded). Returns the kept tables and
+    the reason per row of lr_merged ("" = kept).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    kept, reasons = [], []
+    with open(os.path.join(out_dir, f"{sample}_excluded.tsv"), "w") as out:
+        out.write("\t".join(COLUMNS + ["reason"]) + "\n")
+        for table in (hic, lr_merged):
+            keep, reason = rules.apply(table, sample)
+            drop = np.flatnonzero(~keep)
+            for i, why in zip(drop.tolist(), reason[drop].tolist()):
+                out.write("\t".join(map(str, table.record(i) + (why,))) + "\n")
+            kept.append(table.take(keep) if len(drop) else table)
+            reasons.append(reason)
+    n_hic, n_lr = len(hic) - len(kept[0]), len(lr_merged) - len(kept[1])
+    if n_hic or n_lr:
+        sys.stderr.write(f"[INFO] {sample}: excluded {n_hic} Hi-C calls, {n_lr} merged LRS events.\n")
+    return kept[0], kept[1], reasons[1]
+
+
+def run_sample(root_dir, sample, chrom_sizes=None, exclusions=None):
+    """
+    Merge + intersect one sample. Returns its summary dict, or None when the
+    Hi-C or long-read TSV is missing. `exclusions`: rule file path (None or
+    '' = no exclusions).
+    """
+    out_dir = os.path.join(root_dir, "6_Integration", "2_intersection", sample)
+
+    hic, lrs = load_sample_tsvs(root_dir, sample, chrom_sizes)
+
+    if not len(hic) or not len(lrs):
+        sys.stderr.write(f"[WARN] {sample}: missing hic or longread TSV, skip.\n")
+        return None
+
+    sink = OutputSink(background=True)
+    try:
+        # Step 1 merge LRS (in memory; merged TSVs written in background)
+        lr_merged, _clusters = write_merged_lrs(sample, out_dir, lrs, sink)
+
+        # excluded calls never reach matching (nor transfinder_bnd.tsv)
+        hic_kept, lr_kept, lr_reason = apply_exclusions(
+            sample, load_exclusions(exclusions), hic, lr_merged, out_dir)
 
         # Step 2 intersect
-        summ = intersect_hic_vs_lr(sample, hic_svs, lr_merged_svs, out_dir)
-        all_summary.append(summ)
+        summ = intersect_hic_vs_lr(sample, hic_kept, lr_kept, out_dir)
+        write_complete_match_detail(sample, hic, lr_merged, lr_reason, out_dir)
+    finally:
+        sink.close()
+    return summ
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
 
-    # Combined summary across samples
+
+def run_sample_logged(args):
+    """
+    Pool worker: run_sample with wall time / peak RSS, never raises.
+    Errors are returned as status "error" so other samples keep running.
+    """
+    root_dir, sample, chrom_sizes, exclusions = args
+    t0 = time.time()
+    try:
+        summ = run_sample(root_dir, sample, chrom_sizes, exclusions)
+        if summ is None:
+            return None
+        summ["status"] = "ok"
+    except Exception:
+        sys.stderr.write(f"[ERROR] {sample}: failed\n{traceback.format_exc()}")
+        summ = {"sample": sample, "status": "error"}
+    summ["wall_time_s"] = f"{time.time() - t0:.2f}"
+    summ["peak_rss_mb"] = f"{peak_rss_mb():.1f}"
+    return summ
+
+
+SUMMARY_COLUMNS = ["sample","N_HiC_total","N_LR_total","N_HiC_only","N_LR_only","N_Shared",
+                   "status","wall_time_s","peak_rss_mb"]
+
+
+def read_combined_summary(path):
+    """{sample: row dict} of an existing combined summary ({} if absent)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        header = f.readline().rstrip("\n").split("\t")
+        rows = [dict(zip(header, line.rstrip("\n").split("\t"))) for line in f if line.strip()]
+    return {r["sample"]: r for r in rows if "sample" in r}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge LRS translocations and intersect with Hi-C calls per sample.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="samples processed in parallel (process pool); default 1")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES,
+                        help="samples to (re)run; other rows of the combined summary are kept")
+    parser.add_argument("--sweep-delta", type=int, nargs="+", metavar="BP",
+                        help="sweep mode: DELTA_LR grid (bp)")
+    parser.add_argument("--sweep-dbetween", type=int, nargs="+", metavar="BP",
+                        help="sweep mode: D_BETWEEN grid (bp)")
+    parser.add_argument("--chrom-sizes", default=None,
+                        help="chrom.sizes defining chromosome order (default: built-in hg38)")
+    parser.add_argument("--exclusions", default=EXCLUSIONS,
+                        help="exclusion rule file applied before matching "
+                             "(default: 6_Integration/exclusions.tsv; '' = none)")
+    args = parser.parse_args()
+
+    if args.exclusions and not os.path.exists(args.exclusions):
+        parser.error(f"exclusion file not found: {args.exclusions}")
+    for sample, sv_id in load_exclusions(args.exclusions).positional_ids():
+        sys.stderr.write(f"[WARN] exclusion rule '{sample} id {sv_id}': {sv_id} is numbered by "
+                         f"position; pin it to coordinates with 'exclusions.py pin'.\n")
+
+    root_dir = get_root_dir()
+
+    if args.sweep_delta or args.sweep_dbetween:
+        deltas = args.sweep_delta or [DELTA_LR]
+        dbetweens = args.sweep_dbetween or [D_BETWEEN]
+        sys.stderr.write(
+            f"[INFO] Threshold sweep: {len(deltas)} DELTA_LR x {len(dbetweens)} D_BETWEEN; "
+            f"jobs={args.jobs}.\n"
+        )
+        failed = run_sweep(root_dir, deltas, dbetweens, args.jobs, args.chrom_sizes, args.exclusions)
+        if failed:
+            sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+            sys.exit(1)
+        return
+
+    sys.stderr.write(
+        f"[INFO] LRS merge(ignore orientation) DELTA={DELTA_LR} bp; "
+        f"HiC-LRS match D_BETWEEN={D_BETWEEN} bp; Scheme A counts; jobs={args.jobs}.\n"
+    )
+
+    tasks = [(root_dir, sample, args.chrom_sizes, args.exclusions) for sample in args.samples]
+    if args.jobs > 1:
+        # one process per sample (maxtasksperchild=1) so peak RSS is per sample
+        with multiprocessing.Pool(min(args.jobs, len(tasks)), maxtasksperchild=1) as pool:
+            results = pool.map(run_sample_logged, tasks, chunksize=1)
+    else:
+        # in-process: peak RSS is that of the whole run so far
+        results = [run_sample_logged(t) for t in tasks]
+
+    run_summary = [r for r in results if r is not None]
+
+    # Combined summary across samples: rows of samples not run this time are kept
     comb_path = os.path.join(root_dir, "6_Integration", "2_intersection",
                              "all_samples_exact_event_summary.tsv")
     os.makedirs(os.path.dirname(comb_path), exist_ok=True)
+    rows = {s: r for s, r in read_combined_summary(comb_path).items() if s not in args.samples}
+    for r in run_summary:
+        rows[r["sample"]] = r
+    # SAMPLES order (then others by name), independent of completion order
+    order = {s: i for i, s in enumerate(SAMPLES)}
+    all_summary = sorted(rows.values(), key=lambda r: (order.get(r["sample"], len(order)), r["sample"]))
     with open(comb_path, "w") as out:
-        out.write("\t".join([
-            "sample","N_HiC_total","N_LR_total","N_HiC_only","N_LR_only","N_Shared"
-        ]) + "\n")
+        out.write("\t".join(SUMMARY_COLUMNS) + "\n")
         for r in all_summary:
             out.write("\t".join(map(str, [
-                r["sample"], r["N_HiC_total"], r["N_LR_total"],
-                r["N_HiC_only"], r["N_LR_only"], r["N_Shared"]
+                r["sample"], r.get("N_HiC_total", "NA"), r.get("N_LR_total", "NA"),
+                r.get("N_HiC_only", "NA"), r.get("N_LR_only", "NA"), r.get("N_Shared", "NA"),
+                r.get("status", "NA"), r.get("wall_time_s", "NA"), r.get("peak_rss_mb", "NA")
             ])) + "\n")
 
     sys.stderr.write(f"[INFO] Wrote combined summary: {comb_path}\n")
 
+    # rows kept from an older summary (no status column, written back as NA)
+    # only ever listed finished samples; 3_plot_translocations_42bnd.R uses the same rule
+    ok_samples = [r["sample"] for r in all_summary if r.get("status", "NA") in ("ok", "NA")]
+    for suffix, columns in (("LRS_match_detail", MATCH_DETAIL_COLUMNS),
+                            ("LRS_match_detail_all", MATCH_DETAIL_ALL_COLUMNS)):
+        path = write_combined_match_detail(root_dir, ok_samples, suffix, columns)
+        sys.stderr.write(f"[INFO] Wrote combined match detail: {path}\n")
+
+    failed = [r["sample"] for r in run_summary if r["status"] != "ok"]
+    if failed:
+        sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
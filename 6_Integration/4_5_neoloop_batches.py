@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cohort-wide driver for assemble-complexSVs + neoloop-caller (batched
+version of 4_assemble-complex_bnd.sh and 5_neoloop-caller.sh).
+
+Per sample the BND records of <sample>_transfinder_bnd.tsv are split into
+independent groups: two records are linked when they have a breakend on
+the same chromosome within --link-distance (default 10 Mb, twice the 5 Mb
+span assemble-complexSVs extends each breakpoint by), and groups are the
+connected components. Records of different groups can never be assembled
+together, so each group can be run on its own. Small groups are packed
+into batches of at most --batch-size records (whole groups only).
+
+Batches of all samples go into one work queue, largest first, run by
+--jobs workers with --nproc cores each (assemble-complexSVs, then
+neoloop-caller on that batch's assemblies), so the cohort runs as one job
+instead of serial 30-core runs per sample. A batch is not re-run when its
+outputs are newer than its BND file and its stamp (<batch>.stamp.json:
+mcool size + mtime, resolutions, tool command lines) still matches, so a
+rewritten mcool (e.g. by correct-cnv) or new tool flags re-run it
+(--force re-runs all).
+
+Batches are not free: assemble-complexSVs and neoloop-caller each start
+with the genome-wide expected (neoloop.util.calculate_expected) at every
+resolution, so each batch costs 2 x 3 such passes whatever its size. A
+pass rescans each chromosome's sparse matrix once per diagonal up to 5 Mb
+(1000 diagonals at 5k); on a synthetic 5k cooler neoloop 0.4.3 managed
+about 0.2 M pixels/s per core. Splitting a sample only pays off when the
+per-record work outweighs that, so the default --batch-size (200) keeps
+a typical sample in one batch (parallelism comes from samples running
+side by side) and splits only outliers; lower it for a sample with many
+independent groups.
+
+When all batches of a sample succeed, their outputs are merged into the
+files the downstream stages read; assembly IDs are renumbered per prefix
+(A0, A1, ..., C0, C1, ...) in batch order, and the IDs in the 7th column
+of the neo-loops are renamed to match:
+  6_Integration/4_complex_bnd/<sample>/<sample>.assemblies.txt
+  6_Integration/4_complex_bnd/<sample>/<sample>.bnd_groups.tsv
+      chrA chrB strands posA posB type group batch
+  6_Integration/5_neoloop-caller/<sample>/<sample>.neo-loops.txt
+
+Per-batch inputs, outputs and logs:
+  6_Integration/4_complex_bnd/<sample>/batches/<sample>.b<k>.{bnd.tsv,assemblies.txt,stamp.json,log}
+  6_Integration/5_neoloop-caller/<sample>/batches/<sample>.b<k>.{neo-loops.txt,log}
+
+Usage:
+  python3 6_Integration/4_5_neoloop_batches.py [--samples PT3 ...] [--jobs 4] [--nproc 8]
+                                               [--batch-size 200] [--link-distance 10000000]
+                                               [--force] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLES = ["KMS11","LP1","MM1S","RPMI8226","U266","PT1","PT2","PT3"]
+
+RESOLUTIONS = [25000, 10000, 5000]
+
+LINK_DISTANCE = 10000000
+BATCH_SIZE = 200
+NPROC = 8
+
+ASSEMBLE = ["assemble-complexSVs", "--balance-type", "CNV", "--protocol", "insitu"]
+NEOLOOP  = ["neoloop-caller", "--balance-type", "CNV", "--protocol", "insitu", "--prob", "0.95"]
+
+ASSEMBLY_ID_RE = re.compile(r"^([A-Za-z]+)([0-9]+)$")
+
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+
+###############################################################################
+# Grouping
+###############################################################################
+
+def read_bnd(path):
+    """Records of a transfinder_bnd.tsv as column lists (chrA chrB strands posA posB type)."""
+    rows = []
+    with open(path) as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 6:
+                rows.append(cols)
+    return rows
+
+
+def bnd_groups(rows, link=LINK_DISTANCE):
+    """
+    Group label per record (0, 1, ... in order of first record). Breakends
+    are sorted per chromosome; neighbours within `link` are joined
+    (union-find), which links every pair within `link` transitively.
+    """
+    parent = list(range(len(rows)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    ends = defaultdict(list)
+    for i, r in enumerate(rows):
+        ends[r[0]].append((int(r[3]), i))
+        ends[r[1]].append((int(r[4]), i))
+    for chrom_ends in ends.values():
+        chrom_ends.sort()
+        for (p1, i), (p2, j) in zip(chrom_ends, chrom_ends[1:]):
+            if p2 - p1 <= link:
+                ri, rj = find(i), find(j)
+                if ri != rj:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    label, out = {}, []
+    for i in range(len(rows)):
+        out.append(label.setdefault(find(i), len(label)))
+    return out
+
+
+def pack_batches(groups, batch_size=BATCH_SIZE):
+    """
+    Batch label per group: first-fit decreasing on group size, so every
+    batch holds <= batch_size records unless a single group is larger.
+    """
+    sizes = defaultdict(int)
+    for g in groups:
+        sizes[g] += 1
+    batch_of, loads = {}, []
+    for g in sorted(sizes, key=lambda g: (-sizes[g], g)):
+        for b, load in enumerate(loads):
+            if load + sizes[g] <= batch_size:
+                loads[b] += sizes[g]
+                batch_of[g] = b
+                break
+        else:
+            batch_of[g] = len(loads)
+            loads.append(sizes[g])
+    return batch_of
+
+
+###############################################################################
+# Batches
+###############################################################################
+
+def sample_paths(root_dir, sample):
+    integ = os.path.join(root_dir, "6_Integration")
+    return {
+        "bnd": os.path.join(integ, "2_intersection", sample, f"{sample}_transfinder_bnd.tsv"),
+        "mcool": os.path.join(root_dir, "2_HiC", "2_get_hic_mcool", sample, f"{sample}_contact.mcool"),
+        "asm_dir": os.path.join(integ, "4_complex_bnd", sample),
+        "loop_dir": os.path.join(integ, "5_neoloop-caller", sample),
+    }
+
+
+def write_if_changed(path, text):
+    """Write text unless the file already holds it (keeps the mtime of unchanged batches)."""
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    with open(path, "w") as out:
+        out.write(text)
+    return True
+
+
+def plan_sample(root_dir, sample, link=LINK_DISTANCE, batch_size=BATCH_SIZE):
+    """
+    Split one sample into batch tasks (dicts) and write the batch BND files
+    and <sample>.bnd_groups.tsv. Returns None when an input is missing.
+    """
+    p = sample_paths(root_dir, sample)
+    for key in ("bnd", "mcool"):
+        if not os.path.exists(p[key]):
+            sys.stderr.write(f"[WARN] {sample}: missing {p[key]}, skip.\n")
+            return None
+
+    rows = read_bnd(p["bnd"])
+    groups = bnd_groups(rows, link)
+    batch_of = pack_batches(groups, batch_size)
+
+    batch_asm = os.path.join(p["asm_dir"], "batches")
+    batch_loop = os.path.join(p["loop_dir"], "batches")
+    os.makedirs(batch_asm, exist_ok=True)
+    os.makedirs(batch_loop, exist_ok=True)
+
+    with open(os.path.join(p["asm_dir"], f"{sample}.bnd_groups.tsv"), "w") as out:
+        out.write("\t".join(["chrA", "chrB", "strands", "posA", "posB", "type", "group", "batch"]) + "\n")
+        for r, g in zip(rows, groups):
+            out.write("\t".join(r[:6] + [f"G{g}", f"b{batch_of[g]}"]) + "\n")
+
+    members = defaultdict(list)
+    for r, g in zip(rows, groups):
+        members[batch_of[g]].append(r)
+
+    tasks = []
+    for b in sorted(members):
+        prefix = os.path.join(batch_asm, f"{sample}.b{b}")
+        write_if_changed(prefix + ".bnd.tsv", "".join("\t".join(r) + "\n" for r in members[b]))
+        tasks.append({
+            "sample": sample, "batch": b, "n_records": len(members[b]),
+            "n_groups": len({g for g in groups if batch_of[g] == b}),
+            "mcool": p["mcool"], "bnd": prefix + ".bnd.tsv", "asm_prefix": prefix,
+            "loops": os.path.join(batch_loop, f"{sample}.b{b}.neo-loops.txt"),
+        })
+    return tasks
+
+
+def batch_stamp(task):
+    """What a batch's outputs depend on besides its BND file."""
+    st = os.stat(task["mcool"])
+    return {"mcool": task["mcool"], "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "resolutions": RESOLUTIONS, "assemble": ASSEMBLE, "neoloop": NEOLOOP}
+
+
+def read_stamp(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def batch_done(task):
+    asm, loops = task["asm_prefix"] + ".assemblies.txt", task["loops"]
+    if not (os.path.exists(asm) and os.path.exists(loops)):
+        return False
+    if os.path.getmtime(loops) < os.path.getmtime(task["bnd"]):
+        return False
+    return read_stamp(task["asm_prefix"] + ".stamp.json") == batch_stamp(task)
+
+
+def hic_args(mcool):
+    return ["-H"] + [f"{mcool}::resolutions/{res}" for res in RESOLUTIONS]
+
+
+def run_batch(task, nproc=NPROC):
+    """assemble-complexSVs then neoloop-caller on one batch; raises on failure."""
+    env = dict(os.environ, NUMEXPR_MAX_THREADS=str(nproc))
+    asm = task["asm_prefix"] + ".assemblies.txt"
+    stamp_path = task["asm_prefix"] + ".stamp.json"
+    # taken before the run: an mcool rewritten meanwhile leaves the batch stale
+    stamp = batch_stamp(task)
+    if os.path.exists(stamp_path):
+        os.remove(stamp_path)
+
+    with open(task["asm_prefix"] + ".log", "w") as log:
+        subprocess.run(ASSEMBLE + ["-O", task["asm_prefix"], "-B", task["bnd"], "--nproc", str(nproc)]
+                       + hic_args(task["mcool"]), env=env, stdout=log, stderr=subprocess.STDOUT,
+                       check=True)
+
+    # no assembly in this batch: nothing for neoloop-caller
+    if not os.path.exists(asm) or not os.path.getsize(asm):
+        open(asm, "a").close()
+        open(task["loops"], "w").close()
+    else:
+        with open(os.path.splitext(task["loops"])[0] + ".log", "w") as log:
+            subprocess.run(NEOLOOP + ["-O", task["loops"], "--assembly", asm, "--nproc", str(nproc)]
+                           + hic_args(task["mcool"]), env=env, stdout=log, stderr=subprocess.STDOUT,
+                           check=True)
+        if not os.path.exists(task["loops"]):
+            raise RuntimeError(f"neoloop-caller wrote no {task['loops']}")
+
+    with open(stamp_path, "w") as out:
+        json.dump(stamp, out)
+
+
+def run_batch_logged(task, nproc=NPROC):
+    label = f"{task['sample']} b{task['batch']} ({task['n_records']} records)"
+    t0 = time.time()
+    sys.stderr.write(f"[RUN] {label}\n")
+    try:
+        run_batch(task, nproc)
+        sys.stderr.write(f"[DONE] {label} ({time.time() - t0:.0f} s)\n")
+        return True
+    except Exception:
+        sys.stderr.write(f"[ERROR] {label}: failed (see {task['asm_prefix']}.log)\n"
+                         f"{traceback.format_exc()}")
+        return False
+
+
+###############################################################################
+# Merge
+###############################################################################
+
+def renumber(ids, counters):
+    """{old: new} for assembly IDs in first-seen order, continuing `counters` per prefix."""
+    rename = {}
+    for ac in ids:
+        if ac in rename:
+            continue
+        m = ASSEMBLY_ID_RE.match(ac)
+        if not m:
+            rename[ac] = ac
+            continue
+        rename[ac] = f"{m.group(1)}{counters[m.group(1)]}"
+        counters[m.group(1)] += 1
+    return rename
+
+
+def merge_sample(sample, tasks, asm_out, loop_out):
+    """
+    Concatenate the batch assemblies (IDs renumbered) and neo-loops (IDs in
+    the 7th column renamed; a loop reported by several batches keeps all
+    annotations). Both files are replaced atomically.
+    """
+    counters = defaultdict(int)
+    asm_lines, loops = [], {}
+    for task in sorted(tasks, key=lambda t: t["batch"]):
+        with open(task["asm_prefix"] + ".assemblies.txt") as f:
+            lines = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+        rename = renumber([cols[0] for cols in lines], counters)
+        asm_lines += ["\t".join([rename[cols[0]]] + cols[1:]) for cols in lines]
+
+        with open(task["loops"]) as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 7:
+                    continue
+                ann = cols[6].split(",")
+                ann[0::3] = [rename.get(ac, ac) for ac in ann[0::3]]
+                key = tuple(cols[:6])
+                if key in loops:
+                    loops[key] += "," + ",".join(ann)
+                else:
+                    loops[key] = ",".join(ann)
+
+    os.makedirs(os.path.dirname(loop_out), exist_ok=True)
+    for path, lines in ((asm_out, asm_lines),
+                        (loop_out, ["\t".join(k) + "\t" + v for k, v in loops.items()])):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as out:
+            out.writelines(line + "\n" for line in lines)
+        os.replace(tmp, path)
+    return len(asm_lines), len(loops)
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Batched assemble-complexSVs + neoloop-caller over a cohort work queue.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--jobs", type=int, default=1, help="batches run concurrently")
+    parser.add_argument("--nproc", type=int, default=NPROC,
+                        help="--nproc of each assemble-complexSVs / neoloop-caller call")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="max BND records per batch (whole groups only)")
+    parser.add_argument("--link-distance", type=int, default=LINK_DISTANCE,
+                        help="breakends closer than this on a chromosome share a group (bp)")
+    parser.add_argument("--force", action="store_true", help="re-run batches with current outputs")
+    parser.add_argument("--dry-run", action="store_true", help="write the batch plan only")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    by_sample = {}
+    for s in args.samples:
+        tasks = plan_sample(root_dir, s, args.link_distance, args.batch_size)
+        if tasks is None:
+            continue
+        by_sample[s] = tasks
+        sys.stderr.write(f"[INFO] {s}: {sum(t['n_records'] for t in tasks)} BND records, "
+                         f"{sum(t['n_groups'] for t in tasks)} groups, {len(tasks)} batches\n")
+
+    queue = [t for tasks in by_sample.values() for t in tasks if args.force or not batch_done(t)]
+    # largest batches first, so the long ones do not end up last on few cores
+    queue.sort(key=lambda t: -t["n_records"])
+    sys.stderr.write(f"[INFO] {len(queue)} batches to run; {args.jobs} x {args.nproc} cores.\n")
+    if args.dry_run:
+        return
+
+    with ThreadPoolExecutor(max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda t: run_batch_logged(t, args.nproc), queue))
+    failed_batches = {(t["sample"], t["batch"]) for t, ok in zip(queue, results) if not ok}
+
+    failed = []
+    for s, tasks in by_sample.items():
+        if any((s, t["batch"]) in failed_batches for t in tasks):
+            failed.append(s)
+            continue
+        p = sample_paths(root_dir, s)
+        n_asm, n_loops = merge_sample(
+            s, tasks,
+            os.path.join(p["asm_dir"], f"{s}.assemblies.txt"),
+            os.path.join(p["loop_dir"], f"{s}.neo-loops.txt"))
+        sys.stderr.write(f"[INFO] {s}: {n_asm} assemblies, {n_loops} loops merged.\n")
+
+    if failed:
+        sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
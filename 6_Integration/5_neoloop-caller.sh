@@ -3,9 +3,17 @@ set -euo pipefail
 
 export NUMEXPR_MAX_THREADS=30
 
+# Whole cohort in one job (BNDs split into independent groups, one work
+# queue across samples, outputs merged): 4_5_neoloop_batches.py
+
 # SAMPLES=(KMS11 LP1 MM1S RPMI8226 U266 PT1 PT2 PT3)
 SAMPLES=(PT3)
 
+# Stage runner (run_stages.py): only the samples in TF_SAMPLES
+if [[ -n "${TF_SAMPLES:-}" ]]; then
+    read -ra SAMPLES <<< "${TF_SAMPLES}"
+fi
+
 # 
 HERE="$(pwd)"
 
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Annotate translocation-induced neo E-P loops per sample (in-process version
+of 6_bnd-ep-loop-gene.sh: no bedtools / join / grep -w -f).
+
+Promoters (coding_gene_promoters_1kb.bed) come from a persistent index
+(coding_gene_promoters_1kb.bed.index/, memory-mapped, rebuilt when the BED
+changes) and H3K27ac peaks are loaded per sample, both as per-chromosome
+sorted interval indexes (intervals.py); all loop anchors are queried in one
+vectorized call per index. Loops, genes and
+assemblies are joined on exact keys:
+  loop key      = first 6 columns (chrA startA endA chrB startB endB)
+  gene key      = gene name (promoter BED column 4 / Gene Name column 2)
+  assembly key  = assembly ID (first column of <sample>.assemblies.txt)
+
+Inputs (per sample):
+  6_Integration/5_neoloop-caller/<sample>/<sample>.neo-loops.txt
+  6_Integration/4_complex_bnd/<sample>/<sample>.assemblies.txt
+  3_CUTtag/4_macs2/<sample>*H3K27ac*peaks.narrowPeak          (first match)
+  5_RNAseq/8_expression_matrix/       cohort TPM store (expression_matrix.py), or
+  5_RNAseq/7_stringtie_tpm/<sample>/<sample>_coding_genes_tpm_fpkm.tsv (or .csv)
+                                      when the store is missing / lacks the sample
+  6_Integration/coding_gene_promoters_1kb.bed
+
+Outputs (same files and columns as the shell version), in
+6_Integration/6_bnd-ep-loop-gene/<sample>/:
+  1_neo-loop.tsv               neo-loops (7th column "x,y,1")
+  2_anchor_left.tsv            chrA startA endA loop#
+  2_anchor_right.tsv           chrB startB endB loop#
+  3_neo-p-e-loop.tsv           promoter(left)-enhancer(right): 6 loop cols, gene, loop#
+  3_neo-e-p-loop.tsv           enhancer(left)-promoter(right): 6 loop cols, gene, loop#
+  4_neo-ep-loop.tsv            3_ files combined, unique
+  5_neo-ep-loop-bnd.tsv        neo-loops with an E-P annotation
+  6_gene.tsv                   annotated genes with TPM >= 10 (gene table rows; from the
+                               store: same 9 columns, "." for Reference/Strand/Start/End,
+                               by gene name)
+  5_2_neo-ep-loop_plot.tsv     E-P neo-loops of those genes
+  7_assembleBND.txt            assemblies referenced by those loops
+  8_bnd_neo-ep-loop-gene.tsv   5_2 rows + genes (comma-joined) + anchor A width
+Sorted outputs (3_, 4_) use byte order, as `LC_ALL=C sort`.
+
+Usage:
+  python3 6_Integration/6_bnd-ep-loop-gene.py [--samples PT1 PT2 ...] [--jobs N]
+                                              [--expression-store DIR]
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import re
+import sys
+import traceback
+
+import numpy as np
+
+from intervals import IntervalIndex, cached_bed_index
+
+# cohort expression store (5_RNAseq/expression_matrix.py)
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "5_RNAseq"))
+from expression_matrix import ExpressionMatrix
+
+SAMPLES = ["LP1", "KMS11", "MM1S", "RPMI8226", "U266", "PT1", "PT2", "PT3"]
+
+TPM_MIN = 10
+ASSEMBLY_ID_RE = re.compile(r"\b[A-C][0-9]+\b")
+
+
+###############################################################################
+# Utils
+###############################################################################
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+def write_rows(path, rows):
+    with open(path, "w") as out:
+        for r in rows:
+            out.write("\t".join(map(str, r)) + "\n")
+
+def write_lines(path, lines):
+    with open(path, "w") as out:
+        out.writelines(lines)
+
+def read_lines(path):
+    with open(path) as f:
+        return [line if line.endswith("\n") else line + "\n" for line in f]
+
+
+###############################################################################
+# Annotation
+###############################################################################
+
+def neo_loops(neo_loop_path):
+    """Lines of neo-loops.txt whose 7th column is "<..>,<..>,1"."""
+    out = []
+    for line in read_lines(neo_loop_path):
+        cols = line.split()
+        if len(cols) >= 7:
+            a = cols[6].split(",")
+            if len(a) >= 3 and a[2] == "1":
+                out.append(line)
+    return out
+
+def anchor_hits(index, anchors, with_name):
+    """
+    Unique (loop#, chr, start, end[, name]) of anchors overlapping `index`,
+    in byte order of their tab-joined text (as sort -u).
+    """
+    Q, I = index.query([a[0] for a in anchors],
+                       [int(a[1]) for a in anchors], [int(a[2]) for a in anchors])
+    rows = set()
+    for q, i in zip(Q.tolist(), I.tolist()):
+        chrom, start, end, n = anchors[q]
+        rows.add((n, chrom, start, end, index.names[i]) if with_name else (n, chrom, start, end))
+    return sorted(rows, key=lambda r: "\t".join(map(str, r)))
+
+def join_on_loop(left, right):
+    """join -t TAB: rows sharing loop#, left rows outer, right rows inner."""
+    by_loop = {}
+    for r in right:
+        by_loop.setdefault(r[0], []).append(r)
+    return [(l, r) for l in left for r in by_loop.get(l[0], ())]
+
+def load_gene_rows(gene_tpm):
+    """(gene name, TPM, line) per gene table row (whitespace columns 2 and 9)."""
+    rows = []
+    for line in read_lines(gene_tpm):
+        cols = line.split()
+        if len(cols) < 9:
+            continue
+        try:
+            tpm = float(cols[8])
+        except ValueError:
+            continue
+        rows.append((cols[1], tpm, line))
+    return rows
+
+def store_gene_rows(expr, sample, genes):
+    """
+    (gene name, TPM, line) per store record of `genes` with TPM >= TPM_MIN in
+    sample, as gene table lines (Gene ID, Gene Name, 4 x ".", Coverage, FPKM, TPM).
+    """
+    col = expr.sample_col[sample]
+    measures = [expr.matrix(m)[:, col] for m in ("Coverage", "FPKM", "TPM")]
+    rows = []
+    for name in sorted(expr.genes_above(sample, TPM_MIN) & genes):
+        for i in expr.gene_rows[name].tolist():
+            cov, fpkm, tpm = (float(m[i]) for m in measures)
+            if tpm >= TPM_MIN:
+                line = "\t".join([expr.gene_ids[i], name, ".", ".", ".", ".",
+                                  f"{cov:g}", f"{fpkm:g}", f"{tpm:g}"]) + "\n"
+                rows.append((name, tpm, line))
+    return rows
+
+def annotate_sample(sample, enhancer, gene_tpm, assemble_bnd, neo_loop, promoters, out_dir,
+                    expr=None):
+    os.makedirs(out_dir, exist_ok=True)
+    P = lambda name: os.path.join(out_dir, name)
+
+    # 1) translocation-induced neo-loops
+    loops = neo_loops(neo_loop)
+    write_lines(P("1_neo-loop.tsv"), loops)
+    loop_cols = [line.split() for line in loops]
+
+    # 2) loop anchors (loop# = 1-based line in 1_neo-loop.tsv)
+    left  = [(c[0], c[1], c[2], str(n)) for n, c in enumerate(loop_cols, 1)]
+    right = [(c[3], c[4], c[5], str(n)) for n, c in enumerate(loop_cols, 1)]
+    write_rows(P("2_anchor_left.tsv"), left)
+    write_rows(P("2_anchor_right.tsv"), right)
+
+    peaks = IntervalIndex.from_bed(enhancer)
+
+    # 3) promoter(left) - enhancer(right), enhancer(left) - promoter(right)
+    p_e = [(l[1], l[2], l[3], r[1], r[2], r[3], l[4], l[0]) for l, r in join_on_loop(
+        anchor_hits(promoters, left, True), anchor_hits(peaks, right, False))]
+    e_p = [(l[1], l[2], l[3], r[1], r[2], r[3], r[4], l[0]) for l, r in join_on_loop(
+        anchor_hits(peaks, left, False), anchor_hits(promoters, right, True))]
+    write_rows(P("3_neo-p-e-loop.tsv"), p_e)
+    write_rows(P("3_neo-e-p-loop.tsv"), e_p)
+
+    # 4) combined, unique (byte order of the line)
+    ep = sorted({"\t".join(r) for r in p_e + e_p})
+    write_lines(P("4_neo-ep-loop.tsv"), (x + "\n" for x in ep))
+    ep = [x.split("\t") for x in ep]
+
+    # 5) neo-loops with an E-P annotation (exact 6-column loop key)
+    ep_loops = {tuple(r[:6]) for r in ep}
+    loop_bnd = [(line, c) for line, c in zip(loops, loop_cols) if tuple(c[:6]) in ep_loops]
+    write_lines(P("5_neo-ep-loop-bnd.tsv"), (line for line, _ in loop_bnd))
+
+    # 6) annotated genes with TPM >= 10
+    ep_genes = {r[6] for r in ep}
+    if expr is not None:
+        genes = store_gene_rows(expr, sample, ep_genes)
+    elif gene_tpm:
+        genes = [g for g in load_gene_rows(gene_tpm) if g[0] in ep_genes and g[1] >= TPM_MIN]
+    else:
+        genes = []
+    write_lines(P("6_gene.tsv"), (line for _, _, line in genes))
+
+    # 7) loops of expressed genes and their assemblies
+    expressed = {name for name, _, _ in genes}
+    plot_loops = {tuple(r[:6]) for r in ep if r[6] in expressed}
+    plot = [(line, c) for line, c in loop_bnd if tuple(c[:6]) in plot_loops]
+    write_lines(P("5_2_neo-ep-loop_plot.tsv"), (line for line, _ in plot))
+
+    asm_ids = {m for _, c in plot for m in ASSEMBLY_ID_RE.findall(c[6])}
+    asm_lines = []
+    if asm_ids and os.path.exists(assemble_bnd):
+        asm_lines = [line for line in read_lines(assemble_bnd)
+                     if line.split() and line.split()[0] in asm_ids]
+    write_lines(P("7_assembleBND.txt"), asm_lines)
+
+    # 8) plotted loops + their genes (4_ order) + anchor A width
+    loop_genes = {}
+    for r in ep:
+        loop_genes.setdefault(tuple(r[:6]), []).append(r[6])
+    write_lines(P("8_bnd_neo-ep-loop-gene.tsv"), (
+        "%s %s %d\n" % (line.rstrip("\n"), ",".join(loop_genes.get(tuple(c[:6]), ["."])),
+                        int(c[2]) - int(c[1]))
+        for line, c in plot
+    ))
+
+    return {"sample": sample, "neo_loops": len(loops), "ep_loops": len(loop_bnd),
+            "genes": len(genes), "plot_loops": len(plot)}
+
+
+###############################################################################
+# Per sample
+###############################################################################
+
+def sample_inputs(root_dir, sample):
+    peaks = sorted(glob.glob(os.path.join(root_dir, "3_CUTtag", "4_macs2",
+                                          f"{sample}*H3K27ac*peaks.narrowPeak")))
+    tpm_dir = os.path.join(root_dir, "5_RNAseq", "7_stringtie_tpm", sample)
+    gene_tpm = None
+    for ext in ("tsv", "csv"):
+        path = os.path.join(tpm_dir, f"{sample}_coding_genes_tpm_fpkm.{ext}")
+        if os.path.exists(path):
+            gene_tpm = path
+            break
+    return {
+        "enhancer": peaks[0] if peaks else None,
+        "gene_tpm": gene_tpm,
+        "assemble_bnd": os.path.join(root_dir, "6_Integration", "4_complex_bnd", sample,
+                                     f"{sample}.assemblies.txt"),
+        "neo_loop": os.path.join(root_dir, "6_Integration", "5_neoloop-caller", sample,
+                                 f"{sample}.neo-loops.txt"),
+    }
+
+def open_expression_store(store_dir, sample):
+    """ExpressionMatrix of store_dir if it exists and has sample, else None."""
+    if not store_dir or not os.path.exists(os.path.join(store_dir, "samples.txt")):
+        return None
+    expr = ExpressionMatrix(store_dir)
+    if sample not in expr.sample_col:
+        return None
+    # all-NaN column: the store was built without this sample's table
+    if np.isnan(expr.matrix("TPM")[:, expr.sample_col[sample]]).all():
+        return None
+    return expr
+
+def run_sample(args):
+    root_dir, sample, promoter_bed, store_dir = args
+    try:
+        inp = sample_inputs(root_dir, sample)
+        expr = open_expression_store(store_dir, sample)
+        if inp["enhancer"] is None:
+            sys.stderr.write(f"[WARN] enhancer peak file not found for {sample}. Skip.\n")
+            return None
+        if not os.path.exists(inp["neo_loop"]):
+            sys.stderr.write(f"[WARN] neo-loop file not found for {sample}: {inp['neo_loop']}. Skip.\n")
+            return None
+        if expr is None and inp["gene_tpm"] is None:
+            sys.stderr.write(f"[WARN] coding gene TPM table not found for {sample}; 6_gene.tsv will be empty.\n")
+
+        promoters = cached_bed_index(promoter_bed, name_col=3)
+        out_dir = os.path.join(root_dir, "6_Integration", "6_bnd-ep-loop-gene", sample)
+        summ = annotate_sample(sample, promoters=promoters, out_dir=out_dir, expr=expr, **inp)
+        sys.stderr.write(f"[INFO] {sample}: {summ['neo_loops']} neo-loops, {summ['ep_loops']} E-P, "
+                         f"{summ['genes']} genes TPM>={TPM_MIN}, {summ['plot_loops']} loops to plot\n")
+        return summ
+    except Exception:
+        sys.stderr.write(f"[ERROR] {sample}: failed\n{traceback.format_exc()}")
+        return {"sample": sample, "status": "error"}
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate translocation-induced neo E-P loops.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--jobs", type=int, default=1, help="samples processed in parallel")
+    parser.add_argument("--promoters", default=None,
+                        help="promoter BED (default: 6_Integration/coding_gene_promoters_1kb.bed)")
+    parser.add_argument("--expression-store", default=None,
+                        help="expression_matrix.py store (default: 5_RNAseq/8_expression_matrix; "
+                             "per-sample TPM tables are read where it is missing)")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    promoter_bed = args.promoters or os.path.join(root_dir, "6_Integration",
+                                                  "coding_gene_promoters_1kb.bed")
+    cached_bed_index(promoter_bed, name_col=3)   # build / validate once before the workers
+    store_dir = args.expression_store or os.path.join(root_dir, "5_RNAseq", "8_expression_matrix")
+    tasks = [(root_dir, s, promoter_bed, store_dir) for s in args.samples]
+    if args.jobs > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            results = pool.map(run_sample, tasks, chunksize=1)
+    else:
+        results = [run_sample(t) for t in tasks]
+
+    failed = [r["sample"] for r in results if r and r.get("status") == "error"]
+    if failed:
+        sys.stderr.write(f"[ERROR] failed samples: {','.join(failed)}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 #!/usr/bin/env bash
 
+# NOTE: 6_bnd-ep-loop-gene.py writes the same 1_ to 8_ outputs in-process
+#       (interval indexes + exact-key joins instead of bedtools/join/grep -w -f,
+#       --jobs N across samples).
+
 here=/mnt/f/zer/TransFinder/
 
 # Promoter regions (1 kb around TSS)
@@ -1,51 +1,252 @@
-from neoloop.visualize.core import *
-import cooler
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Render E-P neo-loop figures (NeoLoopFinder Triangle) for every assembly that
+carries a translocation-induced E-P neo-loop, for a whole cohort in one job.
+
+Per sample:
+  assemblies  6_Integration/4_complex_bnd/<sample>/<sample>.assemblies.txt
+  loops       6_Integration/6_bnd-ep-loop-gene/<sample>/5_2_neo-ep-loop_plot.tsv
+  genes       6_Integration/6_bnd-ep-loop-gene/<sample>/8_bnd_neo-ep-loop-gene.tsv
+  Hi-C        2_HiC/2_get_hic_mcool/<sample>/<sample>_contact.mcool (5k/10k/25k)
+  tracks      ATAC / H3K27ac / RNA-seq / SMRT-seq bigWigs
+
+An assembly is plotted when its ID (e.g. C0) appears in the 7th column of a
+plotted loop; its gene labels are the genes of those loops (8_ file). The
+assembly-ID set and gene map are built once per sample.
+
+Figures are rendered in a process pool (--jobs N, Agg backend). One task is
+one (sample, assembly) at all resolutions; every worker keeps its cooler
+objects and bigWig handles open for the tasks it runs. Track signal is read
+through signal_cache: the intervals of each (bigWig, region) are fetched once
+and binned for every resolution, in a per-worker LRU of --signal-cache-mb MB.
+
+Outputs:
+  6_Integration/7_visualized-neo-ep-loop/<sample>_<assemblyID>_<res>.pdf
+
+Usage:
+  python3 6_Integration/7_visualize_neo-loops_chr1-22.py [--samples PT3 ...] [--jobs N]
+                                                         [--assemblies C0 A2 ...]
+                                                         [--signal-cache-mb 512]
+"""
+
+import argparse
+import multiprocessing
 import os
-import pandas as pd
+import re
+import sys
+import traceback
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import cooler
+import pyBigWig
+import neoloop.visualize.bigwig as neoloop_bigwig
+from neoloop.visualize.core import Triangle
+
+from signal_cache import CachedBigWig, SignalCache
+
+SAMPLES = ['PT3']
+
+RESOLUTIONS = ['5000', '10000', '25000']
+
+SPAN = 1000000
+
+SIGNAL_CACHE_MB = 512
+
+ASSEMBLY_ID_RE = re.compile(r"\b[A-C][0-9]+\b")
+
+# (track name, path under the project root, max_value, color)
+TRACKS = [
+    ('ATAC',     '4_ATAC/3_bw/{s}.bw',                         100, '#d77800'),
+    ('H3K27ac',  '3_CUTtag/3_bw/{s}.bw',                        50, '#6A3D9A'),
+    ('RNA-seq',  '5_RNAseq/3_bamCoverage/{s}/R1/{s}_R1.bw',     10, '#E31A1C'),
+    ('SMRT-seq', '1_SMRT-seq/7-bam2bw/{s}.bw',                   5, '#808080'),
+]
+
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+
+###############################################################################
+# Per-worker shared handles
+###############################################################################
+
+_coolers = {}
+
+def get_cooler(mcool, res):
+    key = (mcool, res)
+    if key not in _coolers:
+        _coolers[key] = cooler.Cooler(f"{mcool}::resolutions/{res}")
+    return _coolers[key]
+
+
+class _SharedBigWigModule:
+    """
+    Stands in for pyBigWig inside neoloop: open() returns one handle per path,
+    kept open for the worker, with stats() served from the region cache.
+    """
+
+    def __init__(self, module, cache):
+        self._module = module
+        self._cache = cache
+        self._handles = {}
+
+    def open(self, path, *args, **kwargs):
+        if args or kwargs:
+            return self._module.open(path, *args, **kwargs)
+        if path not in self._handles:
+            self._handles[path] = CachedBigWig(self._module.open(path), path, self._cache)
+        return self._handles[path]
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+
+def share_bigwig_handles(cache_mb=SIGNAL_CACHE_MB):
+    """
+    Route neoloop's pyBigWig.open() through the per-worker handle and signal
+    cache. SigTrack (Triangle.plot_signal) opens its file with the pyBigWig
+    imported at the top of neoloop.visualize.bigwig, so that is the name replaced.
+    """
+    if getattr(neoloop_bigwig, "pyBigWig", None) is pyBigWig:
+        neoloop_bigwig.pyBigWig = _SharedBigWigModule(pyBigWig, SignalCache(max_mb=cache_mb))
+
+
+###############################################################################
+# Inputs
+###############################################################################
+
+def read_assemblies(path):
+    """{assembly ID: assembly line (tab-separated, no newline)}."""
+    out = {}
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.strip():
+                out.setdefault(line.split("\t")[0], line)
+    return out
+
+def plotted_assembly_genes(gene_table):
+    """
+    {assembly ID: sorted gene names} from 8_bnd_neo-ep-loop-gene.tsv
+    (loop columns, then comma-joined genes and anchor width, space-separated).
+    """
+    genes = {}
+    with open(gene_table) as f:
+        for line in f:
+            cols = line.split()
+            if len(cols) < 9:
+                continue
+            names = [g for g in cols[-2].split(",") if g != "."]
+            for ac in ASSEMBLY_ID_RE.findall(cols[6]):
+                genes.setdefault(ac, set()).update(names)
+    return {ac: sorted(g) for ac, g in genes.items()}
+
+def sample_tasks(root_dir, sample, only=None):
+    integ = os.path.join(root_dir, "6_Integration")
+    asm_path = os.path.join(integ, "4_complex_bnd", sample, f"{sample}.assemblies.txt")
+    loop_path = os.path.join(integ, "6_bnd-ep-loop-gene", sample, "5_2_neo-ep-loop_plot.tsv")
+    gene_path = os.path.join(integ, "6_bnd-ep-loop-gene", sample, "8_bnd_neo-ep-loop-gene.tsv")
+    mcool = os.path.join(root_dir, "2_HiC", "2_get_hic_mcool", sample, f"{sample}_contact.mcool")
+    for p in (asm_path, loop_path, gene_path, mcool):
+        if not os.path.exists(p):
+            sys.stderr.write(f"[WARN] {sample}: missing {p}, skip.\n")
+            return []
+
+    assemblies = read_assemblies(asm_path)
+    genes = plotted_assembly_genes(gene_path)
+    tracks = [(name, os.path.join(root_dir, path.format(s=sample)), vmax, color)
+              for name, path, vmax, color in TRACKS]
+    tasks = []
+    for ac in sorted(genes):
+        if only and ac not in only:
+            continue
+        if ac not in assemblies:
+            sys.stderr.write(f"[WARN] {sample}: assembly {ac} not in {asm_path}\n")
+            continue
+        tasks.append({"sample": sample, "ac": ac, "assembly": assemblies[ac],
+                      "genes": genes[ac], "loops": loop_path, "mcool": mcool, "tracks": tracks})
+    return tasks
+
+
+###############################################################################
+# Rendering
+###############################################################################
+
+def render(task, res, out_dir):
+    vis = Triangle(get_cooler(task["mcool"], res), task["assembly"], n_rows=8, figsize=(8, 6),
+                   track_partition=[8, 0.4, 0.4, 0.8, 0.8, 0.8, 0.8, 0.5], correct='sweight', span=SPAN,
+                   slopes={(0, 0): 1, (0, 1): 0.3, (1, 1): 1})
+
+    vis.matrix_plot(vmin=0, vmax=0.01)
+    vis.plot_chromosome_bounds(linewidth=2)
+    vis.plot_loops(task["loops"], face_color='none', marker_size=50, cluster=False,
+                   filter_by_res=True, onlyneo=True)
+    vis.plot_genes(release=106, filter_=task["genes"], fontsize=8)
 
+    for name, path, vmax, color in task["tracks"]:
+        vis.plot_signal(name, path, label_size=8, data_range_size=9, max_value=vmax, color=color)
 
-cells = ['PT3']
+    vis.plot_chromosome_bar(name_size=10, coord_size=8)
 
-resolutions = ['5000','10000','25000']
+    out = os.path.join(out_dir, f"{task['sample']}_{task['ac']}_{res}.pdf")
+    vis.outfig(out, dpi=300)
+    plt.close("all")
+    return out
 
-for cell in cells:
-    for r in resolutions:
-        os.system("mkdir -p 7_visualized-neo-ep-loop" )
-        clr = cooler.Cooler('/mnt/f/zer/TransFinder/2_HiC/2_get_hic_mcool/%s/%s_contact.mcool::resolutions/%s' % (cell, cell,r))
-        neoloop = "./6_bnd-ep-loop-gene/%s/5_2_neo-ep-loop_plot.tsv"% (cell)
-        
-        cancer_atac ='/mnt/f/zer/TransFinder/4_ATAC/3_bw/%s.bw'%(cell)
-        cancer_H3K27ac_chip = "/mnt/f/zer/TransFinder/3_CUTtag/3_bw/%s.bw"% (cell)
-        cancer_RNAseq = "/mnt/f/zer/TransFinder/5_RNAseq/3_bamCoverage/%s/R1/%s_R1.bw"% (cell,cell)
-        cancer_longread = "/mnt/f/zer/TransFinder/1_SMRT-seq/7-bam2bw/%s.bw"% (cell)
-        
-        genelist = []
+def render_task(args):
+    task, out_dir = args
+    done = []
+    for res in RESOLUTIONS:
+        try:
+            done.append(render(task, res, out_dir))
+        except Exception:
+            sys.stderr.write(f"[ERROR] {task['sample']} {task['ac']} {res}: failed\n"
+                             f"{traceback.format_exc()}")
+    return task["sample"], task["ac"], done
 
 
-        #pt3
-        assembly = 'C0	translocation,1,178385884,-,22,39280931,+	1,179975000	22,38925000'
-        ac = assembly.split('\t')[0]
+###############################################################################
+# Main
+###############################################################################
 
-        print(assembly)
+def main():
+    parser = argparse.ArgumentParser(description="Batch-render E-P neo-loop figures.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--assemblies", nargs="+", default=None,
+                        help="only these assembly IDs (default: all with plotted E-P loops)")
+    parser.add_argument("--jobs", type=int, default=1, help="figures rendered in parallel")
+    parser.add_argument("--signal-cache-mb", type=float, default=SIGNAL_CACHE_MB,
+                        help="bigWig region cache budget per worker, in MB")
+    args = parser.parse_args()
 
+    root_dir = get_root_dir()
+    out_dir = os.path.join(root_dir, "6_Integration", "7_visualized-neo-ep-loop")
+    os.makedirs(out_dir, exist_ok=True)
 
-        vis = Triangle(clr, assembly, n_rows=8, figsize=(8, 6),
-                        track_partition=[8, 0.4, 0.4, 0.8, 0.8, 0.8, 0.8, 0.5], correct='sweight', span=1000000,
-                        slopes={(0, 0): 1, (0, 1): 0.3, (1, 1): 1})
-   
-        vis.matrix_plot(vmin=0,vmax=0.01)
-        vis.plot_chromosome_bounds(linewidth=2)
-        if open(neoloop, 'r').read().find(ac) > 0:
-            vis.plot_loops(neoloop, face_color='none', marker_size=50, cluster=False, filter_by_res=True, onlyneo=True)
+    only = set(args.assemblies) if args.assemblies else None
+    tasks = [(t, out_dir) for s in args.samples for t in sample_tasks(root_dir, s, only)]
+    sys.stderr.write(f"[INFO] {len(tasks)} assemblies x {len(RESOLUTIONS)} resolutions to render\n")
 
-            vis.plot_genes(release=106, filter_=['CBX7','APOBEC3C'], label_aligns={'CBX7': 'right'}, fontsize=8)
-            
-            vis.plot_signal('ATAC', cancer_atac, label_size=8, data_range_size=9,max_value=100,color='#d77800')
-            vis.plot_signal('H3K27ac', cancer_H3K27ac_chip, label_size=8, data_range_size=9, max_value=50, color='#6A3D9A')
-            vis.plot_signal('RNA-seq', cancer_RNAseq, label_size=8, data_range_size=9, max_value=10, color='#E31A1C')
-            vis.plot_signal('SMRT-seq', cancer_longread, label_size=8, data_range_size=9, max_value=5, color='#808080')
+    if args.jobs > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(args.jobs, len(tasks)), initializer=share_bigwig_handles,
+                                  initargs=(args.signal_cache_mb,)) as pool:
+            results = list(pool.imap_unordered(render_task, tasks))
+    else:
+        share_bigwig_handles(args.signal_cache_mb)
+        results = [render_task(t) for t in tasks]
 
-            vis.plot_chromosome_bar(name_size=10, coord_size=8)
+    n_figs = sum(len(done) for _, _, done in results)
+    sys.stderr.write(f"[INFO] {n_figs} figures written to {out_dir}\n")
+    if n_figs < len(tasks) * len(RESOLUTIONS):
+        sys.exit(1)
 
-            vis.outfig("./7_visualized-neo-ep-loop/%s_%s_%s.pdf"% (cell, ac,r), dpi=300)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark: Hi-C vs merged LRS matching, nested loop vs (posA, posB) bin index.
+
+Synthetic inputs (per size N):
+  - N Hi-C calls and N merged LRS events
+  - spread over a handful of ordered chr-pairs (chrA <= chrB)
+  - uniform posA/posB over a 250 Mb chromosome, except that --shared
+    (default 20%) of the Hi-C calls are planted near an LRS event (both
+    ends within tol/2), so every size has matches to compare
+
+For every size the indexed matcher in 2_intersect_translocations.py is timed.
+The original nested loop is timed (and its pairs compared with the indexed
+ones) only up to --max-nested calls, since it is O(N_hic x N_lr).
+
+Usage:
+  python3 6_Integration/bench_intersect_translocations.py
+  python3 6_Integration/bench_intersect_translocations.py --sizes 1000 10000 --max-nested 10000
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+from sv_table import SVTable, group_by_chrpair_ordered
+
+CHR_PAIRS = [("chr1", "chr14"), ("chr4", "chr14"), ("chr11", "chr14"),
+             ("chr8", "chr22"), ("chr1", "chr22"), ("chr16", "chr22")]
+CHR_LEN = 250_000_000
+
+
+def load_intersect_module():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(script_dir, "2_intersect_translocations.py")
+    spec = importlib.util.spec_from_file_location("intersect_translocations", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def make_records(n, source, prefix, rng):
+    records = []
+    for i in range(1, n + 1):
+        chrA, chrB = rng.choice(CHR_PAIRS)
+        records.append((
+            source, f"{prefix}_{i}", "SYN",
+            chrA, rng.randrange(CHR_LEN), chrB, rng.randrange(CHR_LEN),
+            rng.choice("+-"), rng.choice("+-"),
+        ))
+    return records
+
+
+def make_tables(n, rng, tol, shared=0.2):
+    """(hic, lr) SVTables; a `shared` fraction of Hi-C calls sits next to an LRS event."""
+    lr = make_records(n, "longread", "LRM", rng)
+    hic = make_records(n, "hic", "HIC", rng)
+    jitter = tol // 2
+    for i in rng.sample(range(n), int(n * shared)):
+        _, _, _, chrA, posA, chrB, posB, _, _ = rng.choice(lr)
+        hic[i] = hic[i][:3] + (
+            chrA, max(0, posA + rng.randint(-jitter, jitter)),
+            chrB, max(0, posB + rng.randint(-jitter, jitter)),
+        ) + hic[i][7:]
+    return SVTable.from_records(hic), SVTable.from_records(lr)
+
+
+def match_nested(hic, lr, tol):
+    """Reference: the original all-vs-all loop per chr-pair."""
+    hic_groups = group_by_chrpair_ordered(hic)
+    lr_groups  = group_by_chrpair_ordered(lr)
+    hic_rows, lr_rows = [], []
+    for key in hic_groups.keys() & lr_groups.keys():
+        l_rows = lr_groups[key].tolist()
+        l_posA, l_posB = lr.posA[l_rows].tolist(), lr.posB[l_rows].tolist()
+        for h in hic_groups[key].tolist():
+            h_posA, h_posB = int(hic.posA[h]), int(hic.posB[h])
+            for l, posA, posB in zip(l_rows, l_posA, l_posB):
+                if (abs(h_posA - posA) <= tol and
+                    abs(h_posB - posB) <= tol):
+                    hic_rows.append(h)
+                    lr_rows.append(l)
+    return hic_rows, lr_rows
+
+
+def time_matcher(fn, hic, lr, tol):
+    t0 = time.perf_counter()
+    H, L = fn(hic, lr, tol)
+    return time.perf_counter() - t0, list(zip(list(H), list(L)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--max-nested", type=int, default=10000,
+                        help="largest N for which the nested loop is run (default 10000)")
+    parser.add_argument("--tol", type=int, default=None,
+                        help="matching tolerance in bp (default D_BETWEEN)")
+    parser.add_argument("--shared", type=float, default=0.2,
+                        help="fraction of Hi-C calls planted near an LRS event (default 0.2)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    mod = load_intersect_module()
+    tol = args.tol if args.tol is not None else mod.D_BETWEEN
+    rng = random.Random(args.seed)
+
+    print("\t".join(["N", "n_pairs", "indexed_s", "nested_s", "speedup", "identical"]))
+    for n in args.sizes:
+        hic, lr = make_tables(n, rng, tol, args.shared)
+
+        t_idx, pairs_idx = time_matcher(mod.match_hic_vs_lr, hic, lr, tol)
+        assert args.shared <= 0 or n * args.shared < 1 or pairs_idx, f"N={n}: no Hi-C/LRS pairs"
+
+        t_nest, same, speedup = "NA", "NA", "NA"
+        if n <= args.max_nested:
+            t, pairs_nest = time_matcher(match_nested, hic, lr, tol)
+            t_nest = f"{t:.3f}"
+            same = str(pairs_nest == pairs_idx)
+            speedup = f"{t / t_idx:.1f}" if t_idx > 0 else "inf"
+
+        print("\t".join(map(str, [
+            n, len(pairs_idx), f"{t_idx:.3f}", t_nest, speedup, same
+        ])))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Declarative exclusion rules applied by 2_intersect_translocations.py before
+Hi-C vs LRS matching, so excluded calls are not counted and never reach
+<sample>_transfinder_bnd.tsv (assemble-complexSVs, neoloop-caller).
+
+Rule file (default 6_Integration/exclusions.tsv), tab/space separated,
+'#' comments; column 1 is a sample name or '*' (all samples):
+
+  # sample  kind    arguments
+  PT1       pair    chr4:1700000-1900000  chr14:105500000-106900000  t414
+                                                 both breakends, either order
+  *         region  chr14  105550000  106880000  IGH      either breakend in [start, end)
+  PT3       id      LRM_2                        one call by id (Hi-C id or merged LRS id)
+  *         bed     hg38.centromeres.bed  centromere
+                                                 every interval of a BED file is a
+                                                 region (path relative to the rule file)
+
+Coordinates are 0-based half-open (BED); commas in numbers are ignored.
+The optional last column of region / pair / bed is a label written to the
+exclusion report.
+
+HIC_<n>, LR_<n> and LRM_<n> ids are positions (input row / cluster order),
+so they point at another call after a DELTA_LR change or an upstream
+rerun (2_intersect_translocations.py warns about them). `pin` rewrites them
+as pair rules around the breakends the ids have in the current run
+(+/- --pad bp, narrowed until no other call of the run matches; label = id):
+
+  python3 6_Integration/exclusions.py pin 6_Integration/exclusions.tsv > pinned.tsv
+
+Regions of a sample are merged per chromosome into sorted, non-overlapping
+intervals; a breakend lookup is one np.searchsorted over all rows of a
+table (RegionIndex.hits).
+
+  rules = load_exclusions("6_Integration/exclusions.tsv")
+  keep, reasons = rules.apply(table, "PT3")   # mask + reason per excluded row
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from karyotype import resolve_chrom
+from sv_table import load_table
+
+# ids assigned by position (bnd_normalize.py rows, merge_lrs cluster order)
+POSITIONAL_ID_RE = re.compile(r"^(HIC|LR|LRM)_[0-9]+$")
+PIN_PAD = 10000
+
+
+def _int(text):
+    return int(text.replace(",", ""))
+
+
+def parse_window(text):
+    """"chr4:1,700,000-1,900,000" -> ("chr4", 1700000, 1900000)."""
+    chrom, _, span = text.rpartition(":")
+    start, _, end = span.partition("-")
+    return chrom, _int(start), _int(end)
+
+
+def read_bed(path, label):
+    """[(chrom, start, end, label)] of a BED file (track/browser/# lines skipped)."""
+    regions = []
+    with open(path) as f:
+        for line in f:
+            cols = line.split()
+            if not cols or cols[0].startswith(("#", "track", "browser")):
+                continue
+            regions.append((cols[0], _int(cols[1]), _int(cols[2]), label or os.path.basename(path)))
+    return regions
+
+
+class RegionIndex:
+    """
+    Per-chromosome sorted, merged intervals. Overlapping regions are
+    merged; the merged interval keeps the distinct labels, ';'-joined.
+    """
+
+    def __init__(self, regions=()):
+        by_chrom = defaultdict(list)
+        for chrom, start, end, label in regions:
+            by_chrom[chrom].append((start, end, label))
+        self.index = {}
+        for chrom, ivs in by_chrom.items():
+            ivs.sort()
+            starts, ends, labels = [], [], []
+            for start, end, label in ivs:
+                if starts and start < ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                    if label not in labels[-1]:
+                        labels[-1].append(label)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+                    labels.append([label])
+            self.index[chrom] = (np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64),
+                                 [";".join(x) for x in labels])
+
+    def __len__(self):
+        return sum(len(s) for s, _, _ in self.index.values())
+
+    def _lookup(self, chrom):
+        name = resolve_chrom(chrom, self.index)
+        return None if name is None else self.index[name]
+
+    def hits(self, chrom_codes, pos, chroms):
+        """
+        Merged-interval label per row ("" = no hit). chrom_codes index into
+        `chroms` (SVTable categories), pos is the matching position array.
+        """
+        out = np.full(len(pos), "", dtype=object)
+        chrom_codes = np.asarray(chrom_codes)
+        for code in np.unique(chrom_codes).tolist():
+            found = self._lookup(chroms[code])
+            if found is None:
+                continue
+            starts, ends, labels = found
+            rows = np.flatnonzero(chrom_codes == code)
+            k = np.searchsorted(starts, pos[rows], side="right") - 1
+            hit = (k >= 0) & (pos[rows] < ends[np.maximum(k, 0)])
+            out[rows[hit]] = np.asarray(labels, dtype=object)[k[hit]]
+        return out
+
+
+class ExclusionRules:
+
+    def __init__(self, rules=()):
+        """rules: (sample, kind, value, label) tuples, see the module docstring."""
+        self.rules = list(rules)
+        self._by_sample = {}
+
+    @classmethod
+    def from_file(cls, path):
+        base = os.path.dirname(os.path.abspath(path))
+        rules = []
+        with open(path) as f:
+            for n, line in enumerate(f, 1):
+                cols = line.split("#", 1)[0].split()
+                if not cols:
+                    continue
+                if len(cols) < 3:
+                    raise ValueError(f"{path}:{n}: expected 'sample kind arguments'")
+                sample, kind, args = cols[0], cols[1], cols[2:]
+                if kind == "id":
+                    rules.extend((sample, "id", x, "id") for x in args)
+                elif kind == "region":
+                    label = args[3] if len(args) > 3 else "region"
+                    rules.append((sample, "region", (args[0], _int(args[1]), _int(args[2])), label))
+                elif kind == "pair":
+                    label = args[2] if len(args) > 2 else "pair"
+                    rules.append((sample, "pair", (parse_window(args[0]), parse_window(args[1])), label))
+                elif kind == "bed":
+                    bed = args[0] if os.path.isabs(args[0]) else os.path.join(base, args[0])
+                    label = args[1] if len(args) > 1 else ""
+                    rules.extend((sample, "region", r[:3], r[3]) for r in read_bed(bed, label))
+                else:
+                    raise ValueError(f"{path}:{n}: unknown rule kind '{kind}'")
+        return cls(rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def positional_ids(self):
+        """(sample, id) of the id rules naming HIC_/LR_/LRM_<n> calls."""
+        return [(s, v) for s, kind, v, _ in self.rules if kind == "id" and POSITIONAL_ID_RE.match(v)]
+
+    def for_sample(self, sample):
+        """(ids, RegionIndex, pair windows) of the rules that apply to `sample`."""
+        if sample in self._by_sample:
+            return self._by_sample[sample]
+        ids, regions, pairs = set(), [], []
+        for s, kind, value, label in self.rules:
+            if s not in ("*", sample):
+                continue
+            if kind == "id":
+                ids.add(value)
+            elif kind == "region":
+                regions.append((*value, label))
+            else:
+                pairs.append((*value, label))
+        self._by_sample[sample] = (ids, RegionIndex(regions), pairs)
+        return self._by_sample[sample]
+
+    def apply(self, table, sample):
+        """
+        (keep mask, reason per row) for an SVTable. Reasons: "id",
+        "regionA:<label>", "regionB:<label>", "pair:<label>"; "" for kept rows.
+        """
+        ids, regions, pairs = self.for_sample(sample)
+        reason = np.full(len(table), "", dtype=object)
+        if not len(table):
+            return np.ones(0, dtype=bool), reason
+
+        for (cA, sA, eA), (cB, sB, eB), label in pairs:
+            a_in_1 = self._in_window(table, table.chrA, table.posA, cA, sA, eA)
+            b_in_2 = self._in_window(table, table.chrB, table.posB, cB, sB, eB)
+            a_in_2 = self._in_window(table, table.chrA, table.posA, cB, sB, eB)
+            b_in_1 = self._in_window(table, table.chrB, table.posB, cA, sA, eA)
+            reason[(a_in_1 & b_in_2) | (a_in_2 & b_in_1)] = f"pair:{label}"
+        if len(regions):
+            for end, chrom, pos in (("B", table.chrB, table.posB), ("A", table.chrA, table.posA)):
+                lab = regions.hits(chrom, pos, table.chroms)
+                hit = lab != ""
+                reason[hit] = [f"region{end}:{x}" for x in lab[hit].tolist()]
+        if ids:
+            reason[table.id_mask(ids)] = "id"
+        return reason == "", reason
+
+    @staticmethod
+    def _in_window(table, chrom_codes, pos, chrom, start, end):
+        name = resolve_chrom(chrom, table.chroms)
+        code = -1 if name is None else table.chrom_code(name)
+        return (chrom_codes == code) & (pos >= start) & (pos < end)
+
+
+def id_tables(root_dir, sample):
+    """Tables whose ids `id` rules name: (id prefix, TSV path) per kind of call."""
+    integ = os.path.join(root_dir, "6_Integration")
+    return [("LRM_", os.path.join(integ, "2_intersection", sample, f"{sample}_longread_merged.tsv")),
+            ("LR_", os.path.join(integ, "1_trans_tsv", sample, f"{sample}_longread.tsv")),
+            ("HIC_", os.path.join(integ, "1_trans_tsv", sample, f"{sample}_hic.tsv"))]
+
+
+def pin_rule(root_dir, sample, sv_id, pad=PIN_PAD):
+    """
+    'sample pair chrA:s-e chrB:s-e id' line around the breakends of `sv_id`
+    (None if the id is not found). The pad is halved until the pair selects
+    no other call of the table.
+    """
+    for prefix, path in id_tables(root_dir, sample):
+        if not sv_id.startswith(prefix) or not os.path.exists(path):
+            continue
+        table = load_table(path)
+        hit = np.flatnonzero(table.id_mask({sv_id}))
+        if not len(hit):
+            return None
+        _, _, _, chrA, posA, chrB, posB, _, _ = table.record(int(hit[0]))
+        while True:
+            windows = [(c, max(p - pad, 0), p + pad + 1) for c, p in ((chrA, posA), (chrB, posB))]
+            keep, _ = ExclusionRules([(sample, "pair", tuple(windows), sv_id)]).apply(table, sample)
+            if (~keep).sum() <= 1 or pad == 0:
+                break
+            pad //= 2
+        return "\t".join([sample, "pair"] + [f"{c}:{a}-{b}" for c, a, b in windows] + [sv_id])
+    return None
+
+
+def pin_file(path, root_dir, pad=PIN_PAD, out=sys.stdout):
+    """Copy of a rule file with per-sample positional id rules replaced by pair rules."""
+    with open(path) as f:
+        for line in f:
+            cols = line.split("#", 1)[0].split()
+            if len(cols) < 3 or cols[1] != "id" or cols[0] == "*":
+                out.write(line)
+                continue
+            keep = []
+            for x in cols[2:]:
+                rule = pin_rule(root_dir, cols[0], x, pad) if POSITIONAL_ID_RE.match(x) else None
+                if rule is None:
+                    keep.append(x)
+                else:
+                    out.write(rule + "\n")
+            if keep:
+                out.write("\t".join([cols[0], "id"] + keep) + "\n")
+
+
+def load_exclusions(path):
+    """Rules of `path`; no rules if path is empty or the file does not exist."""
+    if not path:
+        return ExclusionRules()
+    if not os.path.exists(path):
+        sys.stderr.write(f"[WARN] exclusion file not found: {path}, nothing excluded.\n")
+        return ExclusionRules()
+    return ExclusionRules.from_file(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exclusion rule file tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    pin = sub.add_parser("pin", help="print the rule file with positional id rules "
+                                     "replaced by pair rules (coordinates of the current run)")
+    pin.add_argument("rules")
+    pin.add_argument("--pad", type=int, default=PIN_PAD,
+                     help="window half-width around each breakend (bp)")
+    pin.add_argument("--root", default=os.path.abspath(os.path.join(os.path.dirname(
+                         os.path.abspath(__file__)), "..")), help="project root")
+    args = parser.parse_args()
+    pin_file(args.rules, args.root, args.pad)
+
+
+if __name__ == "__main__":
+    main()
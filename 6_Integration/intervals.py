@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-chromosome sorted interval index (BED, half-open) with vectorized
+overlap queries, used instead of `bedtools intersect` for small annotation
+sets (promoters, H3K27ac peaks) against loop anchors.
+
+Overlap rule is the bedtools one for non-empty intervals:
+  query [s, e) overlaps [start, end)  <=>  start < e and end > s
+
+  idx = IntervalIndex.from_bed("coding_gene_promoters_1kb.bed", name_col=3)
+  q, hit = idx.query(chroms, starts, ends)    # all (query row, interval row) pairs
+  idx.names[hit]                              # e.g. gene names
+
+Persistent index (cached_bed_index): the sorted arrays are saved as .npy
+files in <bed>.index/ next to the BED and memory-mapped on later loads.
+The cache is keyed on the BED size + mtime, falling back to its SHA-256
+(so a touched but unchanged file does not trigger a rebuild); any other
+change rebuilds it.
+
+  promoters = cached_bed_index("coding_gene_promoters_1kb.bed", name_col=3)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from sv_table import file_sha256
+
+INDEX_VERSION = 1
+
+
+class IntervalIndex:
+
+    def __init__(self, chroms, starts, ends, names=None):
+        chroms = np.asarray(chroms, dtype=object)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends   = np.asarray(ends,   dtype=np.int64)
+        order = np.lexsort((ends, starts, chroms))
+        chroms = chroms[order]
+        self.starts = starts[order]
+        self.ends   = ends[order]
+        self.names  = None if names is None else np.asarray(names, dtype=np.str_)[order]
+        # per chromosome: slice into the sorted arrays and its longest interval
+        self.blocks = {}
+        if len(order):
+            bounds = np.flatnonzero(chroms[1:] != chroms[:-1]) + 1
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+                self.blocks[chroms[lo]] = (int(lo), int(hi),
+                                           int((self.ends[lo:hi] - self.starts[lo:hi]).max()))
+
+    def save(self, index_dir, meta=None):
+        """Write starts/ends/names .npy + blocks (meta.json) into index_dir."""
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "starts.npy"), self.starts)
+        np.save(os.path.join(index_dir, "ends.npy"), self.ends)
+        if self.names is not None:
+            np.save(os.path.join(index_dir, "names.npy"), self.names)
+        meta = dict(meta or {}, version=INDEX_VERSION,
+                    blocks={c: list(b) for c, b in self.blocks.items()})
+        with open(os.path.join(index_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        """Index saved by save(); arrays memory-mapped (read-only) by default."""
+        mode = "r" if mmap else None
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self = cls.__new__(cls)
+        self.starts = np.load(os.path.join(index_dir, "starts.npy"), mmap_mode=mode)
+        self.ends   = np.load(os.path.join(index_dir, "ends.npy"), mmap_mode=mode)
+        names = os.path.join(index_dir, "names.npy")
+        self.names  = np.load(names, mmap_mode=mode) if os.path.exists(names) else None
+        self.blocks = {c: tuple(b) for c, b in meta["blocks"].items()}
+        return self
+
+    @classmethod
+    def from_bed(cls, path, name_col=None):
+        """BED-like file (tab/space separated, '#'/track lines skipped)."""
+        chroms, starts, ends, names = [], [], [], []
+        with open(path) as f:
+            for line in f:
+                cols = line.split()
+                if len(cols) < 3 or cols[0].startswith(("#", "track", "browser")):
+                    continue
+                chroms.append(cols[0])
+                starts.append(int(cols[1]))
+                ends.append(int(cols[2]))
+                if name_col is not None:
+                    names.append(cols[name_col] if len(cols) > name_col else ".")
+        return cls(chroms, starts, ends, names if name_col is not None else None)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def query(self, chroms, starts, ends):
+        """
+        All overlapping (query row, interval row) pairs, vectorized per chromosome.
+        Returns int64 arrays (Q, I), ordered by query row then interval position.
+        """
+        chroms = np.asarray(chroms, dtype=object)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends   = np.asarray(ends,   dtype=np.int64)
+        Q, I = [], []
+        for chrom in dict.fromkeys(chroms.tolist()):
+            block = self.blocks.get(chrom)
+            if block is None:
+                continue
+            lo_b, hi_b, max_len = block
+            b_starts = self.starts[lo_b:hi_b]
+            q = np.flatnonzero(chroms == chrom)
+            qs, qe = starts[q], ends[q]
+            # start < e, and end > s implies start > s - max_len
+            lo = np.searchsorted(b_starts, qs - max_len, side="right")
+            hi = np.searchsorted(b_starts, qe, side="left")
+            n = np.maximum(hi - lo, 0)
+            if not n.sum():
+                continue
+            q_rep = np.repeat(q, n)
+            cand = np.repeat(lo - np.cumsum(n) + n, n) + np.arange(n.sum()) + lo_b
+            keep = self.ends[cand] > starts[q_rep]
+            Q.append(q_rep[keep])
+            I.append(cand[keep])
+        if not Q:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        Q, I = np.concatenate(Q), np.concatenate(I)
+        order = np.lexsort((I, Q))
+        return Q[order], I[order]
+
+
+###############################################################################
+# Persistent BED index
+###############################################################################
+
+def _read_meta(index_dir):
+    try:
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cached_bed_index(bed_path, name_col=None, index_dir=None):
+    """
+    IntervalIndex of a BED file, from its persistent cache when up to date
+    (memory-mapped), otherwise built and saved (best effort: an unwritable
+    location only costs the rebuild).
+    """
+    index_dir = index_dir or bed_path + ".index"
+    st = os.stat(bed_path)
+    meta = _read_meta(index_dir)
+    if (meta and meta.get("version") == INDEX_VERSION and meta.get("name_col") == name_col):
+        if meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns:
+            return IntervalIndex.load(index_dir)
+        if meta.get("size") == st.st_size and meta.get("sha256") == file_sha256(bed_path):
+            meta.update(mtime_ns=st.st_mtime_ns)
+            try:
+                with open(os.path.join(index_dir, "meta.json"), "w") as f:
+                    json.dump(meta, f)
+            except OSError:
+                pass
+            return IntervalIndex.load(index_dir)
+
+    index = IntervalIndex.from_bed(bed_path, name_col=name_col)
+    meta = {"name_col": name_col, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(bed_path)}
+    try:
+        # build in a temp dir, then swap in (concurrent workers never see a partial index)
+        parent = os.path.dirname(os.path.abspath(index_dir))
+        tmp = tempfile.mkdtemp(prefix=".index.", dir=parent)
+        index.save(tmp, meta)
+        # mkdtemp creates 0700; give the cache the permissions of a normal mkdir
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o777 & ~umask)
+        if os.path.isdir(index_dir):
+            shutil.rmtree(index_dir, ignore_errors=True)
+        try:
+            os.rename(tmp, index_dir)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)   # another process won the race
+    except OSError as e:
+        sys.stderr.write(f"[WARN] could not write index cache {index_dir}: {e}\n")
+    return index
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chromosome order shared by every stage that normalizes chrA <= chrB.
+
+Order = karyotype rank: chr1 < chr2 < ... < chr22 < chrX < chrY < chrM
+(built-in hg38), or the line order of a chrom.sizes file. Names missing
+from the karyotype (unplaced contigs, other assemblies) rank after all
+known ones, among themselves by name. "1" and "chr1" are the same rank.
+
+  karyo = load_karyotype()                   # built-in hg38
+  karyo = load_karyotype("hg38.chrom.sizes") # chrom.sizes order
+  karyo.le("chr2", "chr10")                  # True
+  karyo.swap_mask(table.chrA, table.chrB, table.chroms)   # vectorized, per row
+
+Command line:
+  python3 6_Integration/karyotype.py [--chrom-sizes FILE]
+      rank table, one "name<TAB>rank" per line
+  python3 6_Integration/karyotype.py [--chrom-sizes FILE] orient --a 1,2,3 --b 4,5,6
+      filter (stdin -> stdout) for the shell steps: swaps the column groups
+      --a and --b (1-based, first column = chromosome) of every tab-separated
+      line whose --a chromosome ranks after its --b chromosome
+"""
+
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+HG38_CHROMS = [f"chr{i}" for i in range(1, 23)] + ["chrX", "chrY", "chrM"]
+
+
+def _strip_chr(name):
+    if name[0:3] in ["chr", "Chr", "CHR"]:
+        return name[3:]
+    return name
+
+
+class Karyotype:
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.rank = {}
+        for i, name in enumerate(self.names):
+            self.rank.setdefault(name, i)
+            self.rank.setdefault(_strip_chr(name), i)
+
+    @classmethod
+    def from_chrom_sizes(cls, path):
+        """Chromosome order = line order of a chrom.sizes file (name<TAB>length)."""
+        names = []
+        with open(path) as f:
+            for line in f:
+                cols = line.split()
+                if cols and not cols[0].startswith("#"):
+                    names.append(cols[0])
+        return cls(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def key(self, name):
+        """Sort key: (karyotype rank, "") for known names, (len, name) otherwise."""
+        r = self.rank.get(name)
+        if r is None:
+            r = self.rank.get(_strip_chr(name))
+        if r is None:
+            return (len(self.names), name)
+        return (r, "")
+
+    def le(self, chr1, chr2):
+        return self.key(chr1) <= self.key(chr2)
+
+    def ranks(self, names):
+        """
+        int64 rank per name, consistent with key() order. Known names get
+        their karyotype rank; unknown names ranks >= len(self), by name.
+        """
+        n_known = len(self.names)
+        keys = [self.key(n) for n in names]
+        unknown = sorted({name for r, name in keys if r == n_known})
+        extra = {name: n_known + i for i, name in enumerate(unknown)}
+        return np.array([r if r < n_known else extra[name] for r, name in keys], dtype=np.int64)
+
+    def swap_mask(self, chrA, chrB, chroms=None):
+        """
+        Boolean mask of rows whose chrA ranks after chrB (rows to swap).
+        chrA, chrB: integer code arrays into the category list `chroms`,
+        or, without `chroms`, sequences of chromosome names.
+        """
+        if chroms is None:
+            chroms = sorted(set(chrA) | set(chrB))
+            code = {c: i for i, c in enumerate(chroms)}
+            chrA = np.fromiter((code[c] for c in chrA), dtype=np.int64, count=len(chrA))
+            chrB = np.fromiter((code[c] for c in chrB), dtype=np.int64, count=len(chrB))
+        rank = self.ranks(chroms)
+        return rank[np.asarray(chrA, dtype=np.int64)] > rank[np.asarray(chrB, dtype=np.int64)]
+
+
+def resolve_chrom(name, names):
+    """`name` as spelled in `names` (any container: "chr1" <-> "1"), or None."""
+    if name in names:
+        return name
+    alt = name[3:] if name.startswith("chr") else "chr" + name
+    return alt if alt in names else None
+
+
+@lru_cache(maxsize=None)
+def load_karyotype(chrom_sizes=None):
+    """Built-in hg38 order, or the order of a chrom.sizes file (cached per path)."""
+    if chrom_sizes:
+        return Karyotype.from_chrom_sizes(chrom_sizes)
+    return Karyotype(HG38_CHROMS)
+
+
+def orient_lines(karyo, lines, a_cols, b_cols, out):
+    """Write `lines` with column groups a/b (0-based) swapped where chrA ranks after chrB."""
+    for line in lines:
+        cols = line.rstrip("\n").split("\t")
+        if len(cols) > max(a_cols + b_cols) and not karyo.le(cols[a_cols[0]], cols[b_cols[0]]):
+            a_vals = [cols[i] for i in a_cols]
+            for i, j in zip(a_cols, b_cols):
+                cols[i] = cols[j]
+            for j, v in zip(b_cols, a_vals):
+                cols[j] = v
+        out.write("\t".join(cols) + "\n")
+
+
+def _col_list(text):
+    return [int(x) - 1 for x in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the chromosome rank table (name<TAB>rank), "
+                                                 "or orient chrA <= chrB in a TSV stream.")
+    parser.add_argument("--chrom-sizes", default=None,
+                        help="chrom.sizes file defining the order (default: built-in hg38)")
+    sub = parser.add_subparsers(dest="cmd")
+    orient = sub.add_parser("orient", help="stdin -> stdout, swap --a/--b so chrA <= chrB")
+    orient.add_argument("--a", type=_col_list, required=True,
+                        help="1-based columns of breakend A, chromosome first (e.g. 1,2,3)")
+    orient.add_argument("--b", type=_col_list, required=True,
+                        help="matching columns of breakend B (e.g. 4,5,6)")
+    args = parser.parse_args()
+
+    if args.chrom_sizes and not os.path.exists(args.chrom_sizes):
+        parser.error(f"chrom.sizes not found: {args.chrom_sizes}")
+    karyo = load_karyotype(args.chrom_sizes)
+    if args.cmd == "orient":
+        if len(args.a) != len(args.b):
+            parser.error("--a and --b need the same number of columns")
+        orient_lines(karyo, sys.stdin, args.a, args.b, sys.stdout)
+        return
+    for name, r in sorted(karyo.rank.items(), key=lambda x: (x[1], x[0])):
+        print(f"{name}\t{r}")
+
+
+if __name__ == "__main__":
+    main()
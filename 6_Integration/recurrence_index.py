@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cross-sample index of shared (Hi-C + LRS) translocation breakpoints, for
+spotting recurrent partners (e.g. t(4;14), t(11;14)) across a cohort.
+
+All <sample>_intersection_longread.tsv tables are loaded into one structure
+partitioned by chromosome pair (chrA <= chrB, karyotype.py order) and sorted
+by posA within each pair. "Which samples have a breakpoint within tol of
+this one" is two binary searches on posA plus a posB filter over that
+window, O(log n + k), independent of the number of samples.
+
+Recurrence table: events of all samples are grouped by single linkage
+(|dposA| <= tol and |dposB| <= tol on the same chromosome pair); groups
+seen in >= --min-samples samples are written to
+  6_Integration/2_intersection/recurrent_translocations.tsv
+    group  chrA  startA  endA  chrB  startB  endB  n_samples  n_events  samples  events
+
+  index = BreakpointIndex.from_samples(root_dir)
+  index.samples_near("chr4", 1804000, "chr14", 105900000, tol=1000000)
+
+Usage:
+  python3 6_Integration/recurrence_index.py [--samples S ...] [--tol 1000000]
+                                            [--min-samples 2] [--chrom-sizes FILE]
+  python3 6_Integration/recurrence_index.py --query chr4:1804000 chr14:105900000 [--tol BP]
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from karyotype import load_karyotype
+from sv_table import load_table, normalize_chrom_order
+
+TOL = 1000000
+
+
+def get_root_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.abspath(os.path.join(script_dir, ".."))
+
+
+def intersection_dir(root_dir):
+    return os.path.join(root_dir, "6_Integration", "2_intersection")
+
+
+def available_samples(root_dir):
+    """Samples with an <sample>_intersection_longread.tsv, by name."""
+    paths = glob.glob(os.path.join(intersection_dir(root_dir), "*", "*_intersection_longread.tsv"))
+    return sorted(os.path.basename(os.path.dirname(p)) for p in paths)
+
+
+class BreakpointIndex:
+
+    def __init__(self, samples, sample, ids, chrA, posA, chrB, posB, karyo):
+        """Flat per-event arrays; chrA <= chrB already enforced."""
+        self.karyo = karyo
+        self.samples = list(samples)
+        pair = np.array([f"{a}\t{b}" for a, b in zip(chrA, chrB)], dtype=object)
+        posA = np.asarray(posA, dtype=np.int64)
+        order = np.lexsort((np.asarray(posB, dtype=np.int64), posA, pair)) if len(pair) else np.empty(0, dtype=np.int64)
+        self.sample = np.asarray(sample, dtype=np.int32)[order]
+        self.ids    = np.asarray(ids, dtype=object)[order]
+        self.posA   = posA[order]
+        self.posB   = np.asarray(posB, dtype=np.int64)[order]
+        pair = pair[order]
+        # (chrA, chrB) -> slice into the sorted arrays
+        self.blocks = {}
+        if len(pair):
+            bounds = np.flatnonzero(pair[1:] != pair[:-1]) + 1
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(pair)]):
+                self.blocks[tuple(pair[lo].split("\t"))] = (int(lo), int(hi))
+
+    @classmethod
+    def from_samples(cls, root_dir, samples=None, chrom_sizes=None):
+        karyo = load_karyotype(chrom_sizes)
+        samples = samples or available_samples(root_dir)
+        cols = [[] for _ in range(6)]
+        kept = []
+        for s in samples:
+            path = os.path.join(intersection_dir(root_dir), s, f"{s}_intersection_longread.tsv")
+            table = normalize_chrom_order(load_table(path, expected_source="longread"), karyo)
+            if not len(table):
+                continue
+            chroms = np.array(table.chroms, dtype=object)
+            cols[0].append(np.full(len(table), len(kept), dtype=np.int32))
+            cols[1].append(np.array(table.ids(), dtype=object))
+            cols[2].append(chroms[table.chrA])
+            cols[3].append(table.posA)
+            cols[4].append(chroms[table.chrB])
+            cols[5].append(table.posB)
+            kept.append(s)
+        if not kept:
+            return cls([], [], [], [], [], [], [], karyo)
+        return cls(kept, *(np.concatenate(c) for c in cols), karyo=karyo)
+
+    def __len__(self):
+        return len(self.posA)
+
+    def query(self, chrA, posA, chrB, posB, tol=TOL):
+        """Rows (into the sorted arrays) within tol of the breakpoint on both ends."""
+        if not self.karyo.le(chrA, chrB):
+            chrA, posA, chrB, posB = chrB, posB, chrA, posA
+        block = self.blocks.get((chrA, chrB))
+        if block is None:
+            return np.empty(0, dtype=np.int64)
+        lo_b, hi_b = block
+        pa = self.posA[lo_b:hi_b]
+        lo = lo_b + np.searchsorted(pa, posA - tol, side="left")
+        hi = lo_b + np.searchsorted(pa, posA + tol, side="right")
+        rows = np.arange(lo, hi)
+        return rows[np.abs(self.posB[rows] - posB) <= tol]
+
+    def samples_near(self, chrA, posA, chrB, posB, tol=TOL):
+        """Sorted names of the samples with a breakpoint within tol on both ends."""
+        rows = self.query(chrA, posA, chrB, posB, tol)
+        return sorted({self.samples[i] for i in self.sample[rows].tolist()})
+
+    def groups(self, tol=TOL):
+        """
+        Single-linkage group label per row (sorted order). Candidate pairs
+        come from the posA window of each row; labels converge by min-label
+        propagation with pointer jumping.
+        """
+        n = len(self)
+        label = np.arange(n)
+        I, J = [], []
+        for lo_b, hi_b in self.blocks.values():
+            pa, pb = self.posA[lo_b:hi_b], self.posB[lo_b:hi_b]
+            hi = np.searchsorted(pa, pa + tol, side="right")
+            cnt = hi - np.arange(len(pa)) - 1
+            i = np.repeat(np.arange(len(pa)), cnt)
+            j = i + 1 + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+            keep = np.abs(pb[j] - pb[i]) <= tol
+            I.append(i[keep] + lo_b)
+            J.append(j[keep] + lo_b)
+        if not I or not sum(len(x) for x in I):
+            return label
+        I, J = np.concatenate(I), np.concatenate(J)
+        while True:
+            m = np.minimum(label[I], label[J])
+            new = label.copy()
+            np.minimum.at(new, I, m)
+            np.minimum.at(new, J, m)
+            new = new[new]
+            if np.array_equal(new, label):
+                return label
+            label = new
+
+    def recurrence_rows(self, tol=TOL, min_samples=2):
+        label = self.groups(tol)
+        pair_of = np.empty(len(self), dtype=object)
+        for key, (lo, hi) in self.blocks.items():
+            pair_of[lo:hi] = [key] * (hi - lo)
+        order = np.argsort(label, kind="stable")
+        bounds = np.flatnonzero(np.diff(label[order])) + 1
+        rows = []
+        for members in np.split(order, bounds) if len(order) else []:
+            samples = sorted({self.samples[i] for i in self.sample[members].tolist()})
+            if len(samples) < min_samples:
+                continue
+            chrA, chrB = pair_of[members[0]]
+            rows.append({
+                "chrA": chrA, "startA": int(self.posA[members].min()), "endA": int(self.posA[members].max()),
+                "chrB": chrB, "startB": int(self.posB[members].min()), "endB": int(self.posB[members].max()),
+                "n_samples": len(samples), "n_events": len(members),
+                "samples": ",".join(samples),
+                "events": ",".join(f"{self.samples[self.sample[i]]}:{self.ids[i]}" for i in members.tolist()),
+            })
+        rows.sort(key=lambda r: (-r["n_samples"], self.karyo.key(r["chrA"]), self.karyo.key(r["chrB"]),
+                                 r["startA"]))
+        return rows
+
+
+def write_recurrence_table(path, rows):
+    cols = ["group", "chrA", "startA", "endA", "chrB", "startB", "endB",
+            "n_samples", "n_events", "samples", "events"]
+    with open(path, "w") as out:
+        out.write("\t".join(cols) + "\n")
+        for k, r in enumerate(rows):
+            r = dict(r, group=f"REC_{k}")
+            out.write("\t".join(str(r[c]) for c in cols) + "\n")
+    return path
+
+
+def parse_breakend(text):
+    chrom, _, pos = text.rpartition(":")
+    return chrom, int(pos.replace(",", ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-sample recurrent-translocation index.")
+    parser.add_argument("--samples", nargs="+", default=None,
+                        help="default: every sample with an intersection_longread.tsv")
+    parser.add_argument("--tol", type=int, default=TOL, help="breakpoint distance on each end (bp)")
+    parser.add_argument("--min-samples", type=int, default=2,
+                        help="groups seen in fewer samples are not written")
+    parser.add_argument("--query", nargs=2, metavar=("CHRA:POS", "CHRB:POS"),
+                        help="print the events near this breakpoint instead of writing the table")
+    parser.add_argument("--chrom-sizes", default=None,
+                        help="chrom.sizes defining chromosome order (default: built-in hg38)")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    index = BreakpointIndex.from_samples(root_dir, args.samples, args.chrom_sizes)
+    sys.stderr.write(f"[INFO] {len(index)} events from {len(index.samples)} samples, "
+                     f"{len(index.blocks)} chromosome pairs\n")
+
+    if args.query:
+        (chrA, posA), (chrB, posB) = map(parse_breakend, args.query)
+        swap = not index.karyo.le(chrA, chrB)
+        if swap:
+            chrA, posA, chrB, posB = chrB, posB, chrA, posA
+        print("\t".join(["sample", "id", "chrA", "posA", "chrB", "posB", "dA", "dB"]))
+        for i in index.query(chrA, posA, chrB, posB, args.tol).tolist():
+            print("\t".join(map(str, [
+                index.samples[index.sample[i]], index.ids[i], chrA, index.posA[i], chrB, index.posB[i],
+                index.posA[i] - posA, index.posB[i] - posB
+            ])))
+        return
+
+    rows = index.recurrence_rows(args.tol, args.min_samples)
+    out = write_recurrence_table(
+        os.path.join(intersection_dir(root_dir), "recurrent_translocations.tsv"), rows)
+    sys.stderr.write(f"[INFO] {len(rows)} recurrent groups (>= {args.min_samples} samples) -> {out}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Region-cached bigWig signal extraction for track plotting.
+
+Each (bigWig, chromosome, 1 Mb block) is read once, as its raw intervals
+(bw.intervals, clipped to the block). Any later stats() request on that
+region, at any number of bins, is computed from these arrays in NumPy:
+
+  sum       = sum(value * overlapping bases)
+  mean      = sum / covered bases
+  coverage  = covered bases / bin width
+  max, min  = over the intervals overlapping the bin
+
+Bin edges are pyBigWig's, so values equal bw.stats(..., exact=True) for
+any bins, including neoloop's SigTrack sub-bins (`factor` per matrix bin,
+e.g. 2.5 kb at 5k). pyBigWig's default (exact=False) may answer from a
+zoom level instead, so figures can differ slightly from uncached ones.
+
+Blocks are kept in an LRU cache bounded by a memory budget, so figures that
+share breakpoints (and the 5k/10k/25k versions of one figure) decompress
+each bigWig region only once per process.
+
+  cache = SignalCache(max_mb=512)
+  bw = CachedBigWig(pyBigWig.open(path), path, cache)
+  bw.stats("chr1", 178000000, 180000000, nBins=400, type="mean")
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+BLOCK_SIZE = 1000000
+
+CACHED_TYPES = ("mean", "sum", "max", "min", "coverage")
+
+
+class SignalCache:
+    """LRU of interval blocks, keyed (bigWig path, chrom, block index)."""
+
+    def __init__(self, max_mb=512, block_size=BLOCK_SIZE):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.block_size = block_size
+        self.blocks = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _read_block(self, bw, chrom, b, chrom_len):
+        """(starts, ends, values) of the intervals of one block, clipped to it."""
+        start = b * self.block_size
+        end = min(start + self.block_size, chrom_len)
+        ivs = bw.intervals(chrom, start, end) or ()
+        starts = np.fromiter((iv[0] for iv in ivs), dtype=np.int64, count=len(ivs))
+        ends = np.fromiter((iv[1] for iv in ivs), dtype=np.int64, count=len(ivs))
+        values = np.fromiter((iv[2] for iv in ivs), dtype=np.float64, count=len(ivs))
+        # an interval crossing a block edge is split between the two blocks
+        return np.maximum(starts, start), np.minimum(ends, end), values
+
+    def get(self, bw, path, chrom, b, chrom_len):
+        key = (path, chrom, b)
+        block = self.blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return block
+        self.misses += 1
+        block = self._read_block(bw, chrom, b, chrom_len)
+        self.blocks[key] = block
+        self.nbytes += sum(a.nbytes for a in block)
+        while self.nbytes > self.max_bytes and len(self.blocks) > 1:
+            _, old = self.blocks.popitem(last=False)
+            self.nbytes -= sum(a.nbytes for a in old)
+        return block
+
+    def intervals(self, bw, path, chrom, start, end, chrom_len):
+        """(starts, ends, values) of the cached intervals covering [start, end)."""
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        parts = [self.get(bw, path, chrom, b, chrom_len) for b in range(first, last + 1)]
+        return [np.concatenate([p[k] for p in parts]) for k in range(3)]
+
+    def stats(self, bw, path, chrom, start, end, nBins=1, type="mean"):
+        """pyBigWig-style stats() from the cache; list with None for empty bins."""
+        if type not in CACHED_TYPES:
+            raise ValueError(f"type {type!r} is not cached")
+        chrom_len = bw.chroms(chrom)
+        end = min(end, chrom_len)
+        starts, ends, values = self.intervals(bw, path, chrom, start, end, chrom_len)
+        if not len(starts):
+            return [None] * nBins
+
+        edges = start + ((end - start) * np.arange(nBins + 1)) // nBins
+        if type in ("max", "min"):
+            # intervals [lo, hi) overlap the bin: end > bin start and start < bin end
+            lo = np.searchsorted(ends, edges[:-1], side="right")
+            hi = np.searchsorted(starts, edges[1:], side="left")
+            fn = np.max if type == "max" else np.min
+            return [float(fn(values[a:b])) if b > a else None for a, b in zip(lo.tolist(), hi.tolist())]
+
+        # covered bases / signal sum left of each edge (intervals are sorted, disjoint):
+        # whole intervals ending at or before it, plus the part of the one it falls in
+        cum_cov = np.concatenate(([0], np.cumsum(ends - starts)))
+        cum_sum = np.concatenate(([0.0], np.cumsum((ends - starts) * values)))
+        k = np.searchsorted(ends, edges, side="right")
+        kk = np.minimum(k, len(starts) - 1)
+        part = np.where(k < len(starts), np.clip(edges - starts[kk], 0, None), 0)
+        c_cov = np.diff(cum_cov[k] + part)
+        c_sum = np.diff(cum_sum[k] + part * values[kk])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if type == "mean":
+                out = c_sum / c_cov
+            elif type == "sum":
+                out = c_sum
+            else:
+                out = c_cov / np.diff(edges)
+        return [float(v) if c > 0 else None for v, c in zip(out.tolist(), c_cov.tolist())]
+
+
+class CachedBigWig:
+    """
+    pyBigWig handle whose stats() is served from a SignalCache (types in
+    CACHED_TYPES, chromosomes known to the file); everything else goes to
+    the real handle. close() is a no-op, the handle is shared.
+    """
+
+    def __init__(self, bw, path, cache):
+        self._bw = bw
+        self._path = path
+        self._cache = cache
+
+    def stats(self, chrom, start=None, end=None, type="mean", nBins=1, exact=False):
+        if (start is None or end is None or type not in CACHED_TYPES
+                or self._bw.chroms(chrom) is None or end <= start):
+            kwargs = {"type": type, "nBins": nBins, "exact": exact}
+            if start is None:
+                return self._bw.stats(chrom, **kwargs)
+            return self._bw.stats(chrom, start, end, **kwargs)
+        return self._cache.stats(self._bw, self._path, chrom, int(start), int(end),
+                                 nBins=int(nBins), type=type)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._bw, name)
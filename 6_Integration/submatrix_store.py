@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-sample archive of local balanced Hi-C submatrices around translocation
+breakpoints, written by 2_1_extract_bnd_submatrices.py.
+
+One event = one translocation of <sample>_transfinder_bnd.tsv (its A->B
+record). For every resolution the archive holds the square contact matrix
+of the two windows
+
+  A = chrA:posA +- span     B = chrB:posB +- span    (bin-aligned, clipped)
+
+laid out A bins then B bins, so m[:nA, :nA] is cis A, m[nA:, nA:] cis B and
+m[:nA, nA:] the A x B trans block. Values are 'sweight'-balanced contacts
+(float32, NaN for masked bins).
+
+Files (prefix = 2_1_bnd_submatrix/<sample>/<sample>):
+  <prefix>.submatrices.npy   all matrices, flattened and concatenated (float32)
+  <prefix>.submatrices.tsv   one row per (event, resolution):
+      event  res  chrA  startA  endA  chrB  startB  endB  nA  nB  offset
+
+The .npy is memory-mapped on load; a matrix is a zero-copy view into it.
+
+  store = SubmatrixStore.open(prefix)
+  store.events                                   # ["chr4:1804000|chr14:105900000", ...]
+  m = store.matrix(event, 10000)                 # (nA + nB) x (nA + nB)
+  store.trans(event, 10000)                      # nA x nB
+"""
+
+import os
+
+import numpy as np
+
+INDEX_COLUMNS = ["event", "res", "chrA", "startA", "endA", "chrB", "startB", "endB",
+                 "nA", "nB", "offset"]
+
+
+def event_key(chrA, posA, chrB, posB):
+    return f"{chrA}:{posA}|{chrB}:{posB}"
+
+
+def window(pos, span, res, chrom_len):
+    """Bin-aligned [start, end) of pos +- span, clipped to the chromosome."""
+    start = max(0, (pos - span) // res * res)
+    end = min(chrom_len, -(-(pos + span) // res) * res)
+    return start, end
+
+
+def n_bins(start, end, res):
+    return -(-(end - start) // res)
+
+
+class SubmatrixStore:
+
+    def __init__(self, data, rows):
+        self.data = data
+        self.rows = rows
+        self.index = {(r["event"], r["res"]): r for r in rows}
+        self.events = list(dict.fromkeys(r["event"] for r in rows))
+        self.resolutions = sorted({r["res"] for r in rows})
+
+    @classmethod
+    def open(cls, prefix, mmap=True):
+        rows = []
+        with open(prefix + ".submatrices.tsv") as f:
+            header = f.readline().rstrip("\n").split("\t")
+            for line in f:
+                row = dict(zip(header, line.rstrip("\n").split("\t")))
+                for k in ("res", "startA", "endA", "startB", "endB", "nA", "nB", "offset"):
+                    row[k] = int(row[k])
+                rows.append(row)
+        data = np.load(prefix + ".submatrices.npy", mmap_mode="r" if mmap else None)
+        return cls(data, rows)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def region(self, event, res):
+        """(chrA, startA, endA, chrB, startB, endB) of one stored matrix."""
+        r = self.index[(event, res)]
+        return r["chrA"], r["startA"], r["endA"], r["chrB"], r["startB"], r["endB"]
+
+    def matrix(self, event, res):
+        r = self.index[(event, res)]
+        n = r["nA"] + r["nB"]
+        return self.data[r["offset"]:r["offset"] + n * n].reshape(n, n)
+
+    def trans(self, event, res):
+        r = self.index[(event, res)]
+        return self.matrix(event, res)[:r["nA"], r["nA"]:]
+
+
+def write_store(prefix, rows, fill):
+    """
+    Write an archive. rows: index dicts without "offset" (nA/nB set);
+    fill(row, out) writes one (nA + nB)^2 matrix into `out`, in row order.
+    The .npy is filled in place and renamed into place with its index.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    offset = 0
+    for row in rows:
+        row["offset"] = offset
+        offset += (row["nA"] + row["nB"]) ** 2
+
+    tmp_npy = prefix + ".submatrices.tmp.npy"
+    tmp_tsv = prefix + ".submatrices.tmp.tsv"
+    data = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=np.float32, shape=(offset,))
+    for row in rows:
+        n = row["nA"] + row["nB"]
+        fill(row, data[row["offset"]:row["offset"] + n * n].reshape(n, n))
+    data.flush()
+    del data
+
+    with open(tmp_tsv, "w") as out:
+        out.write("\t".join(INDEX_COLUMNS) + "\n")
+        for row in rows:
+            out.write("\t".join(str(row[c]) for c in INDEX_COLUMNS) + "\n")
+    os.replace(tmp_npy, prefix + ".submatrices.npy")
+    os.replace(tmp_tsv, prefix + ".submatrices.tsv")
+    return prefix
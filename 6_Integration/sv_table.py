@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Columnar table of normalized translocations (Step1 TSV format).
+
+TSV columns:
+  source  id  sample  chrA  posA  chrB  posB  strandA  strandB
+
+Storage (one NumPy array per column, no per-record Python objects):
+  posA, posB          int64
+  chrA, chrB          int16 codes into table.chroms   (shared by both ends)
+  strandA, strandB    int8  codes into table.strands  (shared by both ends)
+  source, sample      int16 codes into table.sources / table.samples
+  id                  fixed-width bytes (S<n>)
+
+Row selection (mask or index array) returns a new SVTable that shares the
+category lists, so codes stay comparable between a table and its subsets.
+
+Feather sidecar (<tsv>.feather, written next to the TSV when pyarrow is
+installed): Arrow IPC, uncompressed, fixed schema
+
+  source, sample, chrA, chrB, strandA, strandB   dictionary<int16/int8, string>
+                                                 (chrA/chrB and strandA/strandB
+                                                  share one dictionary)
+  posA, posB                                     int64
+  id                                             string
+
+with the TSV's SHA-256 in the schema metadata. load_table() memory-maps it
+(codes and positions zero-copy; ids decoded to S<n> in one vectorized copy)
+when it is newer than the TSV or still matches the TSV content, and parses
+the TSV otherwise. R reads the same file with arrow::read_feather().
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+COLUMNS = ["source", "id", "sample", "chrA", "posA", "chrB", "posB", "strandA", "strandB"]
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+SIDECAR_SCHEMA = b"transfinder.svtable/1"
+
+
+class _Encoder:
+    """String -> small int code, in first-seen order."""
+
+    def __init__(self, categories=()):
+        self.categories = list(categories)
+        self.codes = {c: i for i, c in enumerate(self.categories)}
+
+    def __call__(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+
+class SVTable:
+
+    def __init__(self, source, id, sample, chrA, posA, chrB, posB, strandA, strandB,
+                 sources, samples, chroms, strands):
+        self.source  = np.asarray(source,  dtype=np.int16)
+        self.id      = np.asarray(id,      dtype=np.bytes_)
+        self.sample  = np.asarray(sample,  dtype=np.int16)
+        self.chrA    = np.asarray(chrA,    dtype=np.int16)
+        self.posA    = np.asarray(posA,    dtype=np.int64)
+        self.chrB    = np.asarray(chrB,    dtype=np.int16)
+        self.posB    = np.asarray(posB,    dtype=np.int64)
+        self.strandA = np.asarray(strandA, dtype=np.int8)
+        self.strandB = np.asarray(strandB, dtype=np.int8)
+        self.sources = sources
+        self.samples = samples
+        self.chroms  = chroms
+        self.strands = strands
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build from an iterable of 9-field tuples in TSV column order
+        (positions already int).
+        """
+        enc_source, enc_sample = _Encoder(), _Encoder()
+        enc_chrom, enc_strand = _Encoder(), _Encoder()
+        cols = [[] for _ in COLUMNS]
+        for source, sv_id, sample, chrA, posA, chrB, posB, sA, sB in records:
+            cols[0].append(enc_source(source))
+            cols[1].append(sv_id.encode())
+            cols[2].append(enc_sample(sample))
+            cols[3].append(enc_chrom(chrA))
+            cols[4].append(posA)
+            cols[5].append(enc_chrom(chrB))
+            cols[6].append(posB)
+            cols[7].append(enc_strand(sA))
+            cols[8].append(enc_strand(sB))
+        if not cols[1]:
+            cols[1] = np.empty(0, dtype="S1")
+        return cls(*cols,
+                   sources=enc_source.categories, samples=enc_sample.categories,
+                   chroms=enc_chrom.categories, strands=enc_strand.categories)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_records([])
+
+    def __len__(self):
+        return len(self.posA)
+
+    def take(self, rows):
+        """Subset by boolean mask or index array (vectorized)."""
+        return SVTable(
+            self.source[rows], self.id[rows], self.sample[rows],
+            self.chrA[rows], self.posA[rows], self.chrB[rows], self.posB[rows],
+            self.strandA[rows], self.strandB[rows],
+            sources=self.sources, samples=self.samples,
+            chroms=self.chroms, strands=self.strands,
+        )
+
+    def ids(self, rows=None):
+        """Decoded id strings (all rows, or the given rows)."""
+        col = self.id if rows is None else self.id[rows]
+        return [x.decode() for x in col.tolist()]
+
+    def id_mask(self, ids):
+        """Boolean mask of rows whose id is in `ids` (iterable of str)."""
+        wanted = np.array([x.encode() for x in ids], dtype=np.bytes_)
+        return np.isin(self.id, wanted)
+
+    def chrom_code(self, name):
+        """Code of a chromosome name in this table, or -1 if absent."""
+        try:
+            return self.chroms.index(name)
+        except ValueError:
+            return -1
+
+    def record(self, i):
+        """Row i as a 9-field tuple in TSV column order."""
+        return (
+            self.sources[self.source[i]], self.id[i].decode(), self.samples[self.sample[i]],
+            self.chroms[self.chrA[i]], int(self.posA[i]),
+            self.chroms[self.chrB[i]], int(self.posB[i]),
+            self.strands[self.strandA[i]], self.strands[self.strandB[i]],
+        )
+
+    def records(self):
+        """Iterate rows as 9-field tuples (columns decoded in bulk)."""
+        sources, samples = self.sources, self.samples
+        chroms, strands = self.chroms, self.strands
+        return (
+            (sources[so], i.decode(), samples[sa], chroms[ca], pa, chroms[cb], pb,
+             strands[sA], strands[sB])
+            for so, i, sa, ca, pa, cb, pb, sA, sB in zip(
+                self.source.tolist(), self.id.tolist(), self.sample.tolist(),
+                self.chrA.tolist(), self.posA.tolist(),
+                self.chrB.tolist(), self.posB.tolist(),
+                self.strandA.tolist(), self.strandB.tolist())
+        )
+
+    def nbytes(self):
+        return sum(getattr(self, c).nbytes for c in COLUMNS)
+
+
+def load_tsv(path, expected_source=None):
+    """
+    Parse a Step1 TSV (header optional) into an SVTable.
+    Lines with < 9 columns, another source, or non-integer positions are skipped.
+    """
+    if not os.path.exists(path):
+        return SVTable.empty()
+
+    def records(f):
+        for line in f:
+            if not line.strip():
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 9:
+                continue
+
+            source, sv_id, sample, chrA, posA, chrB, posB, sA, sB = cols[:9]
+            if expected_source and source != expected_source:
+                continue
+            try:
+                posA = int(posA); posB = int(posB)
+            except ValueError:
+                continue
+            yield source, sv_id, sample, chrA, posA, chrB, posB, sA, sB
+
+    with open(path) as f:
+        first = f.readline()
+        if not first:
+            return SVTable.empty()
+
+        first_cols = first.rstrip("\n").split("\t")
+        has_header = (len(first_cols) >= 1 and first_cols[0].lower() == "source")
+
+        lines_iter = f
+        if not has_header:
+            lines_iter = _chain_first(first, f)
+
+        return SVTable.from_records(records(lines_iter))
+
+
+def _chain_first(first, f):
+    yield first
+    yield from f
+
+
+def group_by_chrpair_ordered(table):
+    """
+    (chrA, chrB) -> row indices (ascending = input order), keys in
+    first-appearance order. Step1 already guaranteed chrA<=chrB.
+    """
+    groups = OrderedDict()
+    if not len(table):
+        return groups
+    pair = table.chrA.astype(np.int64) * len(table.chroms) + table.chrB
+    order = np.argsort(pair, kind="stable")
+    uniq, first, counts = np.unique(pair, return_index=True, return_counts=True)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    for k in np.argsort(first, kind="stable"):
+        rows = order[starts[k]:starts[k] + counts[k]]
+        a, b = divmod(int(uniq[k]), len(table.chroms))
+        groups[(table.chroms[a], table.chroms[b])] = rows
+    return groups
+
+
+def normalize_chrom_order(table, karyotype):
+    """
+    Enforce rank(chrA) <= rank(chrB) (karyotype.py order): rows with chrA
+    ranked after chrB get both ends (chr, pos, strand) swapped. Vectorized;
+    returns `table` itself when nothing needs swapping.
+    """
+    swap = karyotype.swap_mask(table.chrA, table.chrB, table.chroms)
+    if not swap.any():
+        return table
+    pick = lambda a, b: np.where(swap, b, a)
+    return SVTable(
+        table.source, table.id, table.sample,
+        pick(table.chrA, table.chrB), pick(table.posA, table.posB),
+        pick(table.chrB, table.chrA), pick(table.posB, table.posA),
+        pick(table.strandA, table.strandB), pick(table.strandB, table.strandA),
+        sources=table.sources, samples=table.samples,
+        chroms=table.chroms, strands=table.strands,
+    )
+
+
+###############################################################################
+# Feather sidecar
+###############################################################################
+
+def sidecar_path(tsv_path):
+    return tsv_path + ".feather"
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in 1 MB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _arrow_schema():
+    import pyarrow as pa
+    code16 = pa.dictionary(pa.int16(), pa.string())
+    code8 = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema([
+        ("source", code16), ("id", pa.string()), ("sample", code16),
+        ("chrA", code16), ("posA", pa.int64()), ("chrB", code16), ("posB", pa.int64()),
+        ("strandA", code8), ("strandB", code8),
+    ])
+
+def write_sidecar(table, tsv_path):
+    """
+    Feather copy of `table` (the content of tsv_path) next to the TSV.
+    Returns its path, or None without pyarrow.
+    """
+    if not HAS_PYARROW:
+        return None
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    schema = _arrow_schema()
+
+    def dict_col(codes, categories, field):
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, type=schema.field(field).type.index_type),
+            pa.array(categories, type=pa.string()))
+
+    arrays = [
+        dict_col(table.source, table.sources, "source"),
+        pa.array(table.ids(), type=pa.string()),
+        dict_col(table.sample, table.samples, "sample"),
+        dict_col(table.chrA, table.chroms, "chrA"),
+        pa.array(table.posA, type=pa.int64()),
+        dict_col(table.chrB, table.chroms, "chrB"),
+        pa.array(table.posB, type=pa.int64()),
+        dict_col(table.strandA, table.strands, "strandA"),
+        dict_col(table.strandB, table.strands, "strandB"),
+    ]
+    meta = {b"schema": SIDECAR_SCHEMA, b"tsv_sha256": file_sha256(tsv_path).encode()}
+    arrow_table = pa.Table.from_arrays(arrays, schema=schema.with_metadata(meta))
+
+    out = sidecar_path(tsv_path)
+    tmp = out + ".tmp"
+    feather.write_feather(arrow_table, tmp, compression="uncompressed")
+    os.replace(tmp, out)
+    return out
+
+def write_tsv_sidecar(tsv_path):
+    """Sidecar of an already written TSV (parsed once here, not by every reader)."""
+    return write_sidecar(load_tsv(tsv_path), tsv_path)
+
+def _fixed_width_ids(arr):
+    """Arrow string array -> S<n> NumPy array (vectorized, one copy)."""
+    n = len(arr)
+    if not n:
+        return np.empty(0, dtype="S1")
+    _, offsets_buf, data_buf = arr.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int32, count=n + 1, offset=arr.offset * 4)
+    lengths = np.diff(offsets)
+    width = max(int(lengths.max()), 1)
+    data = np.frombuffer(data_buf, dtype=np.uint8)[offsets[0]:offsets[-1]]
+    out = np.zeros((n, width), dtype=np.uint8)
+    rows = np.repeat(np.arange(n), lengths)
+    cols = np.arange(len(data)) - np.repeat(offsets[:-1] - offsets[0], lengths)
+    out[rows, cols] = data
+    return out.view(f"S{width}").ravel()
+
+def read_sidecar(path):
+    """(SVTable, schema metadata) of a sidecar, memory-mapped."""
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+    meta = arrow_table.schema.metadata or {}
+    if meta.get(b"schema") != SIDECAR_SCHEMA:
+        raise ValueError(f"{path}: not an SVTable sidecar")
+    arrow_table = arrow_table.combine_chunks()
+    if arrow_table.num_rows == 0:
+        return SVTable.empty(), meta
+
+    cols = {name: arrow_table.column(name).chunk(0) for name in COLUMNS}
+
+    def codes(name):
+        return cols[name].indices.to_numpy(zero_copy_only=True)
+
+    def categories(name):
+        return cols[name].dictionary.to_pylist()
+
+    for a, b in (("chrA", "chrB"), ("strandA", "strandB")):
+        if categories(a) != categories(b):
+            raise ValueError(f"{path}: {a}/{b} dictionaries differ")
+
+    table = SVTable(
+        codes("source"), _fixed_width_ids(cols["id"]), codes("sample"),
+        codes("chrA"), cols["posA"].to_numpy(zero_copy_only=True),
+        codes("chrB"), cols["posB"].to_numpy(zero_copy_only=True),
+        codes("strandA"), codes("strandB"),
+        sources=categories("source"), samples=categories("sample"),
+        chroms=categories("chrA"), strands=categories("strandA"),
+    )
+    return table, meta
+
+def load_table(path, expected_source=None):
+    """
+    load_tsv(), served from the Feather sidecar when it is current: newer
+    than the TSV, or (touched TSV) same content hash.
+    """
+    side = sidecar_path(path)
+    if HAS_PYARROW and os.path.exists(path) and os.path.exists(side):
+        try:
+            table, meta = read_sidecar(side)
+            if (os.path.getmtime(side) >= os.path.getmtime(path)
+                    or meta.get(b"tsv_sha256", b"").decode() == file_sha256(path)):
+                if expected_source is not None and table.sources != [expected_source]:
+                    keep = (np.array(table.sources, dtype=object)[table.source] == expected_source) \
+                        if len(table) else np.zeros(0, dtype=bool)
+                    table = table.take(keep)
+                return table
+        except (OSError, ValueError, KeyError) as e:
+            sys.stderr.write(f"[WARN] unreadable sidecar {side} ({e}), parsing the TSV.\n")
+    return load_tsv(path, expected_source)
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental runner for the numbered TransFinder stages.
+
+Each stage is run per sample only when its work is out of date. For every
+(stage, sample) the manifest records
+
+  input_hash   SHA-256 over the content of the sample's input files
+  param_hash   SHA-256 over the stage command and the content of the stage
+               scripts / modules (thresholds live in the scripts)
+
+and a (stage, sample) is skipped when both hashes match the last successful
+run and its declared outputs exist. Stages run in pipeline order, so a stage
+whose upstream outputs changed sees a new input hash and re-runs.
+
+File hashes are cached in the manifest by (size, mtime_ns): a multi-GB mcool
+or BAM is read once, and again only when it changes.
+
+Two kinds of stage:
+  per-sample  shell scripts; one process per stale sample (TF_SAMPLES=<sample>),
+              run concurrently within the --cpus budget (stage `cpus` each)
+  batch       Python scripts with --samples/--jobs; one call with all stale
+              samples, --jobs sized to the --cpus budget. Cohort files
+              (e.g. all_samples_exact_event_summary.tsv) are updated in place
+              for those samples only.
+
+Adding a patient (e.g. --samples ... PT4) therefore runs only PT4 through the
+stages and rewrites the cross-sample summary.
+
+Manifest:
+  .stage_manifest.json   (project root)
+
+Usage:
+  python3 run_stages.py [--samples PT1 PT2 PT3 PT4] [--stages intersect neoloop ...]
+                        [--cpus 32] [--force] [--dry-run]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# chunked file hash shared with the 6_Integration caches (sv_table.py)
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "6_Integration"))
+from sv_table import file_sha256
+
+SAMPLES = ["KMS11","LP1","MM1S","RPMI8226","U266","PT1","PT2","PT3"]
+
+MANIFEST = ".stage_manifest.json"
+
+MCOOL = "2_HiC/2_get_hic_mcool/{s}/{s}_contact.mcool"
+
+# name, kind, working dir, command, inputs, outputs, params, cpus per sample
+#   inputs / outputs: path or glob patterns relative to the project root, {s} = sample;
+#          an input may be a list of alternatives (the first one that matches is used)
+#   config: shell script whose NAME="value" lines fill {NAME} in the patterns
+#          (raw-data locations set outside the project, e.g. read BAMs)
+#   params: scripts / modules whose content defines the stage
+#   queue: batch script that splits samples into smaller work items itself,
+#          so --jobs is not capped by the number of stale samples
+STAGES = [
+    {"name": "smrt_sv_calling", "kind": "per-sample", "cwd": "1_SMRT-seq",
+     "cmd": ["bash", "1_smrt_sv_calling.sh"],
+     "config": "1_SMRT-seq/1_smrt_sv_calling.sh",
+     "inputs": [["{CLR_RAW_DIR}/{s}_subreads.bam", "{HIFI_RAW_DIR}/{s}/{s}.bam"],
+                "{REF_FASTA}"],
+     "outputs": ["1_SMRT-seq/4-filtersv/{s}_SVs_hg38.vcf"],
+     "params": ["1_SMRT-seq/1_smrt_sv_calling.sh"], "cpus": 24},
+    {"name": "bnd_normalize", "kind": "batch", "cwd": ".",
+     "cmd": ["python3", "1_SMRT-seq/bnd_normalize.py"],
+     "inputs": ["1_SMRT-seq/4-filtersv/{s}_SVs_hg38.vcf",
+                "2_HiC/7_predictSV/{s}/{s}.predictsv.txt.CNN_SVs.5K_combined.txt"],
+     "outputs": ["6_Integration/1_trans_tsv/{s}/{s}_longread.tsv",
+                 "6_Integration/1_trans_tsv/{s}/{s}_hic.tsv"],
+     "params": ["1_SMRT-seq/bnd_normalize.py", "1_SMRT-seq/longrange_vcf_to_bedpe.py",
+                "6_Integration/sv_table.py", "6_Integration/karyotype.py"], "cpus": 1},
+    {"name": "smrt_bam2bw", "kind": "per-sample", "cwd": "1_SMRT-seq",
+     "cmd": ["bash", "4_run_bam2bw.sh"],
+     "inputs": ["1_SMRT-seq/1-pbmm2/{s}_hg38_chr1_22xym.bam"],
+     "outputs": ["1_SMRT-seq/7-bam2bw/{s}.bw"],
+     "params": ["1_SMRT-seq/4_run_bam2bw.sh"], "cpus": 20},
+    {"name": "intersect", "kind": "batch", "cwd": ".",
+     "cmd": ["python3", "6_Integration/2_intersect_translocations.py"],
+     "inputs": ["6_Integration/1_trans_tsv/{s}/{s}_hic.tsv",
+                "6_Integration/1_trans_tsv/{s}/{s}_longread.tsv"],
+     "outputs": ["6_Integration/2_intersection/{s}/{s}_transfinder_bnd.tsv",
+                 "6_Integration/2_intersection/{s}/{s}_exact_shared_longread_breakpoints.bed",
+                 "6_Integration/2_intersection/{s}/{s}_LRS_match_detail.tsv"],
+     "params": ["6_Integration/2_intersect_translocations.py", "6_Integration/sv_table.py",
+                "6_Integration/karyotype.py", "6_Integration/exclusions.py",
+                "6_Integration/exclusions.tsv"], "cpus": 1},
+    {"name": "bnd_submatrices", "kind": "batch", "cwd": ".",
+     "cmd": ["python3", "6_Integration/2_1_extract_bnd_submatrices.py"],
+     "inputs": ["6_Integration/2_intersection/{s}/{s}_transfinder_bnd.tsv", MCOOL],
+     "outputs": ["6_Integration/2_1_bnd_submatrix/{s}/{s}.submatrices.npy"],
+     "params": ["6_Integration/2_1_extract_bnd_submatrices.py", "6_Integration/submatrix_store.py",
+                "6_Integration/karyotype.py"], "cpus": 1},
+    {"name": "breakpoint_quadrants", "kind": "batch", "cwd": ".",
+     "cmd": ["python3", "6_Integration/2_2_breakpoint_quadrants.py"],
+     "inputs": ["6_Integration/2_intersection/{s}/{s}_exact_shared_longread_breakpoints.bed",
+                "6_Integration/2_intersection/{s}/{s}_longread_merged.tsv", MCOOL],
+     "outputs": ["6_Integration/2_intersection/{s}/{s}_breakpoint_quadrants.tsv"],
+     "params": ["6_Integration/2_2_breakpoint_quadrants.py", "6_Integration/sv_table.py"], "cpus": 1},
+    {"name": "neoloop", "kind": "batch", "queue": True, "cwd": ".",
+     "cmd": ["python3", "6_Integration/4_5_neoloop_batches.py", "--nproc", "8"],
+     "inputs": ["6_Integration/2_intersection/{s}/{s}_transfinder_bnd.tsv", MCOOL],
+     "outputs": ["6_Integration/4_complex_bnd/{s}/{s}.assemblies.txt",
+                 "6_Integration/5_neoloop-caller/{s}/{s}.neo-loops.txt"],
+     "params": ["6_Integration/4_5_neoloop_batches.py"], "cpus": 8},
+    {"name": "ep_loop_gene", "kind": "batch", "cwd": ".",
+     "cmd": ["python3", "6_Integration/6_bnd-ep-loop-gene.py"],
+     "inputs": ["6_Integration/5_neoloop-caller/{s}/{s}.neo-loops.txt",
+                "6_Integration/4_complex_bnd/{s}/{s}.assemblies.txt",
+                "6_Integration/coding_gene_promoters_1kb.bed",
+                "3_CUTtag/4_macs2/{s}*H3K27ac*peaks.narrowPeak",
+                "5_RNAseq/7_stringtie_tpm/{s}/{s}_coding_genes_tpm_fpkm.*"],
+     "outputs": ["6_Integration/6_bnd-ep-loop-gene/{s}/8_bnd_neo-ep-loop-gene.tsv"],
+     "params": ["6_Integration/6_bnd-ep-loop-gene.py", "6_Integration/intervals.py"], "cpus": 1},
+]
+
+
+def get_root_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+###############################################################################
+# Manifest / hashing
+###############################################################################
+
+class Manifest:
+    """JSON manifest: per (stage, sample) hashes + file-hash cache. Thread-safe."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.runs = data.get("runs", {})
+        self.files = data.get("files", {})
+
+    def file_sha256(self, path):
+        st = os.stat(path)
+        with self.lock:
+            cached = self.files.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = file_sha256(path)
+        with self.lock:
+            self.files[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def get(self, stage, sample):
+        with self.lock:
+            return self.runs.get(f"{stage}\t{sample}")
+
+    def record(self, stage, sample, entry):
+        with self.lock:
+            self.runs[f"{stage}\t{sample}"] = entry
+            self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"runs": self.runs, "files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def shell_config(root_dir, path):
+    """{NAME: value} of the literal NAME="value" assignments of a shell script."""
+    config = {}
+    with open(os.path.join(root_dir, path)) as f:
+        for m in re.finditer(r'^([A-Za-z_][A-Za-z0-9_]*)="([^"$`]*)"', f.read(), re.M):
+            config[m.group(1)] = m.group(2)
+    return config
+
+def expand(root_dir, patterns, sample, config=None):
+    """
+    {pattern: sorted matching paths relative to root} for one sample. A list
+    of alternatives yields its first pattern with matches (or, if none match,
+    all of them ' | '-joined with no paths).
+    """
+    out = {}
+    for pat in patterns:
+        alts = [p.format(s=sample, **(config or {})) for p in (pat if isinstance(pat, list) else [pat])]
+        for p in alts:
+            paths = sorted(os.path.relpath(x, root_dir) for x in glob.glob(os.path.join(root_dir, p)))
+            if paths:
+                out[p] = paths
+                break
+        else:
+            out[" | ".join(alts)] = []
+    return out
+
+def input_hash(root_dir, manifest, stage, sample):
+    """(hash, missing patterns) over the sample's input files."""
+    h = hashlib.sha256()
+    missing = []
+    config = shell_config(root_dir, stage["config"]) if stage.get("config") else None
+    for pat, paths in expand(root_dir, stage["inputs"], sample, config).items():
+        if not paths:
+            missing.append(pat)
+        for p in paths:
+            h.update(f"{p}\t{manifest.file_sha256(os.path.join(root_dir, p))}\n".encode())
+    return h.hexdigest(), missing
+
+def param_hash(root_dir, manifest, stage):
+    h = hashlib.sha256(json.dumps([stage["kind"], stage["cwd"], stage["cmd"]]).encode())
+    for p in stage["params"]:
+        path = os.path.join(root_dir, p)
+        digest = manifest.file_sha256(path) if os.path.exists(path) else "-"
+        h.update(f"{p}\t{digest}\n".encode())
+    return h.hexdigest()
+
+def outputs_present(root_dir, stage, sample, since=None):
+    for paths in expand(root_dir, stage["outputs"], sample).values():
+        if not paths:
+            return False
+        # file mtimes come from a coarse kernel clock that can lag time.time()
+        if since is not None and all(os.path.getmtime(os.path.join(root_dir, p)) < since - 1
+                                     for p in paths):
+            return False
+    return True
+
+
+###############################################################################
+# Execution
+###############################################################################
+
+class CpuBudget:
+    """Blocking counter of CPUs in use; a task larger than the budget runs alone."""
+
+    def __init__(self, total):
+        self.total = total
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, n):
+        n = min(n, self.total)
+        with self.cond:
+            while self.used + n > self.total:
+                self.cond.wait()
+            self.used += n
+        return n
+
+    def release(self, n):
+        with self.cond:
+            self.used -= n
+            self.cond.notify_all()
+
+
+def run_command(root_dir, stage, cmd, env=None, label=""):
+    cwd = os.path.join(root_dir, stage["cwd"])
+    sys.stderr.write(f"[RUN] {stage['name']} {label}: {' '.join(cmd)}\n")
+    t0 = time.time()
+    rc = subprocess.call(cmd, cwd=cwd, env=env)
+    sys.stderr.write(f"[{'DONE' if rc == 0 else 'FAIL'}] {stage['name']} {label} "
+                     f"({time.time() - t0:.0f} s, exit {rc})\n")
+    return rc
+
+def run_stage(root_dir, manifest, stage, samples, cpus, force=False, dry_run=False):
+    """Run the stale samples of one stage; returns the samples that failed."""
+    p_hash = param_hash(root_dir, manifest, stage)
+    stale = {}
+    for s in samples:
+        i_hash, missing = input_hash(root_dir, manifest, stage, s)
+        if missing:
+            sys.stderr.write(f"[SKIP] {stage['name']} {s}: no input {', '.join(missing)}\n")
+            continue
+        prev = manifest.get(stage["name"], s)
+        if (not force and prev and prev["input_hash"] == i_hash and prev["param_hash"] == p_hash
+                and outputs_present(root_dir, stage, s)):
+            continue
+        stale[s] = i_hash
+    manifest.save()
+
+    if not stale:
+        sys.stderr.write(f"[OK] {stage['name']}: up to date\n")
+        return []
+    sys.stderr.write(f"[INFO] {stage['name']}: {len(stale)} to run ({','.join(stale)})\n")
+    if dry_run:
+        return []
+
+    def done(s, t0):
+        entry = {"input_hash": stale[s], "param_hash": p_hash,
+                 "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+        if outputs_present(root_dir, stage, s, since=t0):
+            manifest.record(stage["name"], s, entry)
+            return True
+        return False
+
+    if stage["kind"] == "batch":
+        jobs = cpus // stage["cpus"] if stage.get("queue") else min(len(stale), cpus // stage["cpus"])
+        jobs = max(1, jobs)
+        t0 = time.time()
+        run_command(root_dir, stage, stage["cmd"] + ["--samples", *stale, "--jobs", str(jobs)],
+                    label=",".join(stale))
+        # the script exits 1 if any sample failed: record those with fresh outputs
+        return [s for s in stale if not done(s, t0)]
+
+    budget = CpuBudget(cpus)
+
+    def one(s):
+        n = budget.acquire(stage["cpus"])
+        try:
+            t0 = time.time()
+            env = dict(os.environ, TF_SAMPLES=s)
+            rc = run_command(root_dir, stage, stage["cmd"], env=env, label=s)
+            return s if rc != 0 or not done(s, t0) else None
+        finally:
+            budget.release(n)
+
+    workers = max(1, min(len(stale), cpus // min(stage["cpus"], cpus)))
+    with ThreadPoolExecutor(workers) as pool:
+        return [s for s in pool.map(one, stale) if s is not None]
+
+
+###############################################################################
+# Main
+###############################################################################
+
+def main():
+    names = [st["name"] for st in STAGES]
+    parser = argparse.ArgumentParser(description="Run the TransFinder stages incrementally.")
+    parser.add_argument("--samples", nargs="+", default=SAMPLES)
+    parser.add_argument("--stages", nargs="+", choices=names, default=names,
+                        help="stages to consider (pipeline order is kept)")
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1,
+                        help="CPU budget shared by concurrently running samples")
+    parser.add_argument("--force", action="store_true", help="re-run even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    args = parser.parse_args()
+
+    root_dir = get_root_dir()
+    manifest = Manifest(os.path.join(root_dir, MANIFEST))
+
+    failed = []
+    for stage in STAGES:
+        if stage["name"] not in args.stages:
+            continue
+        bad = run_stage(root_dir, manifest, stage, args.samples, args.cpus,
+                        force=args.force, dry_run=args.dry_run)
+        failed += [f"{stage['name']}:{s}" for s in bad]
+        # downstream stages of a failed sample would only see stale inputs
+        args.samples = [s for s in args.samples if s not in bad]
+
+    if failed:
+        sys.stderr.write(f"[ERROR] failed: {' '.join(failed)}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()